@@ -0,0 +1,484 @@
+"""
+Runs the flash commands end to end against a stand-in for the device
+and stub flash tools, and reports how long each command, and each step
+within it, took.
+
+Nothing here touches real hardware, S3, or your ~/.dephy. Each run
+gets a throwaway home directory with the stub tools already installed.
+In the process running the command, `Device`, the serial ports, and S3
+are replaced by stand-ins. Their latencies come from the profile (see
+`defaultProfile`; override any of them with `--profile FILE`). The
+stub tools print progress the way the real ones do. The timings
+therefore measure the pipeline itself: how its steps are ordered,
+overlapped, and waited on.
+
+Pass `--save FILE` to record the results as a baseline. Pass
+`--compare FILE` to fail if any command got more than `--threshold`
+percent slower than that baseline.
+
+Linux only.
+
+Usage:
+    python benchmarks/flash_pipeline.py [--repeat N] [--profile FILE]
+        [--save FILE] [--compare FILE] [--threshold PCT] [--json]
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess as sub
+import sys
+import tempfile
+from time import perf_counter
+from typing import Dict
+from typing import List
+
+# Latencies, in seconds, of the things the stand-ins pretend to do
+defaultProfile = {
+    # Creating a `Device` (which loads the C library) and opening it
+    "deviceCreate": 0.3,
+    "deviceOpen": 0.5,
+    # Listing the firmware versions on S3 and downloading one file
+    "versionCheck": 0.2,
+    "s3Download": 0.5,
+    # Size, in bytes, of each downloaded firmware file
+    "firmwareSize": 256 * 1024,
+    # The target's bootloader answering after it's activated
+    "bootloader": 0.3,
+    # The serial port being freed after the device is closed
+    "portRelease": 0.1,
+    # The port going away while the target resets after being flashed
+    "reboot": 0.5,
+    # The operator power cycling the device
+    "powerCycle": 1.0,
+    # Each stub flash tool prints this many progress updates, this far apart
+    "toolSteps": 10,
+    "toolStepTime": 0.1,
+}
+
+port = "/dev/ttyBENCH0"
+currentMnFw = "7.2.0"
+configName = "benchConfig"
+
+# Command -> arguments. Every command is run with `-n` and `--trace`
+commands = {
+    "flash mn": [port, currentMnFw, "10.7.0", "4.1", "actpack", "none"],
+    "flash ex": [port, currentMnFw, "10.7.0", "4.1", "actpack"],
+    "flash re": [port, currentMnFw, "10.7.0", "4.1", "multi"],
+    "flash habs": [port, currentMnFw, "1.0.0"],
+    "flash bt121": [port, currentMnFw, "1234", "1"],
+    "flash xbee": [port, currentMnFw, "1234", "5678"],
+    # Without interaction, flash all skips the optional targets
+    "flash all": [
+        port,
+        currentMnFw,
+        "--to=10.7.0",
+        "--rigidVersion=4.1",
+        "--device=actpack",
+        "--side=none",
+        "--motorType=actpack",
+        "--led=multi",
+    ],
+    "flash config": [port, currentMnFw, configName],
+}
+
+# Steps shown in the report, as named in the traces
+stages = [
+    "tools",
+    "firmware",
+    "device",
+    "prepare",
+    "tunnel",
+    "release",
+    "settle",
+    "tool",
+    "reboot",
+    "powerCycle",
+    "total",
+]
+
+# Allowance, in seconds, on top of the --threshold percentage so that
+# noise on short commands doesn't fail a comparison
+slack = 0.1
+
+# Stub flash tools, relative to the OS's tools directory, and the
+# progress line each one prints
+stubTools = {
+    "DfuSeCommand.exe": "Target 00: Upgrading - Download Phase ({percent:.0f}%)...",
+    "psocbootloaderhost.exe": "Programming row {done} of {total}",
+    "stm32flash": "Wrote address 0x{done:08x} ({percent:.2f}%) ",
+    "stm32_flash_loader/stm32_flash_loader/STMFlashLoader.exe": (
+        " Downloading ... {percent:.0f}%"
+    ),
+    "XB24C/XB24C/xb24c.py": "Upgrading firmware... {percent:.0f}%",
+}
+
+stubTool = """#!{python}
+import json
+import os
+import sys
+import time
+
+profile = json.loads(os.environ["FLASH_BENCH_PROFILE"])
+steps = profile["toolSteps"]
+for i in range(steps + 1):
+    line = {fmt!r}.format(done=i, total=steps, percent=100 * i / steps)
+    sys.stdout.write(line + "\\r")
+    sys.stdout.flush()
+    time.sleep(profile["toolStepTime"])
+print("")
+print("Done.")
+"""
+
+# bt121's image is built by two tools run from the image tools
+# directory: a script that's given the address and an image builder
+# that writes the image into dephy_gatt_broadcast_bt121
+btImageScript = """#!{python}
+import sys
+
+with open("address", "w", encoding="utf8") as fd:
+    fd.write(sys.argv[1])
+"""
+
+btImageBuilder = """#!{python}
+import json
+import os
+
+profile = json.loads(os.environ["FLASH_BENCH_PROFILE"])
+with open("address", "r", encoding="utf8") as fd:
+    address = fd.read()
+name = f"dephy_gatt_broadcast_bt121_Exo-{{address}}.bin"
+with open(os.path.join("dephy_gatt_broadcast_bt121", name), "wb") as fd:
+    fd.write(bytes(profile["firmwareSize"]))
+"""
+
+probe = """
+import json
+import os
+import struct
+import sys
+from time import monotonic
+from time import sleep
+from zipfile import ZipFile
+import zlib
+
+from semantic_version import Version
+
+from bootloader.application import Application
+import bootloader.commands.flash.base_flash as baseFlash
+import bootloader.utilities.constants as bc
+import bootloader.utilities.readiness as readiness
+import bootloader.utilities.storage as storage
+
+profile = json.loads(os.environ["FLASH_BENCH_PROFILE"])
+
+# The device's serial port is present except during outages, given as
+# [start, end] times, and is busy for a while after the device closes it
+outages = []
+busyUntil = [0.0]
+dfu = []
+
+
+def port_present(port):
+    now = monotonic()
+    return not any(start <= now < end for start, end in outages)
+
+
+def port_released(port):
+    return port_present(port) and monotonic() >= busyUntil[0]
+
+
+readiness.port_present = port_present
+readiness.port_released = port_released
+baseFlash.port_serial_number = lambda port: None
+
+
+class FakeDevice:
+    def __init__(self, firmwareVersion, port, **kwargs):
+        sleep(profile["deviceCreate"])
+        self.port = port
+        self.id = 1234
+        self.connected = False
+        self._activeAt = None
+
+    def open(self, bootloading=False):
+        sleep(profile["deviceOpen"])
+        self.connected = True
+
+    def close(self):
+        if self.connected:
+            busyUntil[0] = monotonic() + profile["portRelease"]
+        self.connected = False
+        # The bootloader has to be activated again after reconnecting
+        self._activeAt = None
+
+    def activate_bootloader(self, target):
+        if self._activeAt is None:
+            self._activeAt = monotonic() + profile["bootloader"]
+        # Manage resets into DFU mode, so its port goes away until it's flashed
+        if target == "mn" and not dfu:
+            dfu.append([monotonic() + profile["bootloader"], float("inf")])
+            outages.append(dfu[0])
+
+    @property
+    def bootloaderActive(self):
+        return self._activeAt is not None and monotonic() >= self._activeAt
+
+    @property
+    def firmware_version(self):
+        return {"mn": "7.2.0", "ex": "7.2.0", "re": "7.2.0", "habs": "1.0.0"}
+
+
+baseFlash.Device = FakeDevice
+
+
+def validate_given_firmware_version(version, interactive):
+    sleep(profile["versionCheck"])
+    return Version(version)
+
+
+baseFlash.validate_given_firmware_version = validate_given_firmware_version
+
+
+def checksummed(record):
+    return ":" + (record + bytes([-sum(record) & 0xFF])).hex() + "\\n"
+
+
+# Images are checked before they're flashed, so the downloads have to be
+# well-formed: empty images of the firmware size in the format given by
+# the file's extension
+def image(name):
+    size = profile["firmwareSize"]
+    if name.endswith(".hex"):
+        lines = [checksummed(bytes([2, 0, 0, 4, 0x08, 0x00]))]
+        for address in range(0, size, 16):
+            record = bytes([16, address >> 8 & 0xFF, address & 0xFF, 0]) + bytes(16)
+            lines.append(checksummed(record))
+        return ("".join(lines) + checksummed(bytes([0, 0, 0, 1]))).encode()
+    if name.endswith(".cyacd"):
+        lines = ["2e1230690000\\n"]
+        for row in range(size // 256):
+            record = bytes([0, row >> 8, row & 0xFF, 1, 0]) + bytes(256)
+            lines.append(checksummed(record))
+        return "".join(lines).encode()
+    element = struct.pack("<II", 0x08000000, size) + bytes(size)
+    target = b"Target" + bytes(260) + struct.pack("<II", len(element), 1) + element
+    body = struct.pack("<5sBIB", b"DfuSe", 1, 11 + len(target), 1) + target
+    body += struct.pack("<HHHH", 0xFFFF, 0xDF11, 0x0483, 0x011A) + b"UFD" + bytes([16])
+    return body + struct.pack("<I", ~zlib.crc32(body) & 0xFFFFFFFF)
+
+
+def s3_download(obj, bucket, dest, profileName=None, etag=None):
+    sleep(profile["s3Download"])
+    if ".zip" in dest:
+        with ZipFile(dest, "w") as archive:
+            archive.writestr(bc.configInfoFile, "re: re.cyacd\\nex: ex.cyacd\\n")
+            archive.writestr("re.cyacd", image("re.cyacd"))
+            archive.writestr("ex.cyacd", image("ex.cyacd"))
+    else:
+        with open(dest, "wb") as fd:
+            fd.write(image(dest))
+
+
+storage.s3_download = s3_download
+
+# Targets whose port goes away while they reset after being flashed
+rebootingTargets = ["ex", "habs", "bt121", "xbee"]
+runFlashTool = baseFlash.BaseFlashCommand._run_flash_tool
+
+
+def run_flash_tool(self):
+    runFlashTool(self)
+    if self._target == "mn" and dfu:
+        dfu.pop()[1] = monotonic()
+    elif self._target in rebootingTargets:
+        outages.append([monotonic(), monotonic() + profile["reboot"]])
+
+
+baseFlash.BaseFlashCommand._run_flash_tool = run_flash_tool
+waitForPowerCycle = baseFlash.wait_for_power_cycle
+
+
+def wait_for_power_cycle(port, timeout, serialNumber=None):
+    start = monotonic() + profile["powerCycle"] / 2
+    outages.append([start, start + profile["powerCycle"] / 2])
+    return waitForPowerCycle(port, timeout, serialNumber)
+
+
+baseFlash.wait_for_power_cycle = wait_for_power_cycle
+
+app = Application()
+app.auto_exits(False)
+bc.supportedOS.append(app._os)
+bc.bootloaderTools[app._os] = {t: [] for t in ["setup", *bc.targets]}
+bc.firstSetup.parent.mkdir(parents=True, exist_ok=True)
+bc.firstSetup.touch()
+
+sys.argv = ["bootloader", *json.loads(sys.argv[1])]
+sys.exit(app.run())
+"""
+
+
+# ============================================
+#               install_stubs
+# ============================================
+def install_stubs(home: Path) -> None:
+    """
+    Puts the stub tools where `bootloader` expects to find the real
+    ones under `home`.
+    """
+    # get_os() returns e.g. linux_64bit; the tools live in a directory
+    # of that name
+    bits = "64bit" if sys.maxsize > 2**32 else "32bit"
+    toolsDir = home.joinpath(".dephy", "bootloader_tools", f"linux_{bits}")
+
+    scripts = {
+        name: stubTool.format(python=sys.executable, fmt=fmt)
+        for name, fmt in stubTools.items()
+    }
+    btDir = "bt121_image_tools/bt121_image_tools"
+    scripts[f"{btDir}/bt121_gatt_broadcast_img.py"] = btImageScript.format(
+        python=sys.executable
+    )
+    scripts[f"{btDir}/smart-ready-1.7.0-217/bin/bgbuild.exe"] = btImageBuilder.format(
+        python=sys.executable
+    )
+    scripts[f"{btDir}/gatt_files/LVL1.xml"] = "<gatt/>\n"
+
+    for name, content in scripts.items():
+        path = toolsDir.joinpath(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf8")
+        path.chmod(0o755)
+
+    toolsDir.joinpath(btDir, "dephy_gatt_broadcast_bt121").mkdir(exist_ok=True)
+
+
+# ============================================
+#                  run_once
+# ============================================
+def run_once(command: str, args: List[str], profile: dict) -> Dict[str, float]:
+    """
+    Runs `bootloader <command> <args>` in a fresh home directory and
+    returns the wall time and the time spent in each traced step.
+    """
+    with tempfile.TemporaryDirectory(prefix="flash-bench-") as tmp:
+        home = Path(tmp)
+        install_stubs(home)
+        trace = home.joinpath("trace.json")
+
+        env = dict(os.environ, HOME=str(home), FLASH_BENCH_PROFILE=json.dumps(profile))
+        argv = [*command.split(), *args, "-n", "--no-ansi", f"--trace={trace}"]
+
+        start = perf_counter()
+        proc = sub.run(
+            [sys.executable, "-c", probe, json.dumps(argv)],
+            capture_output=True,
+            check=False,
+            env=env,
+            text=True,
+        )
+        wall = perf_counter() - start
+
+        if proc.returncode != 0:
+            raise RuntimeError(f"`{command}` failed:\n{proc.stdout}\n{proc.stderr}")
+
+        with open(trace, "r", encoding="utf8") as fd:
+            events = json.load(fd)["traceEvents"]
+
+    times = {stage: 0.0 for stage in stages}
+    for event in events:
+        if event["ph"] == "X" and event["name"] in times:
+            times[event["name"]] += event["dur"] / 1e6
+    times["wall"] = wall
+
+    return times
+
+
+# ============================================
+#                  measure
+# ============================================
+def measure(command: str, repeat: int, profile: dict) -> dict:
+    runs = [run_once(command, commands[command], profile) for _ in range(repeat)]
+
+    return {
+        "command": command,
+        **{k: statistics.median(r[k] for r in runs) for k in ["wall", *stages]},
+    }
+
+
+# ============================================
+#                  compare
+# ============================================
+def compare(rows: List[dict], baselineFile: Path, threshold: float) -> List[str]:
+    """
+    Returns a message for each command whose wall time is more than
+    `threshold` percent (plus `slack`) over the baseline's.
+    """
+    with open(baselineFile, "r", encoding="utf8") as fd:
+        baseline = {row["command"]: row for row in json.load(fd)}
+
+    failures = []
+    for row in rows:
+        if row["command"] not in baseline:
+            continue
+        limit = baseline[row["command"]]["wall"] * (1 + threshold / 100) + slack
+        if row["wall"] > limit:
+            msg = f"`{row['command']}` took {row['wall']:.2f} s "
+            msg += f"(baseline {baseline[row['command']]['wall']:.2f} s)"
+            failures.append(msg)
+
+    return failures
+
+
+# ============================================
+#                   main
+# ============================================
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per command.")
+    parser.add_argument("--profile", type=Path, help="JSON file of latencies.")
+    parser.add_argument("--save", type=Path, help="Save the results here.")
+    parser.add_argument("--compare", type=Path, help="Baseline to compare with.")
+    parser.add_argument(
+        "--threshold", type=float, default=20, help="Allowed slowdown, in percent."
+    )
+    parser.add_argument("--json", action="store_true", help="Print raw JSON.")
+    parser.add_argument("commands", nargs="*", help="Commands to run (default: all).")
+    args = parser.parse_args(argv)
+
+    if not sys.platform.startswith("linux"):
+        print("This benchmark only runs on Linux.", file=sys.stderr)
+        return 1
+
+    profile = dict(defaultProfile)
+    if args.profile:
+        with open(args.profile, "r", encoding="utf8") as fd:
+            profile.update(json.load(fd))
+
+    rows = [measure(c, args.repeat, profile) for c in args.commands or commands]
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        columns = ["wall", *stages]
+        print(f"{'command':<14}" + "".join(f"{c:>11}" for c in columns))
+        for row in rows:
+            print(
+                f"{row['command']:<14}" + "".join(f"{row[c]:>11.2f}" for c in columns)
+            )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf8") as fd:
+            json.dump(rows, fd, indent=2)
+
+    failures = compare(rows, args.compare, args.threshold) if args.compare else []
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
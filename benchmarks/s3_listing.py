@@ -0,0 +1,293 @@
+"""
+Compares listing the firmware bucket in full against the prefix-scoped,
+concurrent listing the firmware catalog uses, against a local stand-in
+for S3 holding tens of thousands of keys.
+
+The stand-in is a small HTTP server that answers ListObjectsV2 requests
+the way S3 does: at most 1000 keys a page, in key order, with a
+continuation token for the next page. Each request is delayed by
+`--latency` milliseconds to account for the round trip to S3. boto3
+talks to it exactly as it would to S3, so the timings include boto3's
+own request and parsing overhead.
+
+Most of the keys in the stand-in's bucket belong to no target (old
+builds, tools, and so on), as `--share` of them would in a bucket that
+has grown over the years. For each way of listing, the table shows the
+total time, the time until the first object was available, and the
+number of requests made. The script fails if the scoped listings don't
+return exactly the objects the full listing does.
+
+Usage:
+    python benchmarks/s3_listing.py [--keys N] [--share FRACTION]
+        [--latency MS] [--repeat N] [--json]
+"""
+import argparse
+import bisect
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import json
+import random
+import statistics
+import sys
+import threading
+from time import perf_counter
+from time import sleep
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+import boto3
+from botocore.config import Config
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.s3_listing import list_objects
+
+bucket = "bench-firmware"
+pageSize = 1000
+
+
+# ============================================
+#                 make_keys
+# ============================================
+def make_keys(count: int, share: float) -> List[str]:
+    """
+    Returns `count` sorted keys, `share` of which are firmware files for
+    the catalog's targets and the rest of which aren't.
+    """
+    rng = random.Random(0)
+    keys = set()
+
+    while len(keys) < count * share:
+        target = rng.choice(bc.catalogTargets)
+        version = f"{rng.randint(1, 20)}.{rng.randint(0, 9)}.{rng.randint(0, 99)}"
+        rigid = f"4.{rng.randint(0, 9)}{rng.choice('abcd')}"
+        keys.add(f"{target}_version-{version}_rigid-{rigid}_n-{rng.randint(0, 999)}")
+
+    while len(keys) < count:
+        folder = rng.choice(["archive", "builds", "tools", "test"])
+        keys.add(f"{folder}/{rng.getrandbits(64):016x}.bin")
+
+    return sorted(keys)
+
+
+# ============================================
+#               StandInHandler
+# ============================================
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers path-style ListObjectsV2 requests for `bucket` from the
+    server's sorted `keys`.
+    """
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        keys = self.server.keys
+        prefix = query.get("prefix", "")
+        maxKeys = min(int(query.get("max-keys", pageSize)), pageSize)
+
+        with self.server.lock:
+            self.server.requests += 1
+        sleep(self.server.latency)
+
+        start = bisect.bisect_left(keys, query.get("continuation-token", prefix))
+        page = []
+        for key in keys[start:]:
+            if not key.startswith(prefix) or len(page) == maxKeys:
+                break
+            page.append(key)
+        end = start + len(page)
+        truncated = end < len(keys) and keys[end].startswith(prefix)
+
+        body = '<?xml version="1.0" encoding="UTF-8"?>'
+        body += '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+        body += f"<Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+        body += f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{maxKeys}</MaxKeys>"
+        body += f"<IsTruncated>{str(truncated).lower()}</IsTruncated>"
+        if truncated:
+            token = escape(keys[end])
+            body += f"<NextContinuationToken>{token}</NextContinuationToken>"
+        for key in page:
+            body += f"<Contents><Key>{escape(key)}</Key>"
+            body += "<LastModified>2024-01-01T00:00:00.000Z</LastModified>"
+            body += '<ETag>"0123456789abcdef0123456789abcdef"</ETag>'
+            body += "<Size>262144</Size><StorageClass>STANDARD</StorageClass>"
+            body += "</Contents>"
+        body += "</ListBucketResult>"
+
+        data = body.encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+        pass
+
+
+# ============================================
+#               start_stand_in
+# ============================================
+def start_stand_in(keys: List[str], latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.keys = keys
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+# ============================================
+#                 full_scan
+# ============================================
+def full_scan(client, prefixes: List[str]) -> Iterator[dict]:
+    """
+    Lists the whole bucket and throws away everything that doesn't
+    start with one of `prefixes`, which is what the show commands used
+    to do.
+    """
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            if obj["Key"].startswith(tuple(prefixes)):
+                yield obj
+
+
+# ============================================
+#                  time_it
+# ============================================
+def time_it(server: ThreadingHTTPServer, listing: Callable[[], Iterator[dict]]) -> dict:
+    requests = server.requests
+    first = None
+    start = perf_counter()
+
+    keys = set()
+    for obj in listing():
+        if first is None:
+            first = perf_counter() - start
+        keys.add(obj["Key"])
+
+    return {
+        "seconds": perf_counter() - start,
+        "first": first or 0.0,
+        "requests": server.requests - requests,
+        "keys": keys,
+    }
+
+
+# ============================================
+#                  measure
+# ============================================
+def measure(
+    server: ThreadingHTTPServer,
+    listings: Dict[str, Callable[[], Iterator[dict]]],
+    repeat: int,
+) -> Tuple[List[dict], List[str]]:
+    """
+    Times each listing `repeat` times and returns a row of median
+    timings per listing, along with any listing that didn't find the
+    same keys as the first one (the full scan).
+    """
+    rows = []
+    failures = []
+    expected = None
+
+    for name, listing in listings.items():
+        runs = [time_it(server, listing) for _ in range(repeat)]
+        found = runs[-1]["keys"]
+        if expected is None:
+            expected = found
+        want = (
+            {k for k in expected if k.startswith("mn_")} if "mn" in name else expected
+        )
+        if found != want:
+            failures.append(f"`{name}` listed {len(found)} keys, not {len(want)}")
+        rows.append(
+            {
+                "listing": name,
+                "seconds": statistics.median(r["seconds"] for r in runs),
+                "first": statistics.median(r["first"] for r in runs),
+                "requests": runs[-1]["requests"],
+                "objects": len(found),
+            }
+        )
+
+    return rows, failures
+
+
+# ============================================
+#                print_table
+# ============================================
+def print_table(rows: List[dict]) -> None:
+    header = f"{'listing':<20}{'total (s)':>11}{'first (s)':>11}"
+    print(header + f"{'requests':>10}{'objects':>9}")
+    for row in rows:
+        print(
+            f"{row['listing']:<20}{row['seconds']:>11.3f}{row['first']:>11.3f}"
+            f"{row['requests']:>10}{row['objects']:>9}"
+        )
+
+
+# ============================================
+#                   main
+# ============================================
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--keys", type=int, default=40000, help="Keys in the bucket.")
+    parser.add_argument(
+        "--share", type=float, default=0.2, help="Fraction that are firmware."
+    )
+    parser.add_argument(
+        "--latency", type=float, default=30, help="Delay per request, in ms."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per listing.")
+    parser.add_argument("--json", action="store_true", help="Print raw JSON.")
+    args = parser.parse_args(argv)
+
+    keys = make_keys(args.keys, args.share)
+    server = start_stand_in(keys, args.latency / 1000)
+    client = boto3.client(
+        "s3",
+        endpoint_url=f"http://127.0.0.1:{server.server_address[1]}",
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        region_name="us-east-1",
+        config=Config(s3={"addressing_style": "path"}, max_pool_connections=32),
+    )
+
+    prefixes = [f"{t}_" for t in bc.catalogTargets]
+    listings = {
+        "full scan": lambda: full_scan(client, prefixes),
+        "scoped, 1 worker": lambda: list_objects(client, bucket, prefixes, 1),
+        "scoped": lambda: list_objects(client, bucket, prefixes),
+        "scoped, mn only": lambda: list_objects(client, bucket, ["mn_"]),
+    }
+
+    rows, failures = measure(server, listings, args.repeat)
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(
+            f"{len(keys)} keys, {rows[0]['objects']} firmware, "
+            f"{args.latency:g} ms/request"
+        )
+        print_table(rows)
+
+    for failure in failures:
+        print(f"MISMATCH: {failure}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
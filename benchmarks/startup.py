@@ -0,0 +1,143 @@
+"""
+Measures how long it takes `bootloader` to start up and resolve a
+command, along with the peak memory used, for a handful of commands.
+
+Each measurement is made in a fresh interpreter so that nothing is
+already sitting in `sys.modules`. The script exits with a non-zero
+status if a command pulls in a dependency it has no business loading
+(e.g., `logo` importing boto3) or if a command is slower than
+`--max-ms`, so it can be used to catch start-up regressions.
+
+Usage:
+    python benchmarks/startup.py [--repeat N] [--max-ms MS] [--json]
+"""
+import argparse
+import json
+import statistics
+import subprocess as sub
+import sys
+from typing import List
+
+# Modules that are expensive to import and that only some commands need
+heavyModules = [
+    "boto3",
+    "botocore",
+    "cloudpathlib",
+    "flexsea.device",
+    "pendulum",
+    "yaml",
+]
+
+# Command name -> modules that must NOT be imported when resolving it.
+# An empty command name is the bare application, which is what cleo
+# builds for `bootloader --help`
+cases = {
+    "": heavyModules,
+    "logo": heavyModules,
+    "show configs": ["flexsea.device", "pendulum", "yaml"],
+    "flash mn": [],
+    "list": [],
+}
+
+probe = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+
+from bootloader.application import Application
+
+app = Application()
+name = sys.argv[1]
+if name == "list":
+    app.all()
+elif name:
+    app.find(name)
+
+elapsed = time.perf_counter() - start
+
+try:
+    import resource
+except ImportError:
+    rss = None
+else:
+    # ru_maxrss is in KiB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+heavy = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+print(json.dumps({"ms": elapsed * 1000, "rssMb": rss, "heavy": heavy}))
+"""
+
+
+# ============================================
+#                  measure
+# ============================================
+def measure(name: str, repeat: int) -> dict:
+    """
+    Runs the probe `repeat` times for command `name` and returns the
+    median start-up time, the peak resident set size, and the heavy
+    modules that were imported.
+    """
+    results = []
+
+    for _ in range(repeat):
+        proc = sub.run(
+            [sys.executable, "-c", probe, name, json.dumps(heavyModules)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    rss = [r["rssMb"] for r in results if r["rssMb"] is not None]
+
+    return {
+        "command": name or "--help",
+        "ms": statistics.median(r["ms"] for r in results),
+        "rssMb": max(rss) if rss else None,
+        "heavy": results[-1]["heavy"],
+    }
+
+
+# ============================================
+#                   main
+# ============================================
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command.")
+    parser.add_argument("--max-ms", type=float, help="Fail if slower than this.")
+    parser.add_argument("--json", action="store_true", help="Print raw JSON.")
+    args = parser.parse_args(argv)
+
+    failures = []
+    rows = []
+
+    for name, forbidden in cases.items():
+        row = measure(name, args.repeat)
+        rows.append(row)
+
+        for module in forbidden:
+            if module in row["heavy"]:
+                failures.append(f"`{row['command']}` imported `{module}`")
+        # list loads every command on purpose, so it isn't held to the limit
+        if args.max_ms and name != "list" and row["ms"] > args.max_ms:
+            failures.append(f"`{row['command']}` took {row['ms']:.0f} ms")
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{'command':<16}{'time (ms)':>12}{'rss (MB)':>12}  heavy imports")
+        for row in rows:
+            rss = f"{row['rssMb']:.1f}" if row["rssMb"] is not None else "n/a"
+            heavy = ", ".join(row["heavy"]) or "-"
+            print(f"{row['command']:<16}{row['ms']:>12.1f}{rss:>12}  {heavy}")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
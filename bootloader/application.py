@@ -1,12 +1,16 @@
 from contextlib import suppress
 from importlib import import_module
+import os
 import sys
+from typing import Callable
 
 from cleo.application import Application as BaseApplication
+from cleo.commands.command import Command
 from cleo.exceptions import CleoError
 from cleo.formatters.style import Style
 from cleo.helpers import option
 from cleo.io.io import IO
+from cleo.loaders.factory_command_loader import FactoryCommandLoader
 from flexsea.utilities.system import get_os
 
 from bootloader import __version__
@@ -16,6 +20,24 @@ import bootloader.utilities.constants as bc
 from bootloader.utilities.system_utils import setup_cache
 
 
+# ============================================
+#                load_command
+# ============================================
+def load_command(name: str) -> Callable[[], Command]:
+    """
+    Returns a factory that imports and instantiates the command with
+    the given name. See `Application._load_commands`.
+    """
+
+    def _load() -> Command:
+        words = name.split(" ")
+        module = import_module("bootloader.commands." + ".".join(words))
+        cmdClass = getattr(module, "".join(c.title() for c in words) + "Command")
+        return cmdClass()
+
+    return _load
+
+
 # ============================================
 #                 Application
 # ============================================
@@ -48,13 +70,14 @@ class Application(BaseApplication):
         commands. E.g., `commands/env/create.py` would be the command
         `bootload env create`. The name in `COMMANDS` would be
         'env create'.
+
+        The commands are registered with a factory loader, so a
+        command's module (and its heavy dependencies, such as boto3 or
+        flexsea's `Device`) is only imported when cleo actually needs
+        that command.
         """
-        for name in COMMANDS:
-            words = name.split(" ")
-            module = import_module("bootloader.commands." + ".".join(words))
-            cmdClass = getattr(module, "".join(c.title() for c in words) + "Command")
-            command = cmdClass()
-            self.add(command)
+        factories = {name: load_command(name) for name in COMMANDS}
+        self.set_command_loader(FactoryCommandLoader(factories))
 
     # -----
     # _default_definition
@@ -66,13 +89,15 @@ class Application(BaseApplication):
         application-level options such as `--quiet` and `--verbose`
         are set. Here we override it in order to add the `--theme`
         option so each command does not need to be configured
-        individually.
+        individually. The same goes for `--mirror`.
         """
         definition = super()._default_definition
         themeOpt = option("--theme", "-t", "Sets theme.", flag=False)
         debugOpt = option("--debug", None, "Enables tracebacks.", flag=True)
+        mirrorOpt = option("--mirror", None, "URL of a LAN mirror to try.", flag=False)
         definition.add_option(themeOpt)
         definition.add_option(debugOpt)
+        definition.add_option(mirrorOpt)
         return definition
 
     # -----
@@ -112,6 +137,12 @@ class Application(BaseApplication):
         if not io.input.option("debug"):
             sys.tracebacklimit = 0
 
+        # Set in the environment rather than passed around so that it
+        # reaches every download, including those of the processes run by
+        # `flash fleet`
+        if io.input.option("mirror"):
+            os.environ[bc.mirrorEnvVar] = io.input.option("mirror")
+
         super()._configure_io(io)
 
     # -----
@@ -1,20 +1,24 @@
 COMMANDS = [
     "clean",
     "config create",
+    "config delete",
     "config download",
     "config rename",
     "config upload",
+    "download firmware",
     "download tools",
     "erase",
     "flash all",
     "flash bt121",
     "flash ex",
+    "flash fleet",
     "flash habs",
     "flash mn",
     "flash re",
     "flash xbee",
     "flash config",
     "logo",
+    "mirror serve",
     "show configs",
     "show devices",
     "show rigids",
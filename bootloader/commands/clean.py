@@ -3,8 +3,14 @@ import shutil
 import flexsea.utilities.constants as fxc
 from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
+from cleo.helpers import option
 
 import bootloader.utilities.constants as bc
+from bootloader.utilities.cache_gc import cache_entries
+from bootloader.utilities.cache_gc import evict
+from bootloader.utilities.cache_gc import parse_size
+from bootloader.utilities.cache_gc import read_pins
+from bootloader.utilities.cache_gc import select_evictions
 from bootloader.utilities.help import clean_help
 
 
@@ -18,10 +24,34 @@ class CleanCommand(BaseCommand):
 
     arguments = [
         argument(
-            "target", "Targets to clean. Can be: `all`, `libs`, `tools`, or `firmware`."
+            "target",
+            "Targets to clean: `all`, `libs`, `tools`, `firmware`, or `configs`.",
         )
     ]
 
+    options = [
+        option(
+            "maxSize",
+            None,
+            "Evict the least recently used files until the cache is under this size.",
+            flag=False,
+        ),
+        option(
+            "maxAge",
+            None,
+            "Evict files that haven't been used in this many days.",
+            flag=False,
+        ),
+        option(
+            "pin",
+            None,
+            "Never evict files matching this name or version (repeatable).",
+            flag=False,
+            multiple=True,
+        ),
+        option("dryRun", None, "Only show what would be evicted.", flag=True),
+    ]
+
     # -----
     # handle
     # -----
@@ -29,21 +59,73 @@ class CleanCommand(BaseCommand):
         target: str = self.argument("target").lower()
 
         try:
-            assert target in ["all", "libs", "tools", "firmware"]
+            assert target in ["all", "libs", "tools", "firmware", "configs"]
         except AssertionError:
             msg = "<error>Error:</error> the given argument must be one of `all`, "
-            msg += "`libs`, `tools`, or `firmware`. See `bootloader clean --help` "
-            msg += "for more info."
+            msg += "`libs`, `tools`, `firmware`, or `configs`. See "
+            msg += "`bootloader clean --help` for more info."
             self.line("")
             self.line(msg)
             return 1
 
+        if self.option("maxSize") or self.option("maxAge"):
+            return self._collect_garbage(target)
+
         if target in ["libs", "all"]:
             self._clean_libs()
         if target in ["tools", "all"]:
             self._clean_tools()
         if target in ["firmware", "all"]:
             self._clean_firmware()
+        if target in ["configs", "all"]:
+            self._clean_configs()
+
+        return 0
+
+    # -----
+    # _collect_garbage
+    # -----
+    def _collect_garbage(self, target: str) -> int:
+        """
+        Evicts files from the chosen caches according to `--maxSize` and
+        `--maxAge`, sparing anything pinned. When more than one cache is
+        chosen, they're treated as one for the purposes of `--maxSize`.
+        """
+        if target == "tools":
+            msg = "<error>Error:</error> `--maxSize` and `--maxAge` don't apply to "
+            msg += "`tools`."
+            self.line(msg)
+            return 1
+
+        try:
+            maxSize = (
+                parse_size(self.option("maxSize")) if self.option("maxSize") else None
+            )
+            maxAge = (
+                float(self.option("maxAge")) * 86400 if self.option("maxAge") else None
+            )
+        except ValueError as err:
+            self.line(f"<error>Error:</error> {err}")
+            return 1
+
+        pins = read_pins() + self.option("pin")
+        roots = [bc.gcTargets[target]] if target != "all" else bc.gcTargets.values()
+        entries = [e for root in roots for e in cache_entries(root, pins)]
+        evictions = select_evictions(entries, maxSize, maxAge)
+
+        verb = "Would evict" if self.option("dryRun") else "Evicting"
+        for entry in evictions:
+            self.line(f"{verb} {entry.path} ({entry.size / 1e6:.1f} MB)")
+            if not self.option("dryRun"):
+                evict(entry)
+
+        freed = sum(e.size for e in evictions)
+        kept = sum(e.size for e in entries) - freed
+        self.line("")
+        self.line(
+            f"{len(evictions)} evicted ({freed / 1e6:.1f} MB), {kept / 1e6:.1f} MB "
+            f"kept, {sum(e.pinned for e in entries)} pinned."
+        )
 
         return 0
 
@@ -64,3 +146,9 @@ class CleanCommand(BaseCommand):
     # -----
     def _clean_firmware(self) -> None:
         shutil.rmtree(bc.firmwarePath, ignore_errors=True)
+
+    # -----
+    # _clean_configs
+    # -----
+    def _clean_configs(self) -> None:
+        shutil.rmtree(bc.configsPath, ignore_errors=True)
@@ -0,0 +1,55 @@
+from time import perf_counter
+from typing import BinaryIO
+from typing import Callable
+
+from cleo.commands.command import Command as BaseCommand
+
+from bootloader.utilities.storage import get_storage
+
+
+# ============================================
+#             BaseUploadCommand
+# ============================================
+class BaseUploadCommand(BaseCommand):
+    # -----
+    # _upload
+    # -----
+    def _upload(
+        self, key: str, fill: Callable[[BinaryIO], None], label: str = "Uploading"
+    ) -> int:
+        """
+        Uploads `key` (e.g., a configuration archive) to the configs
+        storage, its contents being whatever `fill` writes to the file
+        it's given, while showing how much has been sent and how fast
+        after `label`. Returns the number of bytes uploaded.
+        """
+        start = perf_counter()
+        sent = 0
+
+        def progress(total: int) -> None:
+            nonlocal sent
+            sent = total
+            rate = sent / 1e6 / max(perf_counter() - start, 1e-6)
+            self.overwrite(f"{label}... {sent / 1e6:.1f} MB ({rate:.1f} MB/s)")
+
+        self.line("")
+        self.write(f"{label}...")
+
+        with get_storage("configs").open_write(key, progress) as out:
+            fill(out)
+
+        elapsed = max(perf_counter() - start, 1e-6)
+        msg = f"{label}... {self.application._SUCCESS} ({sent / 1e6:.1f} MB in "
+        msg += f"{elapsed:.1f} s, {sent / 1e6 / elapsed:.1f} MB/s)"
+        self.overwrite(msg)
+
+        return sent
+
+    # -----
+    # handle
+    # -----
+    def handle(self) -> int:
+        """
+        Each command decides what it uploads and how.
+        """
+        raise NotImplementedError
@@ -1,9 +1,10 @@
+from functools import partial
 from pathlib import Path
+import shutil
 import sys
-import tempfile
+from typing import BinaryIO
 from zipfile import ZipFile
 
-from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
 from cleo.helpers import option
 from flexsea.utilities.firmware import validate_given_firmware_version
@@ -11,13 +12,19 @@ import pendulum
 import yaml
 
 import bootloader.utilities.constants as bc
+from bootloader.utilities.config_blobs import blob_key
+from bootloader.utilities.config_blobs import file_sha256
+from bootloader.utilities.config_registry import ConfigRegistry
 from bootloader.utilities.help import config_create_help
+from bootloader.utilities.storage import get_storage
+
+from .base_upload import BaseUploadCommand
 
 
 # ============================================
 #           ConfigCreateCommand
 # ============================================
-class ConfigCreateCommand(BaseCommand):
+class ConfigCreateCommand(BaseUploadCommand):
     name = "config create"
     description = "Creates a collection of files that can be flashed via `flash config`"
     help = config_create_help()
@@ -30,6 +37,15 @@ class ConfigCreateCommand(BaseCommand):
         option("re-file", None, "File to use for Regulate.", flag=False),
         option("habs-file", None, "File to use for Habsolute.", flag=False),
         option("firmware-version", None, "Version of C library to use.", flag=False),
+        option(
+            "format",
+            None,
+            "Archive format: 1 puts the files in the archive, which every "
+            "version of bootloader can read; 2 stores each firmware file once, "
+            "however many configurations use it, but needs updated stations.",
+            flag=False,
+            default=str(bc.configCreateFormat),
+        ),
     ]
 
     # -----
@@ -50,60 +66,63 @@ class ConfigCreateCommand(BaseCommand):
     # handle
     # -----
     def handle(self) -> int:
+        """
+        The archive is written straight to storage as it's made, rather
+        than saved and then uploaded. In version 2 archives, which only
+        hold the info file, the firmware files are uploaded separately,
+        unless another configuration has uploaded them already.
+        """
         self._configName = self.argument("configName")
         archiveName = self._get_archive_name()
         files = self._get_files()
-        files["infoFile"] = self._get_info_file(files)
-
-        with ZipFile(archiveName, "w") as archive:
-            for value in files.values():
-                archive.write(value["path"], arcname=value["arcname"])
+        info = self._get_info(files)
 
         self._print_summary(files)
 
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("config upload", f"PLACEHOLDER {archiveName}")
+        if "blobs" in info:
+            self._upload_blobs(files, info["blobs"])
+            files = {}
+
+        def fill(out: BinaryIO) -> None:
+            with ZipFile(out, "w") as archive:
+                archive.writestr(bc.configInfoFile, yaml.safe_dump(info))
+                for value in files.values():
+                    archive.write(value["path"], arcname=value["arcname"])
+
+        size = self._upload(archiveName, fill)
+        ConfigRegistry().add(self._configName, info, size)
 
         return 0
 
+    # -----
+    # _upload_blobs
+    # -----
+    def _upload_blobs(self, files: dict, blobs: dict) -> None:
+        storage = get_storage("configs")
+
+        for value in files.values():
+            key = blob_key(blobs[value["arcname"]])
+            label = f"Uploading {value['arcname']}"
+            if storage.exists(key):
+                # Laid out like `_upload`'s output, so the next one starts
+                # on a line of its own
+                self.line("")
+                self.write(f"{label}... {self.application._SUCCESS} (already stored)")
+                continue
+            with open(value["path"], "rb") as fd:
+                fill = partial(shutil.copyfileobj, fd)
+                self._upload(key, fill, label)
+
     # -----
     # _get_archive_name
     # -----
     def _get_archive_name(self) -> str:
         archiveName = f"{self._configName}.zip"
 
-        # Check for existing local archive
-        if Path(archiveName).resolve().is_file():
-            if not self.confirm(
-                f"Archive {archiveName} already exists. Overwrite?", False
-            ):
-                msg = "Aborting. If you did not manually abort the command, try "
-                msg += "re-running with the `--no-interaction` option."
-                self.line(msg)
-                sys.exit(1)
-
-        # Make sure no archive with this name exists on S3
-        with tempfile.NamedTemporaryFile("w+") as fd:
-            # We can change the stream cleo writes to by accessing the _stream
-            # directly. This allows us to capture the output of a command in a
-            # file and then read that file to inspect the output. There's
-            # probably a cleaner way of doing this, but I don't know what it is
-            # The only potential issue is if something goes wrong in show configs,
-            # I need to set the stream back to stdout, otherwise the error messages
-            # will be suppressed. NOTE: contextlib.redirect_stdout doesn't seem to
-            # work
-            self.io.output._stream = fd
-            self.call("show configs")
-            self.io.output._stream = sys.stdout
-            fd.seek(0)
-            availableConfigs = fd.read()
-            if archiveName in availableConfigs:
-                raise RuntimeError(f"Error: {archiveName} already exists on S3.")
+        # Make sure no configuration with this name has been uploaded
+        if ConfigRegistry().exists(self._configName):
+            raise RuntimeError(f"Error: {archiveName} already exists.")
+
         return archiveName
 
     # -----
@@ -156,20 +175,27 @@ class ConfigCreateCommand(BaseCommand):
         return str(validate_given_firmware_version(fwVer, True))
 
     # -----
-    # _get_info_file
+    # _get_info
     # -----
-    def _get_info_file(self, files: dict) -> dict:
+    def _get_info(self, files: dict) -> dict:
         """
-        Writes meta-data about the configuration (such as firmware version)
-        to a file that gets included in the archive.
+        Returns meta-data about the configuration (such as firmware
+        version), which is written to the archive's info file.
         """
         info = {k: files[k]["arcname"] for k in files}
         info["date"] = str(pendulum.today())
         info["firmware_version"] = self._get_firmware_version()
-        with open(bc.configInfoFile, "w", encoding="utf8") as fd:
-            yaml.safe_dump(info, fd)
 
-        return {"path": bc.configInfoFile, "arcname": bc.configInfoFile}
+        fmt = self.option("format")
+        if fmt not in ("1", "2"):
+            raise RuntimeError("Error: the format must be 1 or 2.")
+        if fmt == "2":
+            info["format"] = 2
+            info["blobs"] = {
+                v["arcname"]: file_sha256(Path(v["path"])) for v in files.values()
+            }
+
+        return info
 
     # -----
     # _print_summary
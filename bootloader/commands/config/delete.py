@@ -0,0 +1,41 @@
+from cleo.commands.command import Command as BaseCommand
+from cleo.helpers import argument
+
+from bootloader.utilities.config_registry import ConfigRegistry
+from bootloader.utilities.help import config_delete_help
+from bootloader.utilities.storage import get_storage
+
+
+# ============================================
+#            ConfigDeleteCommand
+# ============================================
+class ConfigDeleteCommand(BaseCommand):
+    name = "config delete"
+    description = "Deletes an existing config."
+    help = config_delete_help()
+
+    arguments = [argument("configName", "Name of the configuration.")]
+
+    # -----
+    # handle
+    # -----
+    def handle(self) -> int:
+        configName = self.argument("configName")
+
+        storage = get_storage("configs")
+
+        if not storage.exists(f"{configName}.zip"):
+            self.line(f"Could not delete: {configName} does not exist.")
+            return 1
+
+        if not self.option("no-interaction"):
+            if not self.confirm(f"Delete {configName}?", False):
+                self.line("Aborting.")
+                return 1
+
+        storage.delete(f"{configName}.zip")
+        ConfigRegistry(storage).remove(configName)
+
+        self.line(f"Deleting: {self.application._SUCCESS}")
+
+        return 0
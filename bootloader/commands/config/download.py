@@ -1,13 +1,28 @@
+import json
+import os
+from pathlib import Path
+import shutil
+from typing import Dict
+from typing import List
+from typing import Set
+from zipfile import BadZipFile
 from zipfile import ZipFile
 
-import boto3
+from botocore.exceptions import BotoCoreError
+from botocore.exceptions import ClientError
 from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
-from flexsea.utilities.aws import s3_download
-from flexsea.utilities.aws import s3_find_object
+from cleo.helpers import option
+import yaml
 
 import bootloader.utilities.constants as bc
+from bootloader.utilities.cache_manifest import get_manifest
+from bootloader.utilities.config_blobs import place_blobs
+from bootloader.utilities.config_registry import read_config_info
 from bootloader.utilities.help import config_download_help
+from bootloader.utilities.remote_zip import RemoteZip
+from bootloader.utilities.storage import get_storage
+from bootloader.utilities.system_utils import download_file
 
 
 # ============================================
@@ -15,40 +30,321 @@ from bootloader.utilities.help import config_download_help
 # ============================================
 class ConfigDownloadCommand(BaseCommand):
     name = "config download"
-    description = "Downloads the configuration archive with the given name from S3."
+    description = "Downloads the configuration archive with the given name."
     help = config_download_help()
 
     arguments = [argument("archiveName", "Name of the archive to download.")]
 
+    options = [
+        option(
+            "target",
+            None,
+            "Only download this target's firmware. Can be given more than once.",
+            flag=False,
+            multiple=True,
+        ),
+    ]
+
     # -----
     # handle
     # -----
     def handle(self) -> int:
-        archiveName = self.argument("archiveName") + ".zip"
+        """
+        The archive is only downloaded if it isn't cached or the stored
+        one has changed (which costs one HEAD request to find out), and
+        only extracted if the cached copy isn't what was last extracted
+        or the extracted files have been changed since.
 
-        self.line("")
-        self.write("Connecting to S3...")
-        session = boto3.Session(profile_name=bc.dephyAwsProfile)
-        client = session.client("s3")
-        self.overwrite(f"Connecting to S3... {self.application._SUCCESS}")
+        With `--target`, only the info file and those targets' firmware
+        are read out of the stored archive, unless the whole archive is
+        cached already.
 
-        self.line("")
-        self.write("Searching for archive...")
-        archivePath = s3_find_object(archiveName, bc.dephyConfigsBucket, client)
-        self.overwrite(f"Searching for archive... {self.application._SUCCESS}")
+        The firmware files of version 2 configurations are stored apart
+        from the archive (see `bc.configFormat`). Those that are cached
+        already are copied rather than downloaded.
+        """
+        archiveName = self.argument("archiveName") + ".zip"
+        dest = bc.configsPath.joinpath(archiveName)
+        extracted = bc.configsPath.joinpath(self.argument("archiveName"))
+        targets = self.option("target")
 
         self.line("")
+        if targets and not get_manifest(bc.configsPath).is_valid(dest):
+            if self._download_targets(archiveName, extracted, targets):
+                return 0
+
         self.write("Downloading archive...")
-        dest = str(bc.configsPath.joinpath(archiveName))
-        s3_download(archivePath, bc.dephyConfigsBucket, dest, bc.dephyAwsProfile)
-        self.overwrite(f"Downloading archive... {self.application._SUCCESS}")
+        if self._is_current(archiveName, dest):
+            get_manifest(bc.configsPath).touch(dest)
+            msg = f"Downloading archive... {self.application._SUCCESS} (up to date)"
+        else:
+            # The S3 storage searches the bucket for archives that aren't at
+            # the top of it
+            download_file(get_storage("configs"), archiveName, dest, bc.configsPath)
+            msg = f"Downloading archive... {self.application._SUCCESS}"
+        self.overwrite(msg)
 
         self.line("")
         self.write("Extracting archive...")
-        extractionDest = bc.configsPath.joinpath(self.argument("archiveName"))
-        extractionDest.mkdir(parents=True, exist_ok=True)
-        with ZipFile(dest, "r") as archive:
-            archive.extractall(path=extractionDest)
-        self.overwrite(f"Extracting archive... {self.application._SUCCESS}")
+        if self._is_extracted(dest, extracted):
+            msg = f"Extracting archive... {self.application._SUCCESS} (up to date)"
+        else:
+            self._extract(dest, extracted)
+            msg = f"Extracting archive... {self.application._SUCCESS}"
+        self.overwrite(msg)
 
         return 0
+
+    # -----
+    # _is_current
+    # -----
+    def _is_current(self, archiveName: str, dest: Path) -> bool:
+        """
+        Returns `True` if the cached archive is intact and has the same
+        ETag as the stored one. If the storage can't be reached, an
+        intact cached archive is used as is.
+        """
+        manifest = get_manifest(bc.configsPath)
+        if not manifest.is_valid(dest):
+            return False
+
+        try:
+            current = get_storage("configs").head(archiveName)
+        except FileNotFoundError:
+            # It may just not be at the top of the bucket, which the
+            # download will find out
+            return False
+        except (BotoCoreError, ClientError, OSError):
+            self.overwrite("<warning>Could not reach storage; using cached archive.</>")
+            self.line("")
+            return True
+
+        return current.etag == manifest.get(dest)["etag"]
+
+    # -----
+    # _download_targets
+    # -----
+    def _download_targets(
+        self, archiveName: str, dest: Path, targets: List[str]
+    ) -> bool:
+        """
+        Reads the info file and the firmware for `targets` straight out
+        of the stored archive into `dest`, keeping any files already
+        there from the same archive. Returns `False` if that can't be
+        done, e.g., because the archive isn't at the top of the bucket,
+        in which case the whole archive should be downloaded instead.
+        """
+        try:
+            obj = get_storage("configs").head(archiveName)
+        except FileNotFoundError:
+            return False
+        except (BotoCoreError, ClientError, OSError):
+            if not self._has_targets(dest, self._unchanged(dest, None), targets):
+                raise
+            self.line("<warning>Could not reach storage; using cached files.</>")
+            return True
+
+        msg = f"Downloading {', '.join(targets)}..."
+        self.write(msg)
+        have = self._unchanged(dest, obj.etag)
+        if self._has_targets(dest, have, targets):
+            self.overwrite(f"{msg} {self.application._SUCCESS} (up to date)")
+            return True
+
+        try:
+            with RemoteZip(get_storage("configs"), obj) as archive:
+                if not have:
+                    _clear(dest)
+                # The info file says which files the targets need
+                if bc.configInfoFile not in have:
+                    have.add(_extract_file(archive, bc.configInfoFile, dest, {}))
+                blobs = _read_info(dest).get("blobs", {})
+                for name in set(_target_files(dest, targets)) - have:
+                    have.add(_extract_file(archive, name, dest, blobs))
+        except BadZipFile:
+            self.overwrite("")
+            return False
+
+        with open(dest.joinpath(bc.configExtractedFile), "w", encoding="utf8") as fd:
+            json.dump({"etag": obj.etag, "files": sorted(have)}, fd)
+        self.overwrite(f"{msg} {self.application._SUCCESS}")
+
+        return True
+
+    # -----
+    # _unchanged
+    # -----
+    def _unchanged(self, dest: Path, etag: str | None) -> Set[str]:
+        """
+        Returns the files in `dest` that haven't changed since they were
+        extracted from the archive with the ETag `etag` (or from any
+        archive, if `etag` is `None`).
+        """
+        manifest = get_manifest(bc.configsPath)
+
+        try:
+            with open(
+                dest.joinpath(bc.configExtractedFile), "r", encoding="utf8"
+            ) as fd:
+                extracted = json.load(fd)
+        except (OSError, ValueError):
+            return set()
+
+        if etag is not None and extracted.get("etag") != etag:
+            return set()
+
+        return {f for f in extracted["files"] if manifest.is_valid(dest.joinpath(f))}
+
+    # -----
+    # _has_targets
+    # -----
+    def _has_targets(self, dest: Path, have: Set[str], targets: List[str]) -> bool:
+        """
+        Returns `True` if `have` includes the info file and the files
+        that `targets` need.
+        """
+        if bc.configInfoFile not in have:
+            return False
+
+        return set(_target_files(dest, targets)) <= have
+
+    # -----
+    # _is_extracted
+    # -----
+    def _is_extracted(self, archiveFile: Path, dest: Path) -> bool:
+        """
+        Returns `True` if `dest` was extracted from `archiveFile`, as it
+        is now, and none of the extracted files have changed since.
+        """
+        manifest = get_manifest(bc.configsPath)
+
+        try:
+            with open(
+                dest.joinpath(bc.configExtractedFile), "r", encoding="utf8"
+            ) as fd:
+                extracted = json.load(fd)
+        except (OSError, ValueError):
+            return False
+
+        if extracted.get("archive") != manifest.get(archiveFile)["sha256"]:
+            return False
+
+        return all(manifest.is_valid(dest.joinpath(f)) for f in extracted["files"])
+
+    # -----
+    # _extract
+    # -----
+    def _extract(self, archiveFile: Path, dest: Path) -> None:
+        """
+        Extracts the archive next to `dest` and then swaps it into
+        place, so that `dest` is never left half-extracted, and records
+        each extracted file in the configs manifest. Last of all, it
+        notes which archive `dest` came from (see `_is_extracted`).
+        """
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+
+        try:
+            with ZipFile(archiveFile, "r") as archive:
+                archive.extractall(path=tmp)
+                info = read_config_info(archive)
+            _check_format(info, dest.name)
+            place_blobs(info.get("blobs", {}), tmp)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        _clear(dest)
+        os.replace(tmp, dest)
+
+        manifest = get_manifest(bc.configsPath)
+        files = []
+        for path in dest.rglob("*"):
+            if path.is_file():
+                manifest.record(path)
+                files.append(path.relative_to(dest).as_posix())
+
+        # The ETag lets `--target` use these files, too
+        record = manifest.get(archiveFile)
+        marker = {"archive": record["sha256"], "etag": record["etag"], "files": files}
+        with open(dest.joinpath(bc.configExtractedFile), "w", encoding="utf8") as fd:
+            json.dump(marker, fd)
+
+
+# ============================================
+#                  _clear
+# ============================================
+def _clear(dest: Path) -> None:
+    """
+    Removes the extracted configuration `dest`, if there is one, and
+    its files' records from the configs manifest.
+    """
+    if not dest.exists():
+        return
+
+    manifest = get_manifest(bc.configsPath)
+    for path in dest.rglob("*"):
+        if path.is_file():
+            manifest.forget(path)
+    shutil.rmtree(dest)
+
+
+# ============================================
+#               _extract_file
+# ============================================
+def _extract_file(
+    archive: RemoteZip, name: str, dest: Path, blobs: Dict[str, str]
+) -> str:
+    """
+    Extracts the file `name` from `archive` into `dest`, or, if it's in
+    `blobs`, fetches it from where the blobs are stored, then records
+    it in the configs manifest and returns its name.
+    """
+    if name in blobs:
+        place_blobs({name: blobs[name]}, dest)
+    else:
+        archive.extract(name, dest)
+    get_manifest(bc.configsPath).record(dest.joinpath(name))
+
+    return name
+
+
+# ============================================
+#               _target_files
+# ============================================
+def _target_files(dest: Path, targets: List[str]) -> List[str]:
+    """
+    Returns the files that `targets` need, according to the info file
+    of the extracted configuration `dest`.
+    """
+    info = _read_info(dest)
+
+    missing = [t for t in targets if t not in info]
+    if missing:
+        msg = f"Error: {dest.name} has no firmware for {', '.join(missing)}."
+        raise RuntimeError(msg)
+
+    return [info[t] for t in targets]
+
+
+# ============================================
+#                 _read_info
+# ============================================
+def _read_info(dest: Path) -> dict:
+    """
+    Returns the contents of the info file of the extracted configuration
+    `dest`.
+    """
+    with open(dest.joinpath(bc.configInfoFile), "r", encoding="utf8") as fd:
+        info = yaml.safe_load(fd) or {}
+    _check_format(info, dest.name)
+
+    return info
+
+
+# ============================================
+#                _check_format
+# ============================================
+def _check_format(info: dict, name: str) -> None:
+    if info.get("format", 1) > bc.configFormat:
+        raise RuntimeError(f"Error: {name} needs a newer version of bootloader.")
@@ -1,9 +1,9 @@
 from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
-from cloudpathlib import S3Client
 
-import bootloader.utilities.constants as bc
+from bootloader.utilities.config_registry import ConfigRegistry
 from bootloader.utilities.help import config_rename_help
+from bootloader.utilities.storage import get_storage
 
 
 # ============================================
@@ -26,18 +26,19 @@ class ConfigRenameCommand(BaseCommand):
         originalName = self.argument("originalName")
         newName = self.argument("newName")
 
-        client = S3Client(profile_name=bc.dephyAwsProfile)
+        storage = get_storage("configs")
+        registry = ConfigRegistry(storage)
 
-        originalPath = client.CloudPath(
-            f"s3://{bc.dephyConfigsBucket}/{originalName}.zip"
-        )
-        newPath = client.CloudPath(f"s3://{bc.dephyConfigsBucket}/{newName}.zip")
-
-        if not originalPath.exists():
+        if not storage.exists(f"{originalName}.zip"):
             self.line(f"Could not rename: {originalName} does not exist.")
             return 1
 
-        originalPath.rename(newPath)
+        if registry.exists(newName):
+            self.line(f"Could not rename: {newName} already exists.")
+            return 1
+
+        storage.rename(f"{originalName}.zip", f"{newName}.zip")
+        registry.rename(originalName, newName)
 
         self.line(f"Renaming: {self.application._SUCCESS}")
 
@@ -1,18 +1,23 @@
-import botocore.exceptions as bce
-import boto3
-from cleo.commands.command import Command as BaseCommand
+from pathlib import Path
+import shutil
+from zipfile import ZipFile
+
 from cleo.helpers import argument
 
 import bootloader.utilities.constants as bc
+from bootloader.utilities.config_registry import ConfigRegistry
+from bootloader.utilities.config_registry import read_config_info
 from bootloader.utilities.help import config_upload_help
 
+from .base_upload import BaseUploadCommand
+
 
 # ============================================
 #            ConfigUploadCommand
 # ============================================
-class ConfigUploadCommand(BaseCommand):
+class ConfigUploadCommand(BaseUploadCommand):
     name = "config upload"
-    description = "Uploads a configuration archive to S3."
+    description = "Uploads a configuration archive."
     help = config_upload_help()
     hidden = False
 
@@ -22,28 +27,15 @@ class ConfigUploadCommand(BaseCommand):
     # handle
     # -----
     def handle(self) -> int:
-        self.line("")
-        self.write("Uploading...")
-
-        try:
-            client = boto3.Session(profile_name=bc.dephyAwsProfile).client("s3")
-        except bce.ProfileNotFound as err:
-            msg = "Error: could not find valid 'dephy' profile in '~/.aws/credentials'."
-            msg += " Could not upload configuration."
-            raise RuntimeError(msg) from err
-
-        archive = self.argument("archiveName")
-
-        try:
-            client.upload_file(archive, bc.dephyConfigsBucket, archive)
-        except (bce.PartialCredentialsError, bce.NoCredentialsError) as err:
-            msg = "Error: invalid credentials. Please check your access keys stored "
-            msg += "in '~/.aws/credentials'."
-            raise RuntimeError(msg) from err
-        except bce.ClientError as err:
-            msg = "Error: could not connect to S3. Upload failed."
-            raise RuntimeError(msg) from err
-
-        self.overwrite(f"Uploading... {self.application._SUCCESS}")
+        archive = Path(self.argument("archiveName"))
+
+        with ZipFile(archive, "r") as zf:
+            info = read_config_info(zf)
+
+        with open(archive, "rb") as fd:
+            size = self._upload(
+                archive.name, lambda out: shutil.copyfileobj(fd, out, bc.uploadPartSize)
+            )
+        ConfigRegistry().add(archive.stem, info, size)
 
         return 0
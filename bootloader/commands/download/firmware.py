@@ -0,0 +1,135 @@
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import List
+
+from cleo.commands.command import Command as BaseCommand
+from cleo.helpers import argument
+from cleo.helpers import option
+
+import bootloader.utilities.constants as bc
+from bootloader.commands.show.base_show import catalogOptions
+from bootloader.utilities.cache_manifest import get_manifest
+from bootloader.utilities.firmware_catalog import FirmwareCatalog
+from bootloader.utilities.firmware_catalog import FirmwareRecord
+from bootloader.utilities.help import download_firmware_help
+from bootloader.utilities.storage import get_storage
+from bootloader.utilities.system_utils import download_file
+
+
+# ============================================
+#           DownloadFirmwareCommand
+# ============================================
+class DownloadFirmwareCommand(BaseCommand):
+    name = "download firmware"
+    description = "Downloads every firmware file matching the given query."
+    help = download_firmware_help()
+    hidden = False
+
+    arguments = [
+        argument("fwVersion", "Firmware version to download.", optional=True),
+    ]
+
+    options = [o for o in catalogOptions if o.name != "fwVersion"] + [
+        option(
+            "jobs", "-j", "Maximum number of files to download at once.", flag=False
+        ),
+    ]
+
+    # -----
+    # handle
+    # -----
+    def handle(self) -> int:
+        filters = {
+            f: self.option(f) for f in bc.catalogFields + ["spec"] if f != "version"
+        }
+        filters["version"] = self.argument("fwVersion")
+        filters["target"] = self.option("target")
+
+        if not any(filters.values()):
+            msg = "<error>Error:</error> give a version and/or at least one filter, "
+            msg += "e.g., `bootloader download firmware 9.1.0 --device exo`."
+            self.line(msg)
+            return 1
+
+        catalog = FirmwareCatalog()
+        catalog.ensure_fresh(
+            [filters["target"]] if filters["target"] else bc.catalogTargets,
+            self.option("refresh"),
+        )
+
+        records = catalog.query(**filters)
+        if not records:
+            self.line("No firmware matches the given query.")
+            return 1
+
+        manifest = get_manifest(bc.firmwarePath)
+        missing = [
+            r
+            for r in records
+            if not manifest.is_valid(bc.firmwarePath.joinpath(r.name))
+        ]
+
+        self.line("")
+        msg = f"{len(records)} files match, {len(records) - len(missing)} "
+        msg += "already cached."
+        self.line(msg)
+
+        if not missing:
+            return 0
+
+        jobs = int(self.option("jobs")) if self.option("jobs") else bc.prefetchWorkers
+
+        return self._download(missing, jobs)
+
+    # -----
+    # _download
+    # -----
+    def _download(self, records: List[FirmwareRecord], jobs: int) -> int:
+        """
+        Downloads the files for the given records, `jobs` at a time,
+        showing how many are done and the combined download rate.
+        """
+        done = 0
+        downloaded = 0
+        failed = []
+        start = perf_counter()
+
+        self.write(f"Downloading... 0/{len(records)}")
+
+        with ThreadPoolExecutor(jobs, thread_name_prefix="prefetch") as pool:
+            futures = {
+                pool.submit(
+                    download_file,
+                    get_storage("firmware"),
+                    r.name,
+                    bc.firmwarePath.joinpath(r.name),
+                    bc.firmwarePath,
+                ): r
+                for r in records
+            }
+
+            for future in as_completed(futures):
+                done += 1
+                try:
+                    downloaded += future.result().stat().st_size
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    failed.append(f"{futures[future].name}: {err}")
+
+                rate = downloaded / 1e6 / (perf_counter() - start)
+                msg = f"Downloading... {done}/{len(records)} "
+                msg += f"({downloaded / 1e6:.1f} MB, {rate:.1f} MB/s)"
+                self.overwrite(msg)
+
+        elapsed = perf_counter() - start
+        self.line("")
+        self.line("")
+        msg = f"Downloaded {len(records) - len(failed)} files "
+        msg += f"({downloaded / 1e6:.1f} MB) in {elapsed:.1f} s, "
+        msg += f"{downloaded / 1e6 / elapsed:.1f} MB/s."
+        self.line(msg)
+
+        for failure in failed:
+            self.line(f"<error>Failed:</error> {failure}")
+
+        return 1 if failed else 0
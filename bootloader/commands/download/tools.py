@@ -8,11 +8,11 @@ import zipfile
 
 from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
-from flexsea.utilities.aws import s3_download
-import flexsea.utilities.constants as fxc
 
 import bootloader.utilities.constants as bc
 from bootloader.utilities.help import tools_help
+from bootloader.utilities.ranged_download import file_lock
+from bootloader.utilities.storage import get_storage
 from bootloader.utilities.system_utils import run_command
 
 
@@ -54,26 +54,33 @@ class DownloadToolsCommand(BaseCommand):
 
             dest = bc.toolsPath.joinpath(opSys, tool)
 
-            if not dest.exists():
-                self.line(f"\n\t<info>{tool}</info> <warning>not found.</warning>")
-                self.write("\tDownloading...")
-                dest.parent.mkdir(parents=True, exist_ok=True)
+            # Another process (e.g., another device being flashed) may be
+            # fetching the same tool, so it's only seen once it's extracted
+            with file_lock(dest.parent.joinpath(".locks", f"{dest.name}.lock")):
+                if not dest.exists():
+                    self._download_tool(opSys, tool, dest)
+                else:
+                    msg = f"Searching for: <info>{tool}</info>..."
+                    msg += f"{self.application._SUCCESS}\n"
+                    self.overwrite(msg)
 
-                toolObj = str(Path(bc.toolsDir).joinpath(opSys, tool).as_posix())
-                s3_download(toolObj, fxc.dephyPublicFilesBucket, str(dest))
+    # -----
+    # _download_tool
+    # -----
+    def _download_tool(self, opSys: str, tool: str, dest: Path) -> None:
+        self.line(f"\n\t<info>{tool}</info> <warning>not found.</warning>")
+        self.write("\tDownloading...")
+        dest.parent.mkdir(parents=True, exist_ok=True)
 
-                if zipfile.is_zipfile(dest):
-                    with zipfile.ZipFile(dest, "r") as archive:
-                        base = dest.name.split(".")[0]
-                        extractedDest = Path(os.path.dirname(dest)).joinpath(base)
-                        archive.extractall(extractedDest)
+        get_storage("tools").download(f"{opSys}/{tool}", dest)
 
-                self.overwrite(f"\tDownloading... {self.application._SUCCESS}\n")
+        if zipfile.is_zipfile(dest):
+            with zipfile.ZipFile(dest, "r") as archive:
+                base = dest.name.split(".")[0]
+                extractedDest = Path(os.path.dirname(dest)).joinpath(base)
+                archive.extractall(extractedDest)
 
-            else:
-                msg = f"Searching for: <info>{tool}</info>..."
-                msg += f"{self.application._SUCCESS}\n"
-                self.overwrite(msg)
+        self.overwrite(f"\tDownloading... {self.application._SUCCESS}\n")
 
     # -----
     # _path_setup
@@ -1,16 +1,17 @@
 from typing import List
 
-from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
 from cleo.helpers import option
 
 from bootloader.utilities.help import all_help
 
+from .base_session import BaseSessionCommand
+
 
 # ============================================
 #              FlashAllCommand
 # ============================================
-class FlashAllCommand(BaseCommand):
+class FlashAllCommand(BaseSessionCommand):
     name = "flash all"
     description = "Flashes new firmware onto xbee, bt121, habs, ex, re, and mn."
     help = all_help()
@@ -22,17 +23,38 @@ class FlashAllCommand(BaseCommand):
     ]
 
     options = [
-        option("to", "Version to flash, e.g., `9.1.0`, or path to file to use."),
-        option("rigidVersion", "PCB hardware version, e.g., `4.1B`."),
-        option("device", "Name of the device, e.g., actpack."),
-        option("side", "left, right, or none."),
-        option("motorType", "Either 'actpack', 'exo', or '61or91'"),
-        option("led", "Either 'mono', 'multi', or 'stealth'"),
-        option("address", "Bluetooth address."),
-        option("level", "Gatt level to use."),
-        option("buddyAddress", "Bluetooth address of device's buddy."),
+        option(
+            "to",
+            None,
+            "Version to flash, e.g., `9.1.0`, or path to file to use.",
+            flag=False,
+        ),
+        option("rigidVersion", None, "PCB hardware version, e.g., `4.1B`.", flag=False),
+        option("device", None, "Name of the device, e.g., actpack.", flag=False),
+        option("side", None, "left, right, or none.", flag=False),
+        option("motorType", None, "Either 'actpack', 'exo', or '61or91'", flag=False),
+        option("led", None, "Either 'mono', 'multi', or 'stealth'", flag=False),
+        option("address", None, "Bluetooth address.", flag=False),
+        option("level", None, "Gatt level to use.", flag=False),
+        option(
+            "buddyAddress", None, "Bluetooth address of device's buddy.", flag=False
+        ),
         option("baudRate", "-b", "Device baud rate.", flag=False, default=230400),
         option("libFile", "-l", "C lib for interacting with Manage.", flag=False),
+        option(
+            "powerCycle",
+            None,
+            "How to wait for the power cycle: auto, manual, or none.",
+            flag=False,
+            default="auto",
+        ),
+        option(
+            "skipCurrent",
+            None,
+            "Don't flash targets already running the requested firmware.",
+            flag=True,
+        ),
+        option("trace", None, "Write a timing trace to this file.", flag=False),
     ]
 
     # -----
@@ -48,6 +70,8 @@ class FlashAllCommand(BaseCommand):
     # handle
     # -----
     def handle(self) -> int:
+        self.call("logo")
+
         # Handle the args and opts passed to every command
         self._argList = f"{self.argument('port')} {self.argument('currentMnFw')} "
 
@@ -55,127 +79,42 @@ class FlashAllCommand(BaseCommand):
             self._optList += f"--baudRate {self.option('baudRate')} "
         if self.option("libFile"):
             self._optList += f"--libFile {self.option('libFile')} "
-
-        self._flash_xbee()
-        self._flash_bt121()
-        self._flash_habs()
-        self._flash_ex()
-        self._flash_re()
-        self._flash_mn()
+        if self.option("powerCycle"):
+            self._optList += f"--powerCycle {self.option('powerCycle')} "
+        if self.option("skipCurrent"):
+            self._optList += "--skipCurrent "
+
+        # We ask all of our questions before flashing anything so that the
+        # flashing itself can run unattended (apart from power cycling)
+        plan = []
+
+        for target, additionalArgs, optional in (
+            ("xbee", ["address", "buddyAddress"], True),
+            ("bt121", ["address", "level"], True),
+            ("habs", ["to"], True),
+            ("ex", ["to", "rigidVersion", "motorType"], False),
+            ("re", ["to", "rigidVersion", "led"], False),
+            ("mn", ["to", "rigidVersion", "device", "side"], False),
+        ):
+            self.line("")
+            if optional and not self.confirm(f"Flash {target}?"):
+                continue
+            args = self._get_arg_list(additionalArgs)
+            # NOTE: There's a bug in cleo about how arguments are parsed when
+            # `call` is used from an existing command. Basically, it skips the
+            # first word given as an arg, so call('download tools', 'arg1 arg2')
+            # is interpreted by cleo as trying to call the command
+            # `download tools arg2`, which is wrong. The PLACEHOLDER should be
+            # removed when this is fixed
+            # https://github.com/python-poetry/cleo/issues/130
+            plan.append(
+                (target, f"PLACEHOLDER {args} {self._optList} --no-interaction")
+            )
+
+        self._flash_targets(plan)
 
         return 0
 
-    # -----
-    # _flash_xbee
-    # -----
-    def _flash_xbee(self) -> None:
-        self.line("")
-
-        if not self.confirm("Flash xbee?"):
-            return
-        args = self._get_arg_list(["address", "buddyAddress"])
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("flash xbee", f"PLACEHOLDER {args} {self._optList} --no-interaction")
-
-        self.line("")
-
-    # -----
-    # _flash_bt121
-    # -----
-    def _flash_bt121(self) -> None:
-        self.line("")
-
-        if not self.confirm("Flash bt121?"):
-            return
-        args = self._get_arg_list(["address", "level"])
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("flash bt121", f"PLACEHOLDER {args} {self._optList} --no-interaction")
-
-        self.line("")
-
-    # -----
-    # _flash_habs
-    # -----
-    def _flash_habs(self) -> None:
-        self.line("")
-
-        if not self.confirm("Flash habs?"):
-            return
-        args = self._get_arg_list(["to"])
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("flash habs", f"PLACEHOLDER {args} {self._optList} --no-interaction")
-
-        self.line("")
-
-    # -----
-    # _flash_ex
-    # -----
-    def _flash_ex(self) -> None:
-        self.line("")
-
-        self.line("Flashing Execute")
-        args = self._get_arg_list(["to", "rigidVersion", "motorType"])
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("flash ex", f"PLACEHOLDER {args} {self._optList} --no-interaction")
-
-        self.line("")
-
-    # -----
-    # _flash_re
-    # -----
-    def _flash_re(self) -> None:
-        self.line("")
-
-        self.line("Flashing Regulate")
-        args = self._get_arg_list(["to", "rigidVersion", "led"])
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("flash re", f"PLACEHOLDER {args} {self._optList} --no-interaction")
-
-        self.line("")
-
-    # -----
-    # _flash_mn
-    # -----
-    def _flash_mn(self) -> None:
-        self.line("")
-
-        self.line("Flashing Manage")
-        args = self._get_arg_list(["to", "rigidVersion", "device", "side"])
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("flash mn", f"PLACEHOLDER {args} {self._optList} --no-interaction")
-
-        self.line("")
-
     # -----
     # _get_arg_list
     # -----
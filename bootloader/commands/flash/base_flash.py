@@ -1,14 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from pathlib import Path
+from subprocess import TimeoutExpired
 import sys
+from time import sleep
+from typing import Callable
 from typing import List
 
 from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import option
+from cleo.io.buffered_io import BufferedIO
+from cleo.io.inputs.string_input import StringInput
+from cleo.io.outputs.output import Type as OutputType
 from flexsea.device import Device
 from flexsea.utilities.firmware import validate_given_firmware_version
 from semantic_version import Version
 
 import bootloader.utilities.constants as bc
+from bootloader.utilities.firmware_image import check_image
+from bootloader.utilities.flash_history import flashed_file_matches
+from bootloader.utilities.flash_history import record_flash
+from bootloader.utilities.flash_session import FlashSession
+from bootloader.utilities.readiness import port_serial_number
+from bootloader.utilities.readiness import wait_for_bootloader
+from bootloader.utilities.readiness import wait_for_port_release
+from bootloader.utilities.readiness import wait_for_port_return
+from bootloader.utilities.readiness import wait_for_power_cycle
+from bootloader.utilities.readiness import WaitResult
+from bootloader.utilities.system_utils import run_command
+from bootloader.utilities.tool_runner import ToolError
+from bootloader.utilities.tool_runner import ToolProgress
+from bootloader.utilities.tool_runner import ToolReporter
+from bootloader.utilities.tracing import Tracer
+
+
+# ============================================
+#             FlashToolReporter
+# ============================================
+class FlashToolReporter(ToolReporter):
+    """
+    Shows a flash tool's progress on a single line that's redrawn as
+    the tool goes. When running verbosely, the tool's own output is
+    shown instead.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, command: BaseCommand, msg: str) -> None:
+        self._command = command
+        self._msg = msg
+        self._rate: float | None = None
+        self._verbose = command.io.is_verbose()
+
+    # -----
+    # start
+    # -----
+    def start(self) -> None:
+        if self._verbose:
+            self._command.line(f"{self._msg}...")
+        else:
+            self._command.write(f"{self._msg}...")
+
+    # -----
+    # finish
+    # -----
+    def finish(self, status: str, elapsed: float) -> None:
+        msg = f"{self._msg}... {status} ({elapsed:.1f} s"
+        if self._rate is not None:
+            msg += f", {self._rate / 1024:.1f} KiB/s"
+        msg += ")"
+
+        if self._verbose:
+            self._command.line(msg)
+        else:
+            self._command.overwrite(msg)
+            self._command.line("")
+
+    # -----
+    # output
+    # -----
+    def output(self, line: str) -> None:
+        if self._verbose:
+            self._command.line(line)
+
+    # -----
+    # progress
+    # -----
+    def progress(self, progress: ToolProgress) -> None:
+        self._rate = progress.rate
+        if self._verbose:
+            return
+
+        details = []
+        if progress.rate is not None:
+            details.append(f"{progress.rate / 1024:.1f} KiB/s")
+        if progress.eta is not None:
+            details.append(f"ETA {progress.eta:.0f} s")
+
+        msg = f"{self._msg}... {progress.fraction:.0%}"
+        if details:
+            msg += f" ({', '.join(details)})"
+        self._command.overwrite(msg)
+
+    # -----
+    # retry
+    # -----
+    def retry(self, error: ToolError, delay: float) -> None:
+        reason = error.output[-1] if error.output else "no output"
+        if not self._verbose:
+            self._command.line("")
+        msg = f"<warning>Failed ({reason}), retrying in {delay:.0f} s</warning>"
+        self._command.line(msg)
+        self._rate = None
+        self.start()
 
 
 # ============================================
@@ -18,7 +123,7 @@ class BaseFlashCommand(BaseCommand):
     """
     The overall process for flashing each target is the same; the
     differences lie in the required arguments, the third-party tool
-    used for actually doing the flashing, and the sleeps involved.
+    used for actually doing the flashing, and the waits involved.
 
     The goal of this object is to encapsulate the overall process,
     leaving the minor differences to the target-specific commands.
@@ -28,6 +133,20 @@ class BaseFlashCommand(BaseCommand):
         option("baudRate", "-b", "Device baud rate.", flag=False, default=230400),
         option("libFile", "-l", "C lib for interacting with Manage.", flag=False),
         option("limitedSpec", None, "Use limited spec firmware file.", flag=True),
+        option(
+            "powerCycle",
+            None,
+            "How to wait for the power cycle: auto, manual, or none.",
+            flag=False,
+            default="auto",
+        ),
+        option(
+            "skipCurrent",
+            None,
+            "Don't flash targets already running the requested firmware.",
+            flag=True,
+        ),
+        option("trace", None, "Write a timing trace to this file.", flag=False),
     ]
 
     # -----
@@ -43,16 +162,23 @@ class BaseFlashCommand(BaseCommand):
         self._device: Device | None = None
         self._deviceName: str = ""
         self._flashCmd: List[str] | None = None
+        self._firmwareNeedsDevice: bool = False
         self._fwFile: Path | str | None = None
+        self._fwVersion: Version | None = None
         self._led: str = ""
         self._level: str = ""
         self._libFile: str = ""
         self._motorType: str = ""
         self._port: str = ""
+        self._powerCycle: str = ""
         self._rigidVersion: str = ""
+        self._session: FlashSession | None = None
         self._side: str = ""
+        self._skipCurrent: bool = False
         self._target: str = ""
         self._to: str = ""
+        self._trace: str = ""
+        self._tracer: Tracer | None = None
 
     # -----
     # handle
@@ -72,33 +198,81 @@ class BaseFlashCommand(BaseCommand):
             version number, we check to see if the file exists and,
             if not, download it from S3
         * Connect to the device
+
+        These first three steps are independent of one another and
+        each is dominated by network or serial latency, so we run them
+        at the same time (see `_prepare`).
+
+        * If asked to, check whether the target is already running the
+            requested firmware and, if so, stop here
         * Build the command that will run the third-party flash
             tool
         * Provide a summary to the user and ask for their final
             confirmation
         * Put the device into tunnel mode
         * Call the aforementioned flash command
+
+        When the command is run as part of a `FlashSession`, the
+        arguments are parsed and the downloads queued on the first
+        pass, and the rest happens on the second.
+
+        Each step is timed (see `Tracer`). A summary of the timings is
+        shown at the end and, with `--trace`, the full trace is saved
+        so that it can be viewed in Perfetto. In a session, the
+        session's tracer is used instead and the session command
+        takes care of saving it.
         """
-        self.call("logo")
-        self._parse_command_line()
-        self._sanitize_command_line_values()
-        # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-        # is used from an existing command. Basically, it skips the first word
-        # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-        # by cleo as trying to call the command `download tools arg2`, which is
-        # wrong. The PLACEHOLDER should be removed when this is fixed
-        # https://github.com/python-poetry/cleo/issues/130
-        self.call("download tools", "PLACEHOLDER setup")
-        self.call("download tools", f"PLACEHOLDER {self._target}")
-        self._get_firmware_file()
-        self._get_device()
-        self._get_flash_command()
-        self._confirm()
-        self._set_tunnel_mode()
-        self._flash()
+        if self._session is None:
+            self.call("logo")
+            self._tracer = Tracer()
+        else:
+            self._tracer = self._session.tracer
+        if self._session is None or not self._session.is_prepared(self._target):
+            with self._tracer.span("parse", self._target):
+                self._parse_command_line()
+                self._sanitize_command_line_values()
+        # An earlier target's power cycle may have moved the device
+        if self._session is not None and self._session.port:
+            self._port = self._session.port
+        if self._session is not None and self._session.prepareOnly:
+            self._prefetch()
+            return 0
+
+        try:
+            with self._tracer.span("total", self._target, port=self._port):
+                self._prepare()
+                if self._skipCurrent and self._skip():
+                    return 0
+                self._get_flash_command()
+                with self._tracer.span("confirm", self._target):
+                    self._confirm()
+                self._set_tunnel_mode()
+                self._flash()
+        finally:
+            if self._trace and self._session is None:
+                self._tracer.write(Path(self._trace).expanduser().resolve())
+
+        self._print_timing()
 
         return 0
 
+    # -----
+    # _print_timing
+    # -----
+    def _print_timing(self) -> None:
+        """
+        Shows, on one line, how long each of the main steps took. The
+        individual preparation stages were already shown by
+        `_prepare`.
+        """
+        totals = self._tracer.totals(self._target)
+        parts = [
+            f"{stage} {totals[stage]:.1f} s"
+            for stage in bc.timingSummaryStages
+            if stage in totals
+        ]
+        self.line(f"Timing for {self._target}: {', '.join(parts)}")
+
     # -----
     # _parse_command_line
     # -----
@@ -124,7 +298,14 @@ class BaseFlashCommand(BaseCommand):
         easier to work with. This allows the files to be stored in
         their original form on S3 (so no other tooling breaks) and not
         need duplicate files.
+
+        We also reject option values we don't know what to do with.
         """
+        if self._powerCycle not in bc.powerCycleModes:
+            msg = f"Error: invalid --powerCycle `{self._powerCycle}`. Choose from: "
+            msg += f"{', '.join(bc.powerCycleModes)}"
+            raise ValueError(msg)
+
         # The mn and ex filenames don't have B in them for rigid 4.1B,
         # since they're the same file for rigid 4.1 and 4.1B. In order
         # to avoid having duplicate files with different names on S3,
@@ -140,15 +321,190 @@ class BaseFlashCommand(BaseCommand):
             if self._rigidVersion == "4.1":
                 self._rigidVersion = "4.0"
 
+    # -----
+    # _prepare
+    # -----
+    def _prepare(self) -> None:
+        """
+        Downloads the tools, obtains the firmware file, and connects to
+        the device concurrently, waiting for all three before moving on.
+
+        Anything that might prompt the user is done up front so that
+        two stages can't ask questions at the same time: first-time
+        tool setup is run on its own, and the firmware versions are
+        resolved once here so that the stages get exact matches.
+
+        Output from the tools stage is buffered and shown once all of
+        the stages are done, followed by how long each stage took.
+        """
+        interactive = not self.option("no-interaction")
+
+        if not bc.firstSetup.is_file():
+            # NOTE: There's a bug in cleo about how arguments are parsed when
+            # `call` is used from an existing command. Basically, it skips the
+            # first word given as an arg, so call('download tools', 'arg1 arg2')
+            # is interpreted by cleo as trying to call the command
+            # `download tools arg2`, which is wrong. The PLACEHOLDER should be
+            # removed when this is fixed
+            # https://github.com/python-poetry/cleo/issues/130
+            self.call("download tools", "PLACEHOLDER setup")
+        if interactive:
+            version = validate_given_firmware_version(self._currentMnFw, True)
+            self._currentMnFw = str(version)
+            # `to` can also be a file name, which doesn't validate
+            with suppress(ValueError):
+                self._to = str(validate_given_firmware_version(self._to, True))
+
+        stages = {
+            "tools": self._get_tools,
+            "device": self._get_device,
+            "firmware": self._get_firmware,
+        }
+        # Some targets build their firmware file using the device and the
+        # tools, so it has to wait for both
+        deferred = stages.pop("firmware") if self._firmwareNeedsDevice else None
+        # A file given on the command line is checked before we connect to
+        # the device, since that only takes a few milliseconds
+        first = None
+        if not self._firmwareNeedsDevice and Path(self._to).expanduser().is_file():
+            first = stages.pop("firmware")
+
+        with self._tracer.span("prepare", self._target):
+            if first is not None:
+                self._timed("firmware", first)
+
+            with ThreadPoolExecutor(max_workers=len(stages)) as pool:
+                futures = {
+                    name: pool.submit(self._timed, name, stage)
+                    for name, stage in stages.items()
+                }
+
+            self.io.output.write(futures["tools"].result(), type=OutputType.RAW)
+            # result() re-raises anything raised in the stage
+            for future in futures.values():
+                future.result()
+
+            if deferred is not None:
+                self._timed("firmware", deferred)
+
+        times = self._tracer.totals(self._target)
+
+        self.line("")
+        for name, msg in (
+            ("tools", "Downloading tools"),
+            ("firmware", "Getting firmware file"),
+            ("device", "Connecting to device"),
+        ):
+            self.line(f"{msg}... {self.application._SUCCESS} ({times[name]:.1f} s)")
+
+        sequential = sum(times[n] for n in ("tools", "firmware", "device"))
+        msg = f"Ready in {times['prepare']:.1f} s "
+        msg += f"({sequential:.1f} s if run one after another)"
+        self.line(msg)
+
+    # -----
+    # _timed
+    # -----
+    def _timed(self, name: str, func: Callable) -> str:
+        """
+        Runs `func` in a span called `name` and passes along its return
+        value.
+        """
+        with self._tracer.span(name, self._target):
+            return func()
+
+    # -----
+    # _prefetch
+    # -----
+    def _prefetch(self) -> None:
+        """
+        Queues up the downloads this target needs on the session so
+        that they happen in the background while earlier targets are
+        being flashed.
+        """
+        self._session.prefetch_tools(("setup", self._target), self._download_tools)
+        if not self._firmwareNeedsDevice:
+            self._session.prefetch_firmware(self._target, self._fetch_firmware)
+        self._session.mark_prepared(self._target)
+
+    # -----
+    # _get_tools
+    # -----
+    def _get_tools(self) -> str:
+        """
+        Makes sure the common tools and the target's flash tool are
+        installed. The output of `download tools` is returned, rather
+        than shown, so that it doesn't interleave with the other
+        stages.
+        """
+        toolsets = ("setup", self._target)
+
+        if self._session is not None:
+            return self._session.get_tools(toolsets, self._download_tools)
+
+        return "".join(self._download_tools(toolset) for toolset in toolsets)
+
+    # -----
+    # _download_tools
+    # -----
+    def _download_tools(self, toolset: str) -> str:
+        io = BufferedIO(decorated=self.io.output.is_decorated())
+        io.output.set_formatter(self.io.output.formatter)
+
+        # NOTE: There's a bug in cleo about how arguments are parsed when
+        # `call` is used from an existing command. Basically, it skips the
+        # first word given as an arg, so call('download tools', 'arg1 arg2')
+        # is interpreted by cleo as trying to call the command
+        # `download tools arg2`, which is wrong. The PLACEHOLDER should be
+        # removed when this is fixed
+        # https://github.com/python-poetry/cleo/issues/130
+        with self._tracer.span(f"download tools {toolset}", self._target):
+            self.application._run_command(
+                self.application.get("download tools"),
+                io.with_input(StringInput(f"PLACEHOLDER {toolset}")),
+            )
+
+        return io.fetch_output()
+
+    # -----
+    # _get_firmware
+    # -----
+    def _get_firmware(self) -> None:
+        if self._session is not None and not self._firmwareNeedsDevice:
+            self._fwFile = self._session.get_firmware(
+                self._target, self._fetch_firmware
+            )
+        else:
+            self._get_firmware_file()
+
+    # -----
+    # _fetch_firmware
+    # -----
+    def _fetch_firmware(self) -> Path | str | None:
+        with self._tracer.span("fetch firmware", self._target):
+            self._get_firmware_file()
+        return self._fwFile
+
     # -----
     # _get_device
     # -----
     def _get_device(self) -> None:
         """
-        Creates an instance of the `Device` class and opens it.
+        Creates an instance of the `Device` class and opens it. In a
+        session, the session's device is reused and only re-opened if
+        the previous target's flash closed it, unless the device has
+        since moved to another port.
         """
-        self.line("")
-        self.write("Connecting to device...")
+        session = self._session
+        if session is not None and session.device is not None:
+            if session.device.port == self._port:
+                self._device = session.device
+                if not self._device.connected:
+                    # pylint: disable-next=unexpected-keyword-arg
+                    self._device.open(bootloading=True)
+                return
+            if session.device.connected:
+                session.device.close()
 
         self._device = Device(
             self._currentMnFw,
@@ -163,9 +519,75 @@ class BaseFlashCommand(BaseCommand):
         # pylint: disable-next=unexpected-keyword-arg
         self._device.open(bootloading=True)
 
-        self.overwrite(f"Connecting to device... {self.application._SUCCESS}")
+        if self._session is not None:
+            self._session.device = self._device
+
+    # -----
+    # _skip
+    # -----
+    def _skip(self) -> bool:
+        """
+        Returns `True`, after saying why, if the target is already
+        running the firmware we were asked to flash. If the firmware
+        was given as a version, we compare it to the version the
+        target reports. If it was given as a file, we check that it is
+        the file we last flashed onto this target (see
+        `flashed_file_matches`).
+        """
+        if self._target not in bc.versionedTargets:
+            return False
+
+        running = self._running_firmware().get(self._target, "0.0.0")
+        # The device reports 0.0.0 when it doesn't know
+        if running == "0.0.0":
+            return False
+
+        if self._fwVersion is not None:
+            if Version(running) != self._fwVersion:
+                return False
+            reason = f"already running {running}"
+        else:
+            if not flashed_file_matches(
+                self._device.id, self._target, self._fwFile, running
+            ):
+                return False
+            reason = f"already running {Path(self._fwFile).name} ({running})"
+
+        self.line("")
+        self.line(f"<info>Skipping {self._target}</info>: {reason}.")
+
+        if self._session is not None:
+            self._session.skipped[self._target] = reason
+        else:
+            self._device.close()
+
+        return True
+
+    # -----
+    # _running_firmware
+    # -----
+    def _running_firmware(self) -> dict:
+        """
+        Asks the device what firmware each of its MCUs is running. This
+        takes several seconds, so in a session we only ask once; the
+        answers for the targets we haven't flashed yet stay valid.
+        """
+        if self._session is not None and self._session.runningFirmware:
+            return self._session.runningFirmware
+
+        self.write("Reading running firmware versions...")
+        with self._tracer.span("check", self._target):
+            running = self._device.firmware_version
+        self.overwrite(
+            f"Reading running firmware versions... {self.application._SUCCESS}"
+        )
         self.line("")
 
+        if self._session is not None:
+            self._session.runningFirmware = running
+
+        return running
+
     # -----
     # _set_tunnel_mode
     # -----
@@ -179,23 +601,24 @@ class BaseFlashCommand(BaseCommand):
             msg = "<warning>Please make sure the battery is removed "
             msg += "and/or the power supply is disconnected!</warning>"
 
-            if not self.confirm(msg, False):
-                sys.exit(1)
+            with self._tracer.span("confirm", self._target):
+                if not self.confirm(msg, False):
+                    sys.exit(1)
 
         self.line("")
-        self.write(f"Setting tunnel mode for {self._target}...")
 
-        if not self._device.set_tunnel_mode(self._target, 20):
-            self.line("")
+        result = self._wait(
+            f"Setting tunnel mode for {self._target}",
+            "tunnel",
+            lambda timeout: wait_for_bootloader(self._device, self._target, timeout),
+        )
+
+        if not result.ready:
             msg = "\n<error>Error</error>: failed to activate bootloader for: "
             msg += f"<warning>`{self._target}`</warning>"
             self.line(msg)
             sys.exit(1)
 
-        msg = f"Setting tunnel mode for {self._target}... {self.application._SUCCESS}"
-        self.overwrite(msg)
-        self.line("")
-
     # -----
     # _flash
     # -----
@@ -204,26 +627,170 @@ class BaseFlashCommand(BaseCommand):
         Calls the appropriate executable for flashing the desired target.
         """
         self.line("")
-        self.write(f"Flashing {self._target}...")
+        self.line(f"Flashing {self._target}...")
+
+        # mn's flash deletes the device and takes the port away, so we grab
+        # what we need to know about them first
+        deviceId = self._device.id
+        serialNumber = port_serial_number(self._port)
 
         self._flash_target()
 
-        self.overwrite(f"Flashing {self._target}... {self.application._SUCCESS}")
+        if self._target in bc.versionedTargets:
+            version = str(self._fwVersion) if self._fwVersion else None
+            record_flash(deviceId, self._target, self._fwFile, version)
+
+        self.line(f"Flashing {self._target}... {self.application._SUCCESS}")
         self.line("")
 
+        self._wait_for_power_cycle(serialNumber)
+
+    # -----
+    # _run_flash_tool
+    # -----
+    def _run_flash_tool(self) -> None:
+        """
+        Runs the command built by `_get_flash_command`, showing its
+        progress, and records how long it took. Only failures that look
+        transient are retried (see `run_command`).
+        """
+        # xbee doesn't have a firmware file
+        totalBytes = None
+        if self._fwFile is not None and Path(self._fwFile).is_file():
+            totalBytes = Path(self._fwFile).stat().st_size
+        reporter = FlashToolReporter(self, f"Writing firmware to {self._target}")
+
+        reporter.start()
+        with self._tracer.span("tool", self._target, cmd=self._flashCmd) as span:
+            try:
+                run_command(
+                    self._flashCmd,
+                    bc.flashToolTimeouts[self._target],
+                    reporter,
+                    totalBytes,
+                )
+            except (ToolError, TimeoutExpired):
+                reporter.finish("<error>failed</error>", span.duration)
+                raise
+        reporter.finish(self.application._SUCCESS, span.duration)
+
+    # -----
+    # _wait_for_power_cycle
+    # -----
+    def _wait_for_power_cycle(self, serialNumber: str | None) -> None:
+        """
+        Asks the operator to power cycle the device and, unless told
+        otherwise, carries on by itself once the device has gone away
+        and come back. If that doesn't happen in time, we fall back to
+        having the operator confirm it.
+        """
+        if self._powerCycle == "none":
+            return
+
+        if self._powerCycle == "auto":
+            result = self._wait(
+                "Please power cycle the device",
+                "powerCycle",
+                lambda timeout: wait_for_power_cycle(self._port, timeout, serialNumber),
+                bc.powerCycleTimeout,
+            )
+            if result.ready:
+                if result.port != self._port:
+                    self.line(f"Device is now on <info>{result.port}</info>")
+                    self._port = result.port
+                    if self._session is not None:
+                        self._session.port = result.port
+                self.line("")
+                return
+
         # There's a bug in cleo where, when calling one command from another, if
         # the command being called uses `confirm`, then _stream isn't set, which
         # causes a no attribute error: https://github.com/python-poetry/cleo/issues/333
         # As a workaround, we make it not interactive or don't use confirm
         # Here, though, we always want to prompt so that the user knows to power-cycle
-        userInput = input(
-            "Please power cycle the device. Press 'c' then 'Enter' to continue."
-        )
+        with self._tracer.span("powerCycle", self._target, manual=True):
+            userInput = input(
+                "Please power cycle the device. Press 'c' then 'Enter' to continue."
+            )
         if userInput.lower() != "c":
             sys.exit(1)
 
         self.line("")
 
+    # -----
+    # _wait
+    # -----
+    def _wait(
+        self,
+        msg: str,
+        stage: str,
+        waitFunc: Callable[[float], WaitResult],
+        timeout: float | None = None,
+    ) -> WaitResult:
+        """
+        Waits for the readiness condition checked by `waitFunc`, using
+        the timeout for `stage` from the target's readiness profile
+        unless one is given, and reports how long we actually waited.
+        Not reaching the condition is left for the caller to handle.
+        """
+        if timeout is None:
+            timeout = bc.readinessProfiles[self._target][stage]
+
+        self.write(f"{msg}...")
+        with self._tracer.span(stage, self._target, timeout=timeout) as span:
+            result = waitFunc(timeout)
+            span.args["ready"] = result.ready
+
+        if result.ready:
+            status = self.application._SUCCESS
+        else:
+            status = "<warning>timed out</warning>"
+        self.overwrite(f"{msg}... {status} ({result.waited:.1f} s)")
+        self.line("")
+
+        return result
+
+    # -----
+    # _release_port
+    # -----
+    def _release_port(self) -> None:
+        """
+        Closes the connection to the device and waits for the serial
+        port to be free so that the flash tool can open it.
+        """
+        self._device.close()
+        self._wait(
+            "Waiting for port to be released",
+            "release",
+            lambda timeout: wait_for_port_release(self._port, timeout),
+        )
+        self._settle()
+
+    # -----
+    # _settle
+    # -----
+    def _settle(self) -> None:
+        """
+        Gives the target its fixed settling time (see
+        `bc.readinessProfiles`).
+        """
+        with self._tracer.span("settle", self._target):
+            sleep(bc.readinessProfiles[self._target]["settle"])
+
+    # -----
+    # _wait_for_reboot
+    # -----
+    def _wait_for_reboot(self) -> None:
+        """
+        Waits for the device's serial port to come back after the
+        target has been flashed and reset.
+        """
+        self._wait(
+            "Waiting for device to reboot",
+            "reboot",
+            lambda timeout: wait_for_port_return(self._port, timeout),
+        )
+
     # -----
     # _confirm
     # -----
@@ -257,6 +824,8 @@ class BaseFlashCommand(BaseCommand):
         a file name for self.argument("to"). Then calls the appropriate
         handler methods.
         """
+        self._fwVersion = None
+
         # If self._to is a file instead of a version string,
         # validate_given_firmware_version raises a ValueError
         try:
@@ -266,8 +835,13 @@ class BaseFlashCommand(BaseCommand):
         except ValueError:
             self._handle_firmware_file()
         else:
+            self._fwVersion = desiredFirmwareVersion
             self._handle_firmware_version(desiredFirmwareVersion)
 
+        # A malformed image would otherwise only show up part way through
+        # the flash, with the device already in tunnel mode
+        check_image(Path(self._fwFile), self._target)
+
     # -----
     # _handle_firmware_file
     # -----
@@ -311,7 +885,7 @@ class BaseFlashCommand(BaseCommand):
     # -----
     def _flash_target(self) -> None:
         """
-        Each target has its own set of sleeps and operations related
+        Each target has its own set of waits and operations related
         to closing the serial port that need to be performed before
         the flash command can be called, and this is target-specific.
         """
@@ -0,0 +1,97 @@
+from pathlib import Path
+from typing import List
+from typing import Tuple
+
+from cleo.commands.command import Command as BaseCommand
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.flash_session import FlashSession
+
+
+# ============================================
+#             BaseSessionCommand
+# ============================================
+class BaseSessionCommand(BaseCommand):
+    """
+    Base for commands that flash several targets on the same device one
+    after another. The targets' own flash commands do the work, but
+    they share a `FlashSession`, so the tools and firmware for every
+    target are fetched once and the device is only connected to once
+    (see `FlashSession`).
+    """
+
+    # -----
+    # _flash_targets
+    # -----
+    def _flash_targets(self, plan: List[Tuple[str, str]]) -> None:
+        """
+        `plan` is a list of (target, arguments) pairs, in the order in
+        which the targets should be flashed. The arguments are passed
+        as-is to `flash <target>`. The timing trace for the whole
+        session is saved if the command has a `--trace` option and it
+        was given.
+        """
+        session = FlashSession()
+        commands = [self.application.get(f"flash {target}") for target, _ in plan]
+
+        # First-time setup asks for permission to install drivers, so it
+        # can't happen in the background
+        if not bc.firstSetup.is_file():
+            # NOTE: There's a bug in cleo about how arguments are parsed when
+            # `call` is used from an existing command. Basically, it skips the
+            # first word given as an arg, so call('download tools', 'arg1 arg2')
+            # is interpreted by cleo as trying to call the command
+            # `download tools arg2`, which is wrong. The PLACEHOLDER should be
+            # removed when this is fixed
+            # https://github.com/python-poetry/cleo/issues/130
+            self.call("download tools", "PLACEHOLDER setup")
+
+        for command in commands:
+            command._session = session
+
+        try:
+            session.prepareOnly = True
+            for target, args in plan:
+                self.call(f"flash {target}", args)
+
+            session.prepareOnly = False
+            for target, args in plan:
+                self.line("")
+                self.line(f"Flashing <info>{target}</info>")
+                self.call(f"flash {target}", args)
+                self.line("")
+        finally:
+            for command in commands:
+                command._session = None
+            session.close()
+            if self.option("trace"):
+                session.tracer.write(Path(self.option("trace")).expanduser().resolve())
+
+        self._print_summary(plan, session)
+
+    # -----
+    # _print_summary
+    # -----
+    def _print_summary(
+        self, plan: List[Tuple[str, str]], session: FlashSession
+    ) -> None:
+        self.line("")
+        self.line("SUMMARY")
+        self.line("-------")
+
+        for target, _ in plan:
+            total = session.tracer.totals(target).get("total", 0.0)
+            if target in session.skipped:
+                msg = f"* {target}: skipped, {session.skipped[target]}"
+            else:
+                msg = f"* {target}: {self.application._SUCCESS}"
+            self.line(f"{msg} ({total:.1f} s)")
+
+    # -----
+    # handle
+    # -----
+    def handle(self) -> int:
+        """
+        Each command builds its own plan of targets to flash.
+        """
+        raise NotImplementedError
@@ -2,14 +2,12 @@ import glob
 import os
 import shutil
 import subprocess as sub
-from time import sleep
 
 from cleo.helpers import argument
 from semantic_version import Version
 
 import bootloader.utilities.constants as bc
 from bootloader.utilities.help import bt121_help
-from bootloader.utilities.system_utils import run_command
 
 from .base_flash import BaseFlashCommand
 
@@ -37,6 +35,8 @@ class FlashBt121Command(BaseFlashCommand):
         super().__init__()
 
         self._target = "bt121"
+        # The image is built with the device's address using the bt121 tools
+        self._firmwareNeedsDevice = True
 
     # -----
     # _get_firmware_file
@@ -126,10 +126,9 @@ class FlashBt121Command(BaseFlashCommand):
     # _flash_target
     # -----
     def _flash_target(self) -> None:
-        self._device.close()
-        sleep(3)
-        run_command(self._flashCmd)
-        sleep(20)
+        self._release_port()
+        self._run_flash_tool()
+        self._wait_for_reboot()
 
     # -----
     # _handle_firmware_version
@@ -1,17 +1,17 @@
-import sys
-
-from cleo.commands.command import Command as BaseCommand
 from cleo.helpers import argument
+from cleo.helpers import option
 import yaml
 
 import bootloader.utilities.constants as bc
 from bootloader.utilities.help import flash_config_help
 
+from .base_session import BaseSessionCommand
+
 
 # ============================================
 #             FlashConfigCommand
 # ============================================
-class FlashConfigCommand(BaseCommand):
+class FlashConfigCommand(BaseSessionCommand):
     name = "flash config"
     description = "Flashes the files stored in the given config."
     help = flash_config_help()
@@ -22,6 +22,30 @@ class FlashConfigCommand(BaseCommand):
         argument("configName", "Name of the configuration to use."),
     ]
 
+    options = [
+        option(
+            "powerCycle",
+            None,
+            "How to wait for the power cycle: auto, manual, or none.",
+            flag=False,
+            default="auto",
+        ),
+        option(
+            "skipCurrent",
+            None,
+            "Don't flash targets already running the configuration's firmware.",
+            flag=True,
+        ),
+        option(
+            "target",
+            None,
+            "Only flash this target. Can be given more than once.",
+            flag=False,
+            multiple=True,
+        ),
+        option("trace", None, "Write a timing trace to this file.", flag=False),
+    ]
+
     # -----
     # constructor
     # -----
@@ -39,6 +63,7 @@ class FlashConfigCommand(BaseCommand):
         self._port = self.argument("port")
         self._currentMnFw = self.argument("currentMnFw")
         self._configName = self.argument("configName")
+        targets = self.option("target")
 
         # Download and extract config
         # NOTE: There's a bug in cleo about how arguments are parsed when `call`
@@ -47,7 +72,10 @@ class FlashConfigCommand(BaseCommand):
         # by cleo as trying to call the command `download tools arg2`, which is
         # wrong. The PLACEHOLDER should be removed when this is fixed
         # https://github.com/python-poetry/cleo/issues/130
-        self.call("config download", f"PLACEHOLDER {self._configName}")
+        # Only the chosen targets' firmware is downloaded
+        cmd = f"PLACEHOLDER {self._configName}"
+        cmd += "".join(f" --target {target}" for target in targets)
+        self.call("config download", cmd)
         # Read info file
         with open(
             bc.configsPath.joinpath(self._configName, bc.configInfoFile),
@@ -55,81 +83,36 @@ class FlashConfigCommand(BaseCommand):
             encoding="utf8",
         ) as fd:
             info = yaml.safe_load(fd)
-        # For each target in the info file, flash with the corresponding file
-        if "habs" in info:
-            # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-            # is used from an existing command. Basically, it skips the first word
-            # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-            # by cleo as trying to call the command `download tools arg2`, which is
-            # wrong. The PLACEHOLDER should be removed when this is fixed
-            # https://github.com/python-poetry/cleo/issues/130
-            fwFile = str(bc.configsPath.joinpath(self._configName, info["habs"]))
-            cmd = f"PLACEHOLDER {self._port} {self._currentMnFw} {fwFile} "
-            cmd += "--no-interaction"
-            self.call(
-                "flash habs",
-                cmd,
-            )
-            self.line("")
-            self.line("Please power cycle the device.")
-            if not self.confirm("Proceed?"):
-                sys.exit(1)
         # For re, ex, and mn, the flash commands take arguments other than port,
         # current, and to. However, because "to" is a file, the values of the other
         # arguments do not matter
-        if "re" in info:
-            # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-            # is used from an existing command. Basically, it skips the first word
-            # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-            # by cleo as trying to call the command `download tools arg2`, which is
-            # wrong. The PLACEHOLDER should be removed when this is fixed
-            # https://github.com/python-poetry/cleo/issues/130
-            fwFile = str(bc.configsPath.joinpath(self._configName, info["re"]))
-            cmd = f"PLACEHOLDER {self._port} {self._currentMnFw} {fwFile} HARDWARE LED "
-            cmd += "--no-interaction"
-            self.call(
-                "flash re",
-                cmd,
-            )
-            self.line("")
-            self.line("Please power cycle the device.")
-            if not self.confirm("Proceed?"):
-                sys.exit(1)
-        if "ex" in info:
-            # NOTE: There's a bug in cleo about how arguments are parsed when `call`
-            # is used from an existing command. Basically, it skips the first word
-            # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
-            # by cleo as trying to call the command `download tools arg2`, which is
-            # wrong. The PLACEHOLDER should be removed when this is fixed
-            # https://github.com/python-poetry/cleo/issues/130
-            fwFile = str(bc.configsPath.joinpath(self._configName, info["ex"]))
-            cmd = f"PLACEHOLDER {self._port} {self._currentMnFw} {fwFile} HARDWARE "
-            cmd += "MOTOR --no-interaction"
-            self.call(
-                "flash ex",
-                cmd,
-            )
-            self.line("")
-            self.line("Please power cycle the device.")
-            if not self.confirm("Proceed?"):
-                sys.exit(1)
-        if "mn" in info:
+        extraArgs = {
+            "habs": "",
+            "re": "HARDWARE LED",
+            "ex": "HARDWARE MOTOR",
+            "mn": "HARDWARE DEV SIDE",
+        }
+
+        plan = []
+        for target in ["habs", "re", "ex", "mn"]:
+            if target not in info or (targets and target not in targets):
+                continue
+            fwFile = str(bc.configsPath.joinpath(self._configName, info[target]))
             # NOTE: There's a bug in cleo about how arguments are parsed when `call`
             # is used from an existing command. Basically, it skips the first word
             # given as an arg, so call('download tools', 'arg1 arg2') is interpreted
             # by cleo as trying to call the command `download tools arg2`, which is
             # wrong. The PLACEHOLDER should be removed when this is fixed
             # https://github.com/python-poetry/cleo/issues/130
-            fwFile = str(bc.configsPath.joinpath(self._configName, info["mn"]))
-            cmd = f"PLACEHOLDER {self._port} {self._currentMnFw} {fwFile} HARDWARE DEV "
-            cmd += "SIDE --no-interaction"
-            self.call(
-                "flash mn",
-                cmd,
-            )
-            self.line("")
-            self.line("Please power cycle the device.")
-            if not self.confirm("Proceed?"):
-                sys.exit(1)
+            cmd = f"PLACEHOLDER {self._port} {self._currentMnFw} {fwFile} "
+            cmd += f"{extraArgs[target]} --no-interaction"
+            cmd += f" --powerCycle {self.option('powerCycle')}"
+            if self.option("skipCurrent"):
+                cmd += " --skipCurrent"
+            plan.append((target, cmd))
+
+        # Each target's flash command asks for the device to be power cycled
+        # once it's done
+        self._flash_targets(plan)
 
         return 0
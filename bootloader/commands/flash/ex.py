@@ -1,10 +1,7 @@
-from time import sleep
-
 from cleo.helpers import argument
 from semantic_version import Version
 
 from bootloader.utilities.help import ex_help
-from bootloader.utilities.system_utils import run_command
 from bootloader.utilities.system_utils import get_fw_file
 from bootloader.utilities.system_utils import psoc_flash_command
 
@@ -58,8 +55,6 @@ class FlashExCommand(BaseFlashCommand):
     # _flash_target
     # -----
     def _flash_target(self) -> None:
-        sleep(2)
-        self._device.close()
-        sleep(2)
-        run_command(self._flashCmd)
-        sleep(20)
+        self._release_port()
+        self._run_flash_tool()
+        self._wait_for_reboot()
@@ -0,0 +1,330 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import re
+import subprocess as sub
+import sys
+import threading
+from time import monotonic
+from time import strftime
+from typing import List
+
+from cleo.commands.command import Command as BaseCommand
+from cleo.helpers import argument
+from cleo.helpers import option
+import yaml
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.help import fleet_help
+from bootloader.utilities.readiness import port_serial_number
+from bootloader.utilities.readiness import wait_for_power_cycle
+
+
+# ============================================
+#              FlashFleetCommand
+# ============================================
+class FlashFleetCommand(BaseCommand):
+    name = "flash fleet"
+    description = "Flashes many devices in parallel from a manifest."
+    help = fleet_help()
+    hidden = False
+
+    arguments = [
+        argument("manifest", "YAML file listing the devices to flash."),
+    ]
+
+    options = [
+        option("jobs", "-j", "Maximum number of devices to flash at once.", flag=False),
+        option("logDir", None, "Directory for the per-port log files.", flag=False),
+    ]
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self) -> None:
+        super().__init__()
+
+        self._logDir: Path | None = None
+        self._lock = threading.Lock()
+        self._results: List[dict] = []
+
+    # -----
+    # handle
+    # -----
+    def handle(self) -> int:
+        self.call("logo")
+
+        devices = self._read_manifest(Path(self.argument("manifest")))
+
+        jobs = int(self.option("jobs")) if self.option("jobs") else len(devices)
+        if jobs < 1:
+            raise ValueError("Error: --jobs must be at least 1.")
+
+        if self.option("logDir"):
+            self._logDir = Path(self.option("logDir")).expanduser().resolve()
+        else:
+            self._logDir = bc.fleetLogsPath.joinpath(strftime("%Y%m%d-%H%M%S"))
+        self._logDir.mkdir(parents=True, exist_ok=True)
+
+        self.line("")
+        self.line(
+            f"Flashing <info>{len(devices)}</info> devices, <info>{jobs}</info> at a "
+            f"time. Logs: <info>{self._logDir}</info>"
+        )
+        self.line("")
+
+        self._prepare_tools(devices)
+
+        start = monotonic()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            # list() so that exceptions raised in the workers surface here
+            list(pool.map(self._flash_device, devices))
+
+        return self._print_summary(monotonic() - start)
+
+    # -----
+    # _read_manifest
+    # -----
+    def _read_manifest(self, manifest: Path) -> List[dict]:
+        """
+        Reads the manifest and returns one dictionary per device with
+        the `defaults` section merged in. Each device is checked up
+        front so that a typo doesn't surface halfway through a run.
+        """
+        if not manifest.is_file():
+            raise FileNotFoundError(f"Error: could not find manifest: {manifest}")
+
+        with open(manifest, "r", encoding="utf8") as fd:
+            info = yaml.safe_load(fd) or {}
+
+        defaults = info.get("defaults", {})
+        devices = []
+        ports = set()
+
+        for entry in info.get("devices", []):
+            device = {**defaults, **entry}
+
+            if "port" not in device:
+                raise ValueError(f"Error: manifest entry is missing a port: {entry}")
+            if device["port"] in ports:
+                raise ValueError(f"Error: port {device['port']} is listed twice.")
+            ports.add(device["port"])
+
+            if "target" in device:
+                device["targets"] = [device.pop("target")]
+            if "targets" not in device:
+                raise ValueError(f"Error: manifest entry has no target(s): {entry}")
+            if not isinstance(device["targets"], list) or not device["targets"]:
+                msg = f"Error: `targets` must be a non-empty list for {device['port']}."
+                raise ValueError(msg)
+            device["flashArgs"] = {
+                target: self._get_flash_args(target, device)
+                for target in device["targets"]
+            }
+
+            devices.append(device)
+
+        if not devices:
+            raise ValueError(f"Error: no devices found in manifest: {manifest}")
+
+        return devices
+
+    # -----
+    # _get_flash_args
+    # -----
+    def _get_flash_args(self, target: str, device: dict) -> List[str]:
+        """
+        Builds the command-line arguments for `flash <target>` from the
+        device's manifest entry. The manifest uses the same names as
+        the arguments and options of the individual flash commands.
+        """
+        if target not in bc.targets:
+            raise ValueError(f"Error: unknown target `{target}` for {device['port']}")
+
+        command = self.application.find(f"flash {target}")
+        args = []
+
+        for arg in command.arguments:
+            if arg.name not in device:
+                msg = f"Error: {device['port']} is missing `{arg.name}`, "
+                msg += f"which is needed to flash {target}."
+                raise ValueError(msg)
+            args.append(str(device[arg.name]))
+
+        for opt in command.options:
+            # The fleet waits for power cycles itself (see _flash_device)
+            if opt.name not in device or opt.name == "powerCycle":
+                continue
+            if opt.is_flag():
+                if device[opt.name]:
+                    args.append(f"--{opt.name}")
+            else:
+                args += [f"--{opt.name}", str(device[opt.name])]
+
+        return args
+
+    # -----
+    # _prepare_tools
+    # -----
+    def _prepare_tools(self, devices: List[dict]) -> None:
+        """
+        Runs first-time setup and downloads the tools for every target
+        in the manifest before any device is flashed, so that the flash
+        commands started by the workers find them in place rather than
+        all downloading (and installing) the same tools at once.
+        """
+        wanted = {target for device in devices for target in device["targets"]}
+
+        for toolset in ["setup"] + [t for t in bc.targets if t in wanted]:
+            # NOTE: There's a bug in cleo about how arguments are parsed when
+            # `call` is used from an existing command. Basically, it skips the
+            # first word given as an arg, so call('download tools', 'arg1 arg2')
+            # is interpreted by cleo as trying to call the command
+            # `download tools arg2`, which is wrong. The PLACEHOLDER should be
+            # removed when this is fixed
+            # https://github.com/python-poetry/cleo/issues/130
+            self.call("download tools", f"PLACEHOLDER {toolset}")
+
+    # -----
+    # _flash_device
+    # -----
+    def _flash_device(self, device: dict) -> None:
+        """
+        Flashes each of the device's targets in turn. Each target is
+        flashed by running the regular `flash <target>` command in its
+        own process, which keeps the serial connection, C library, and
+        working directory of one device from interfering with another.
+        """
+        port = device["port"]
+        # The device may come back on a different port after a power cycle
+        currentPort = port
+        serialNumber = port_serial_number(port)
+        failed = False
+
+        with open(self._log_file(port), "w", encoding="utf8") as log:
+            for i, target in enumerate(device["targets"]):
+                if failed:
+                    self._record(port, target, "skipped", 0.0)
+                    continue
+
+                if i > 0:
+                    currentPort = self._wait_for_power_cycle(
+                        port, currentPort, serialNumber, log
+                    )
+                    if currentPort is None:
+                        self._record(port, target, "failed", 0.0)
+                        failed = True
+                        continue
+
+                self._report(port, f"flashing {target}...")
+                start = monotonic()
+                cmd = [sys.executable, "-m", "bootloader", "flash", target]
+                cmd += [
+                    currentPort if arg == port else arg
+                    for arg in device["flashArgs"][target]
+                ]
+                # The fleet waits for the power cycle between targets itself so
+                # that it can report it against the device
+                cmd += ["--powerCycle", "none", "--no-interaction", "--no-ansi"]
+                log.write(f"$ {' '.join(cmd)}\n")
+                log.flush()
+
+                proc = sub.run(
+                    cmd,
+                    stdin=sub.DEVNULL,
+                    stdout=log,
+                    stderr=sub.STDOUT,
+                    text=True,
+                    check=False,
+                )
+
+                status = "passed" if proc.returncode == 0 else "failed"
+                failed = proc.returncode != 0
+                self._record(port, target, status, monotonic() - start)
+
+    # -----
+    # _wait_for_power_cycle
+    # -----
+    def _wait_for_power_cycle(
+        self, port: str, currentPort: str, serialNumber: str | None, log
+    ) -> str | None:
+        """
+        Waits for the device listed under `port`, and currently on
+        `currentPort`, to be power cycled and returns the port it came
+        back on, or `None` if it didn't.
+        """
+        self._report(port, "<warning>please power cycle the device</warning>")
+        log.write("Waiting for power cycle...\n")
+        log.flush()
+
+        result = wait_for_power_cycle(currentPort, bc.powerCycleTimeout, serialNumber)
+
+        if not result.ready:
+            log.write("Timed out waiting for power cycle.\n")
+            self._report(port, "<error>timed out waiting for power cycle</error>")
+            return None
+
+        log.write(f"Power cycled after {result.waited:.1f} s\n")
+        if result.port != currentPort:
+            log.write(f"Device is now on {result.port}\n")
+            self._report(port, f"device is now on <info>{result.port}</info>")
+
+        return result.port
+
+    # -----
+    # _log_file
+    # -----
+    def _log_file(self, port: str) -> Path:
+        """
+        Ports like `/dev/ttyACM0` aren't valid file names, so we swap
+        anything that isn't a word character for an underscore.
+        """
+        name = re.sub(r"[^\w.-]+", "_", port).strip("_")
+        return self._logDir.joinpath(f"{name}.log")
+
+    # -----
+    # _record
+    # -----
+    def _record(self, port: str, target: str, status: str, duration: float) -> None:
+        result = {
+            "port": port,
+            "target": target,
+            "status": status,
+            "duration": duration,
+            "log": self._log_file(port),
+        }
+        with self._lock:
+            self._results.append(result)
+
+        tag = {"passed": "success", "failed": "error", "skipped": "warning"}[status]
+        self._report(port, f"{target} <{tag}>{status}</{tag}> ({duration:.1f} s)")
+
+    # -----
+    # _report
+    # -----
+    def _report(self, port: str, msg: str) -> None:
+        with self._lock:
+            self.line(f"[<info>{port}</info>] {msg}")
+
+    # -----
+    # _print_summary
+    # -----
+    def _print_summary(self, elapsed: float) -> int:
+        self.line("")
+        self.line("SUMMARY")
+        self.line("-------")
+
+        counts = {"passed": 0, "failed": 0, "skipped": 0}
+        for result in sorted(self._results, key=lambda r: r["port"]):
+            counts[result["status"]] += 1
+            msg = f"* {result['port']} {result['target']}: {result['status']} "
+            msg += f"({result['duration']:.1f} s)"
+            if result["status"] != "passed":
+                msg += f" see {result['log']}"
+            self.line(msg)
+
+        self.line("")
+        msg = f"{counts['passed']} passed, {counts['failed']} failed, "
+        msg += f"{counts['skipped']} skipped in {elapsed:.1f} s"
+        self.line(msg)
+
+        return 1 if counts["failed"] or counts["skipped"] else 0
@@ -1,13 +1,11 @@
 from pathlib import Path
 import re
-from time import sleep
 
 from cleo.helpers import argument
 from semantic_version import Version
 
 import bootloader.utilities.constants as bc
 from bootloader.utilities.help import habs_help
-from bootloader.utilities.system_utils import run_command
 from bootloader.utilities.system_utils import get_fw_file
 
 from .base_flash import BaseFlashCommand
@@ -85,7 +83,6 @@ class FlashHabsCommand(BaseFlashCommand):
     # _flash_target
     # -----
     def _flash_target(self) -> None:
-        self._device.close()
-        sleep(6)
-        run_command(self._flashCmd)
-        sleep(20)
+        self._release_port()
+        self._run_flash_tool()
+        self._wait_for_reboot()
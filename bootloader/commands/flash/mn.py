@@ -1,12 +1,11 @@
 from pathlib import Path
-from time import sleep
 
 from cleo.helpers import argument
 from semantic_version import Version
 
 import bootloader.utilities.constants as bc
 from bootloader.utilities.help import mn_help
-from bootloader.utilities.system_utils import run_command
+from bootloader.utilities.readiness import wait_for_port_gone
 from bootloader.utilities.system_utils import get_fw_file
 
 from .base_flash import BaseFlashCommand
@@ -72,8 +71,16 @@ class FlashMnCommand(BaseFlashCommand):
     # _flash_target
     # -----
     def _flash_target(self) -> None:
+        # Setting tunnel mode for mn makes Manage reset into DFU mode, at
+        # which point its serial port goes away. The DFU device itself
+        # isn't a serial port, so we can't poll for it; we allow it a
+        # short, fixed time to enumerate instead
         self._device.close()
         del self._device
-        sleep(3)
-        sleep(10)
-        run_command(self._flashCmd)
+        self._wait(
+            "Waiting for Manage to enter DFU mode",
+            "release",
+            lambda timeout: wait_for_port_gone(self._port, timeout),
+        )
+        self._settle()
+        self._run_flash_tool()
@@ -1,9 +1,6 @@
-from time import sleep
-
 from cleo.helpers import argument
 from semantic_version import Version
 
-from bootloader.utilities.system_utils import run_command
 from bootloader.utilities.system_utils import get_fw_file
 from bootloader.utilities.help import re_help
 from bootloader.utilities.system_utils import psoc_flash_command
@@ -62,6 +59,5 @@ class FlashReCommand(BaseFlashCommand):
     # _flash_target
     # -----
     def _flash_target(self) -> None:
-        sleep(3)
-        self._device.close()
-        run_command(self._flashCmd)
+        self._release_port()
+        self._run_flash_tool()
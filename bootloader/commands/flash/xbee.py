@@ -1,12 +1,10 @@
 import os
-from time import sleep
 
 from cleo.helpers import argument
 from semantic_version import Version
 
 import bootloader.utilities.constants as bc
 from bootloader.utilities.help import xbee_help
-from bootloader.utilities.system_utils import run_command
 
 from .base_flash import BaseFlashCommand
 
@@ -69,10 +67,9 @@ class FlashXbeeCommand(BaseFlashCommand):
     # _flash_target
     # -----
     def _flash_target(self) -> None:
-        self._device.close()
-        sleep(3)
-        run_command(self._flashCmd)
-        sleep(20)
+        self._release_port()
+        self._run_flash_tool()
+        self._wait_for_reboot()
 
     # -----
     # _handle_firmware_version
@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+
+from cleo.commands.command import Command as BaseCommand
+from cleo.helpers import option
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.help import mirror_serve_help
+from bootloader.utilities.mirror_server import MirrorServer
+
+
+# ============================================
+#             MirrorServeCommand
+# ============================================
+class MirrorServeCommand(BaseCommand):
+    name = "mirror serve"
+    description = "Serves cached firmware, configs, and tools to other stations."
+    help = mirror_serve_help()
+    hidden = False
+
+    options = [
+        option("host", None, "Address to listen on.", flag=False, default="0.0.0.0"),
+        option("port", "-p", "Port to listen on.", flag=False, default=bc.mirrorPort),
+        option("root", None, "Directory to keep the files in.", flag=False),
+    ]
+
+    # -----
+    # handle
+    # -----
+    def handle(self) -> int:
+        # The mirror gets its files from S3, not from itself (or another
+        # mirror)
+        os.environ.pop(bc.mirrorEnvVar, None)
+
+        root = Path(self.option("root")) if self.option("root") else bc.mirrorPath
+        root.mkdir(parents=True, exist_ok=True)
+        address = (self.option("host"), int(self.option("port")))
+
+        server = MirrorServer(address, root, log=self.line)
+
+        msg = f"Serving <info>{root}</info> on port <info>{address[1]}</info>. "
+        msg += "Point stations at it with "
+        msg += f"`--mirror http://<this machine>:{address[1]}`. Ctrl-C to stop."
+        self.line(msg)
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.line("")
+        finally:
+            server.server_close()
+
+        return 0
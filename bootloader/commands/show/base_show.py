@@ -1,34 +1,71 @@
-from botocore.exceptions import ProfileNotFound
 from cleo.commands.command import Command as BaseCommand
-from cloudpathlib import CloudPath
-from cloudpathlib import S3Client
+from cleo.helpers import option
 
 import bootloader.utilities.constants as bc
+from bootloader.utilities.firmware_catalog import FirmwareCatalog
+
+# Options shared by the show commands that answer from the firmware catalog
+catalogOptions = [
+    option("target", None, "Only consider firmware for this target.", flag=False),
+    option("fwVersion", None, "Only consider this firmware version.", flag=False),
+    option("device", None, "Only consider firmware for this device.", flag=False),
+    option("rigid", None, "Only consider firmware for this rigid.", flag=False),
+    option("side", None, "Only consider firmware for this side.", flag=False),
+    option("motor", None, "Only consider firmware for this motor.", flag=False),
+    option("led", None, "Only consider firmware for this LED style.", flag=False),
+    option("spec", None, "Only consider firmware for this spec.", flag=False),
+    option("refresh", None, "Refresh the firmware catalog first.", flag=True),
+]
 
 
 # ============================================
 #               BaseShowCommand
 # ============================================
 class BaseShowCommand(BaseCommand):
+    # The field of the firmware catalog's records that the command lists,
+    # the target whose files it looks at unless told otherwise, and the
+    # heading of the list
+    _field: str = ""
+    _defaultTarget: str | None = None
+    _title: str = ""
+
     # -----
-    # _get_cloud_path
+    # _show_field
     # -----
-    def _get_cloud_path(self, bucketName: str) -> CloudPath:
-        try:
-            client = S3Client(profile_name=bc.dephyAwsProfile)
-        except ProfileNotFound as err:
-            msg = "Error: could not find dephy profile in '~/.aws/credentials'. "
-            msg += "Could not list desired information."
-            raise RuntimeError(msg) from err
-
-        # We use cloudpathlib here instead of flexsea's get_s3_objects
-        # because it's a.) better, b.) separate from flexsea, and c.)
-        # because get_s3_objects doesn't work when the objects you're
-        # looking for are at the top level of the bucket and not in a
-        # sub-folder. In general, I would like to switch to
-        # cloudpathlib for all of the S3 operations in both flexsea and
-        # the bootloader in the future
-        return client.CloudPath(f"s3://{bucketName}/")
+    def _show_field(self) -> int:
+        """
+        Lists the distinct values of `_field` among the firmware files
+        that match the filters given on the command line.
+        """
+        target = self.option("target") or self._defaultTarget
+        targets = [target] if target else bc.catalogTargets
+
+        catalog = FirmwareCatalog()
+        catalog.ensure_fresh(targets, self.option("refresh"))
+
+        if catalog.age(targets) > bc.catalogTtl:
+            msg = "<warning>Warning:</warning> could not refresh the firmware "
+            msg += f"catalog; it is {catalog.age(targets) / 3600:.1f} hours old."
+            self.line(msg)
+
+        # `--version` is taken by cleo, so the version filter is `--fwVersion`
+        filters = {
+            f: self.option("fwVersion" if f == "version" else f)
+            for f in bc.catalogFields + ["spec"]
+        }
+        filters["target"] = target
+        values = {getattr(r, self._field) for r in catalog.query(**filters)}
+
+        self.line("")
+        self.line(self._title)
+        self.line("-" * len(self._title))
+
+        for value in sorted(values - {None}):
+            self.line(f"* {value}")
+
+        self.line("")
+
+        return 0
 
     # -----
     # handle
@@ -1,5 +1,11 @@
-import bootloader.utilities.constants as bc
+from pathlib import PurePosixPath
+
+from botocore.exceptions import ProfileNotFound
+from cleo.helpers import option
+
+from bootloader.utilities.config_registry import ConfigRegistry
 from bootloader.utilities.help import show_configs_help
+from bootloader.utilities.storage import get_storage
 
 from .base_show import BaseShowCommand
 
@@ -12,20 +18,65 @@ class ShowConfigsCommand(BaseShowCommand):
     description = "Displays the available pre-made configurations for flashing."
     help = show_configs_help()
 
+    options = [
+        option("rebuild", None, "Rebuild the registry from the archives.", flag=True),
+    ]
+
     # -----
     # handle
     # -----
     def handle(self) -> int:
-        configsPath = self._get_cloud_path(bc.dephyConfigsBucket)
+        try:
+            configs = self._get_configs()
+        except ProfileNotFound as err:
+            msg = "Error: could not find dephy profile in '~/.aws/credentials'. "
+            msg += "Could not list desired information."
+            raise RuntimeError(msg) from err
 
         self.line("")
         self.line("Available Configurations")
         self.line("------------------------")
 
-        for config in configsPath.iterdir():
-            self.line(f"* {config.name.split('.zip')[0]}")
+        for name, info in sorted(configs.items()):
+            details = []
+            if "firmware_version" in info:
+                details.append(f"firmware {info['firmware_version']}")
+            if "date" in info:
+                details.append(info["date"][:10])
+            targets = [t for t in ("mn", "ex", "re", "habs") if t in info]
+            if targets:
+                details.append(", ".join(targets))
+            self.line(f"* {name}" + (f" ({'; '.join(details)})" if details else ""))
 
         self.line("")
         self.line("\nTo use a configuration: `bootloader flash config <config name>`")
 
         return 0
+
+    # -----
+    # _get_configs
+    # -----
+    def _get_configs(self) -> dict:
+        """
+        Returns each configuration's metadata from the registry. If
+        there's no registry yet, the configurations are listed instead,
+        without their metadata, until it's built with `--rebuild`.
+        """
+        registry = ConfigRegistry()
+
+        if self.option("rebuild"):
+            self.write("Rebuilding the registry...")
+            registry.rebuild()
+            self.overwrite(f"Rebuilding the registry... {self.application._SUCCESS}")
+            self.line("")
+
+        if registry.configs:
+            return registry.configs
+
+        self.line("<warning>No registry found; run with `--rebuild` to create it.</>")
+
+        return {
+            PurePosixPath(o.key).stem: {}
+            for o in get_storage("configs").list()
+            if o.key.endswith(".zip")
+        }
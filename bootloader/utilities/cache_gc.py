@@ -0,0 +1,160 @@
+from fnmatch import fnmatch
+from pathlib import Path
+import re
+import shutil
+from time import time
+from typing import List
+from typing import NamedTuple
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.cache_manifest import get_manifest
+
+
+# ============================================
+#                CacheEntry
+# ============================================
+class CacheEntry(NamedTuple):
+    """
+    A top-level file or directory in one of the caches, which is the
+    unit that gets evicted: a firmware file, an extracted config (or its
+    archive), or the libraries for one firmware version. `lastUsed` is a
+    Unix timestamp.
+    """
+
+    path: Path
+    size: int
+    lastUsed: float
+    pinned: bool
+
+
+# ============================================
+#                parse_size
+# ============================================
+def parse_size(size: str) -> int:
+    """
+    Converts a size such as `500MB` or `2g` to bytes.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", size)
+
+    if match is None or match.group(2).lower() not in bc.sizeUnits:
+        raise ValueError(f"Invalid size: `{size}`.")
+
+    return int(float(match.group(1)) * bc.sizeUnits[match.group(2).lower()])
+
+
+# ============================================
+#                 read_pins
+# ============================================
+def read_pins() -> List[str]:
+    """
+    Returns the pins listed in `bc.cachePinsFile`, skipping blank lines
+    and comments.
+    """
+    if not bc.cachePinsFile.is_file():
+        return []
+
+    with open(bc.cachePinsFile, "r", encoding="utf8") as fd:
+        lines = (line.split("#", 1)[0].strip() for line in fd)
+        return [line for line in lines if line]
+
+
+# ============================================
+#                 is_pinned
+# ============================================
+def is_pinned(name: str, pins: List[str]) -> bool:
+    for pin in pins:
+        if fnmatch(name, pin) or fnmatch(Path(name).stem, pin):
+            return True
+        if re.search(rf"version-{re.escape(pin)}[_.]", name):
+            return True
+
+    return False
+
+
+# ============================================
+#               cache_entries
+# ============================================
+def cache_entries(root: Path, pins: List[str]) -> List[CacheEntry]:
+    """
+    Returns the entries in the cache directory `root`. An entry was last
+    used when the most recently used file in it was, going by the
+    manifest if the file is in it and by its modification time if not.
+    """
+    if not root.is_dir():
+        return []
+
+    manifest = get_manifest(root)
+    entries = []
+
+    for path in root.iterdir():
+        if path.name.startswith("."):
+            continue
+
+        files = (
+            [path] if path.is_file() else [p for p in path.rglob("*") if p.is_file()]
+        )
+        size = 0
+        lastUsed = path.stat().st_mtime
+
+        for file in files:
+            stat = file.stat()
+            size += stat.st_size
+            used = manifest.last_used(file)
+            lastUsed = max(lastUsed, used if used is not None else stat.st_mtime)
+
+        entries.append(CacheEntry(path, size, lastUsed, is_pinned(path.name, pins)))
+
+    return entries
+
+
+# ============================================
+#             select_evictions
+# ============================================
+def select_evictions(
+    entries: List[CacheEntry], maxSize: int | None, maxAge: float | None
+) -> List[CacheEntry]:
+    """
+    Returns the entries to evict, least recently used first: every
+    unpinned entry unused for more than `maxAge` seconds, then as many
+    more of the remaining unpinned entries as it takes to bring the
+    total size down to `maxSize` bytes. Pinned entries still count
+    towards the total, so the cache can end up bigger than `maxSize` if
+    enough is pinned.
+    """
+    candidates = sorted((e for e in entries if not e.pinned), key=lambda e: e.lastUsed)
+    evictions = []
+
+    if maxAge is not None:
+        cutoff = time() - maxAge
+        evictions = [e for e in candidates if e.lastUsed < cutoff]
+        candidates = [e for e in candidates if e.lastUsed >= cutoff]
+
+    if maxSize is not None:
+        total = sum(e.size for e in entries) - sum(e.size for e in evictions)
+        for entry in candidates:
+            if total <= maxSize:
+                break
+            evictions.append(entry)
+            total -= entry.size
+
+    return evictions
+
+
+# ============================================
+#                   evict
+# ============================================
+def evict(entry: CacheEntry) -> None:
+    """
+    Removes the entry from its cache directory and from that directory's
+    manifest.
+    """
+    manifest = get_manifest(entry.path.parent)
+
+    if entry.path.is_dir():
+        for file in entry.path.rglob("*"):
+            if file.is_file():
+                manifest.forget(file)
+        shutil.rmtree(entry.path, ignore_errors=True)
+    else:
+        manifest.forget(entry.path)
+        entry.path.unlink(missing_ok=True)
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+from time import time
+from typing import Dict
+from typing import Tuple
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.ranged_download import file_lock
+
+
+# ============================================
+#                 _hash_file
+# ============================================
+def _hash_file(path: Path) -> Tuple[str, str]:
+    """
+    Returns the SHA-256 and MD5 hex digests of the file, read once.
+    """
+    sha = hashlib.sha256()
+    md5 = hashlib.md5()
+
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            sha.update(chunk)
+            md5.update(chunk)
+
+    return sha.hexdigest(), md5.hexdigest()
+
+
+# ============================================
+#               CacheManifest
+# ============================================
+class CacheManifest:
+    """
+    Records the size, SHA-256, and S3 ETag of every file we've put in
+    a cache directory (e.g., `bc.firmwarePath`), so that a file that
+    was only partially written, or has been changed since, is spotted
+    and fetched again before it's used.
+
+    Hashing a firmware file on every use would be slow, so each record
+    also holds the file's size and modification time when it was last
+    verified. As long as those haven't changed, the file is taken to
+    be good without reading it. A file that isn't in the manifest at
+    all is treated as bad.
+
+    Records also hold when the file was last used, which `clean` uses
+    to decide what to evict first.
+
+    The manifest lives in the cache directory itself (see
+    `bc.cacheManifestFile`). It's rewritten atomically, under a lock
+    shared with other processes, merging in any records another process
+    has added since we read it.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._file = root.joinpath(bc.cacheManifestFile)
+        self._lock = threading.Lock()
+        self._records: Dict[str, dict] = self._read()
+
+    # -----
+    # is_valid
+    # -----
+    def is_valid(self, path: Path) -> bool:
+        """
+        Returns `True` if `path` exists and matches its record.
+        """
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+
+        key = self._key(path)
+        with self._lock:
+            record = self._records.get(key)
+            # Another process may have (re)downloaded the file since we
+            # read the manifest
+            if record is None or record["mtime"] != stat.st_mtime_ns:
+                self._records.update(self._read())
+                record = self._records.get(key)
+
+        if record is None or record["size"] != stat.st_size:
+            return False
+        if record["mtime"] == stat.st_mtime_ns:
+            return True
+
+        # The file's been touched since we last checked it, so it's worth
+        # the cost of hashing it again
+        sha256, _ = _hash_file(path)
+        if sha256 != record["sha256"]:
+            return False
+
+        with self._lock:
+            record["mtime"] = stat.st_mtime_ns
+        self._save({key: record})
+
+        return True
+
+    # -----
+    # get
+    # -----
+    def get(self, path: Path) -> dict | None:
+        with self._lock:
+            return self._records.get(self._key(path))
+
+    # -----
+    # record
+    # -----
+    def record(self, path: Path, etag: str | None = None) -> dict:
+        """
+        Hashes `path` and records it as good. `etag` is the ETag of the
+        S3 object the file came from, if known. Otherwise we store the
+        file's MD5, which is what S3 uses as the ETag of objects that
+        weren't uploaded in parts.
+        """
+        stat = path.stat()
+        sha256, md5 = _hash_file(path)
+        record = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha256": sha256,
+            "etag": etag if etag is not None else md5,
+            "used": time(),
+        }
+
+        key = self._key(path)
+        with self._lock:
+            self._records[key] = record
+        self._save({key: record})
+
+        return record
+
+    # -----
+    # find
+    # -----
+    def find(self, sha256: str) -> Path | None:
+        """
+        Returns a good file in the cache whose SHA-256 is `sha256`, if
+        there is one.
+        """
+        with self._lock:
+            keys = [k for k, r in self._records.items() if r["sha256"] == sha256]
+
+        for key in keys:
+            path = self.root.joinpath(key)
+            if self.is_valid(path):
+                return path
+
+        return None
+
+    # -----
+    # touch
+    # -----
+    def touch(self, path: Path) -> None:
+        """
+        Notes that `path` has just been used. This happens every time a
+        cached file is used, so the manifest is only rewritten if the
+        file hasn't been noted as used for a while (see
+        `bc.cacheTouchInterval`).
+        """
+        key = self._key(path)
+        now = time()
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or now - record.get("used", 0) < bc.cacheTouchInterval:
+                return
+            record["used"] = now
+        self._save({key: record})
+
+    # -----
+    # last_used
+    # -----
+    def last_used(self, path: Path) -> float | None:
+        """
+        Returns when `path` was last used, as a Unix timestamp, or `None`
+        if it isn't in the manifest.
+        """
+        record = self.get(path)
+
+        return None if record is None else record.get("used")
+
+    # -----
+    # forget
+    # -----
+    def forget(self, path: Path) -> None:
+        key = self._key(path)
+        with self._lock:
+            if self._records.pop(key, None) is None:
+                return
+        self._save({key: None})
+
+    # -----
+    # _key
+    # -----
+    def _key(self, path: Path) -> str:
+        return path.resolve().relative_to(self.root.resolve()).as_posix()
+
+    # -----
+    # _read
+    # -----
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self._file, "r", encoding="utf8") as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return {}
+
+    # -----
+    # _save
+    # -----
+    def _save(self, changes: Dict[str, dict | None]) -> None:
+        """
+        Writes the manifest with `changes` applied to whatever is on
+        disk now; a `None` record removes the file. The new manifest
+        is written to a temporary file first and then moved into place,
+        so a reader never sees it half-written, and the whole update is
+        done under a file lock so that two processes saving at once
+        can't drop each other's changes.
+        """
+        lockFile = self.root.joinpath(".locks", f"{bc.cacheManifestFile}.lock")
+        with self._lock, file_lock(lockFile):
+            records = self._read()
+            for key, record in changes.items():
+                if record is None:
+                    records.pop(key, None)
+                else:
+                    records[key] = record
+            self._records.update(records)
+
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = self._file.with_name(f"{self._file.name}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf8") as fd:
+                json.dump(records, fd, indent=2, sort_keys=True)
+            os.replace(tmp, self._file)
+
+
+_manifests: Dict[Path, CacheManifest] = {}
+_manifestsLock = threading.Lock()
+
+
+# ============================================
+#                get_manifest
+# ============================================
+def get_manifest(root: Path) -> CacheManifest:
+    """
+    Returns the manifest for the cache directory `root`. There's only
+    ever one per directory in a process so that its records are shared.
+    """
+    with _manifestsLock:
+        if root not in _manifests:
+            _manifests[root] = CacheManifest(root)
+        return _manifests[root]
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from pathlib import Path
+import shutil
+from typing import Dict
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.cache_manifest import get_manifest
+from bootloader.utilities.storage import get_storage
+
+
+# ============================================
+#                 blob_key
+# ============================================
+def blob_key(sha256: str) -> str:
+    """
+    Returns the key, in the configs storage, of the firmware file whose
+    SHA-256 is `sha256` (see `bc.configFormat`).
+    """
+    return f"{bc.configBlobPrefix}{sha256}"
+
+
+# ============================================
+#                 file_sha256
+# ============================================
+def file_sha256(path: Path) -> str:
+    sha = hashlib.sha256()
+
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+# ============================================
+#                place_blobs
+# ============================================
+def place_blobs(blobs: Dict[str, str], dest: Path) -> int:
+    """
+    Puts the firmware files of a version 2 configuration, `blobs`, which
+    maps each file's name to its SHA-256, in the directory `dest`.
+    Files that are already cached, either in another configuration or
+    as plain firmware files, are copied from there, and only the rest
+    are downloaded, at the same time. Returns how many were downloaded.
+    """
+    missing = {}
+
+    for name, sha256 in blobs.items():
+        for root in (bc.configsPath, bc.firmwarePath):
+            cached = get_manifest(root).find(sha256)
+            if cached is not None:
+                shutil.copyfile(cached, dest.joinpath(name))
+                get_manifest(root).touch(cached)
+                break
+        else:
+            missing[name] = sha256
+
+    if missing:
+        with ThreadPoolExecutor(len(missing), thread_name_prefix="blob") as pool:
+            futures = [
+                pool.submit(_download_blob, sha256, dest.joinpath(name))
+                for name, sha256 in missing.items()
+            ]
+            for future in futures:
+                future.result()
+
+    return len(missing)
+
+
+# ============================================
+#               _download_blob
+# ============================================
+def _download_blob(sha256: str, dest: Path) -> None:
+    get_storage("configs").download(blob_key(sha256), dest)
+
+    if file_sha256(dest) != sha256:
+        dest.unlink()
+        raise RuntimeError(f"Error: the stored copy of {dest.name} is corrupt.")
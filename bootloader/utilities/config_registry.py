@@ -0,0 +1,186 @@
+import json
+from pathlib import PurePosixPath
+from time import time
+from typing import Dict
+from zipfile import ZipFile
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.remote_zip import RemoteZip
+from bootloader.utilities.storage import get_storage
+from bootloader.utilities.storage import Storage
+from bootloader.utilities.storage import StoredObject
+
+# yaml is only needed to read the info file out of an archive, which
+# `show configs` never does
+# pylint: disable=import-outside-toplevel
+
+
+# ============================================
+#              ConfigRegistry
+# ============================================
+class ConfigRegistry:
+    """
+    The metadata of every configuration (the contents of its
+    `bc.configInfoFile`, plus the archive's size and when it was
+    uploaded), kept next to the archives in one object,
+    `bc.configRegistryKey`. That way, listing the configurations, or
+    checking whether one exists, is one small request rather than a
+    listing of the whole bucket or downloading every archive.
+
+    The commands that change the configurations (`config upload`,
+    `config rename`, and `config delete`) update the registry after
+    they're done. Each update re-reads the registry first, but two
+    stations changing configurations at the same moment can still lose
+    one of the updates; `show configs --rebuild` puts it right.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, storage: Storage | None = None) -> None:
+        self._storage = storage if storage is not None else get_storage("configs")
+        self._configs: Dict[str, dict] | None = None
+
+    # -----
+    # configs
+    # -----
+    @property
+    def configs(self) -> Dict[str, dict]:
+        """
+        Maps each configuration's name to its metadata. The registry is
+        fetched the first time this is used.
+        """
+        if self._configs is None:
+            self._configs = self._read()
+        return self._configs
+
+    # -----
+    # exists
+    # -----
+    def exists(self, name: str) -> bool:
+        """
+        Returns `True` if there's a configuration called `name`. Archives
+        uploaded before the registry existed aren't in it, so those are
+        looked up directly, which is still only one request.
+        """
+        return name in self.configs or self._storage.exists(f"{name}.zip")
+
+    # -----
+    # add
+    # -----
+    def add(self, name: str, info: dict, size: int) -> None:
+        """
+        Records the metadata of the configuration `name`, which has just
+        been uploaded: the contents of its info file, `info`, and the
+        size of its archive.
+        """
+        configs = self._read()
+        configs[name] = dict(_plain(info), size=size, uploaded=time())
+        self._write(configs)
+
+    # -----
+    # rename
+    # -----
+    def rename(self, name: str, newName: str) -> None:
+        """
+        Moves the metadata of `name` to `newName`, whose archive has just
+        been renamed. If `name` was uploaded before the registry existed,
+        its metadata is read from the archive instead.
+        """
+        configs = self._read()
+        entry = configs.pop(name, None)
+        if entry is None:
+            entry = self._entry(self._storage.head(f"{newName}.zip"))
+        configs[newName] = entry
+        self._write(configs)
+
+    # -----
+    # remove
+    # -----
+    def remove(self, name: str) -> None:
+        configs = self._read()
+        configs.pop(name, None)
+        self._write(configs)
+
+    # -----
+    # rebuild
+    # -----
+    def rebuild(self) -> None:
+        """
+        Builds the registry from scratch by reading the info file of
+        every archive. Only the info files are downloaded, not the
+        archives (see `RemoteZip`).
+        """
+        configs = {}
+
+        for obj in self._storage.list():
+            if not obj.key.endswith(".zip"):
+                continue
+            # Listings don't always have the ETags that reading checks
+            # against (e.g., `HttpStorage`'s index), so each is asked for
+            configs[PurePosixPath(obj.key).stem] = self._entry(
+                self._storage.head(obj.key)
+            )
+
+        self._write(configs)
+
+    # -----
+    # _entry
+    # -----
+    def _entry(self, obj: StoredObject) -> dict:
+        """
+        Returns the metadata of the archive `obj`, reading only its info
+        file (see `RemoteZip`).
+        """
+        with RemoteZip(self._storage, obj) as archive:
+            info = _plain(read_config_info(archive))
+
+        return dict(info, size=obj.size)
+
+    # -----
+    # _read
+    # -----
+    def _read(self) -> Dict[str, dict]:
+        try:
+            registry = json.loads(self._storage.read(bc.configRegistryKey))
+        except FileNotFoundError:
+            return {}
+
+        return registry.get("configs", {})
+
+    # -----
+    # _write
+    # -----
+    def _write(self, configs: Dict[str, dict]) -> None:
+        data = json.dumps({"configs": configs}, indent=2, sort_keys=True)
+        self._storage.write(bc.configRegistryKey, data.encode())
+        self._configs = configs
+
+
+# ============================================
+#             read_config_info
+# ============================================
+def read_config_info(archive: ZipFile | RemoteZip) -> dict:
+    """
+    Returns the contents of the archive's info file.
+    """
+    import yaml
+
+    try:
+        return yaml.safe_load(archive.read(bc.configInfoFile)) or {}
+    except KeyError:
+        return {}
+
+
+# ============================================
+#                  _plain
+# ============================================
+def _plain(info: dict) -> dict:
+    """
+    Dates (and anything else yaml turns into an object) are kept as
+    strings so the registry is plain JSON. A version 2 configuration's
+    `blobs`, a mapping of file names to SHA-256s, is kept as it is.
+    """
+    return {
+        k: v if isinstance(v, (int, float, dict)) else str(v) for k, v in info.items()
+    }
@@ -1,4 +1,6 @@
 from flexsea.utilities.constants import dephyPath
+from flexsea.utilities.constants import dephyPublicFilesBucket
+from flexsea.utilities.constants import libsPath
 
 
 # ============================================
@@ -20,6 +22,51 @@ firmwarePath = dephyPath.joinpath(firmwareDir)
 configsDir = "configs"
 configsPath = dephyPath.joinpath(configsDir)
 
+# Each run of `flash fleet` writes its per-port logs to a time-stamped
+# sub-directory of this directory
+fleetLogsPath = dephyPath.joinpath("fleet_logs")
+
+# Record of the files flashed onto each device from this machine, used to
+# tell whether a target is already running a given firmware file. There
+# is one file per device so that devices flashed in parallel don't
+# contend for it
+flashHistoryPath = dephyPath.joinpath("flash_history")
+
+# Name of the file, in each of the firmware and configs directories,
+# recording the size and hashes of every file we've downloaded there
+# (see `CacheManifest`)
+cacheManifestFile = ".manifest.json"
+# How long, in seconds, after a cached file was last noted as used before
+# using it again is written to the manifest. `clean` only needs a rough
+# idea of when files were used, and rewriting the manifest on every use
+# would be slow
+cacheTouchInterval = 60 * 60
+
+# The caches that `clean` can garbage collect, by the name used for them
+# on the command line
+gcTargets = {
+    "firmware": firmwarePath,
+    "configs": configsPath,
+    "libs": libsPath,
+}
+
+# Names (or glob patterns) of the cached files and directories that `clean`
+# must never evict, one per line. A bare version, e.g., 7.2.0, pins all of
+# the firmware files and libraries for that version
+cachePinsFile = dephyPath.joinpath("cache_pins.txt")
+
+# Multipliers for the suffixes accepted by `clean --maxSize`
+sizeUnits = {
+    "": 1,
+    "b": 1,
+    "k": 1024,
+    "kb": 1024,
+    "m": 1024**2,
+    "mb": 1024**2,
+    "g": 1024**3,
+    "gb": 1024**3,
+}
+
 # firstSetup is an empty file indicating first time setup has been run
 # (installing mingw, dfuse folder, run st link for drivers)
 firstSetup = dephyPath.joinpath(".first")
@@ -38,6 +85,112 @@ dephyAwsProfile = "dephy"
 # Private bucket where firmware configurations are stored
 dephyConfigsBucket = "dephy-configs"
 
+# Maximum number of connections to S3 the shared client keeps open, which
+# bounds how many requests can be made at once
+s3MaxPoolConnections = 32
+
+# Seconds to wait for a connection to S3, and the number of times a
+# request is tried before giving up
+s3ConnectTimeout = 60
+s3MaxAttempts = 5
+
+# Objects are downloaded in ranges of this many bytes, up to
+# `downloadWorkers` of them at once
+downloadPartSize = 8 * 1024 * 1024
+downloadWorkers = 4
+# How long, in seconds, to wait between attempts to take a file lock on
+# Windows, which has no way of waiting for one for as long as it takes
+# (see `file_lock`)
+fileLockRetryDelay = 0.1
+
+# Configuration archives are uploaded in parts of this many bytes (S3 wants at
+# least 5 MiB), `uploadWorkers` of them at once
+uploadPartSize = 8 * 1024 * 1024
+uploadWorkers = 4
+
+# Region used for anonymous requests to public buckets, which have no
+# profile to take it from
+s3PublicRegion = "us-east-1"
+
+
+# ============================================
+#                   Storage
+# ============================================
+
+# Where firmware, configs, and tools are kept can be changed, e.g., to a
+# directory on a NAS, in this file. See `storage.get_storage`
+storageConfigFile = dephyPath.joinpath("storage.json")
+
+# Where each type of artifact is kept unless the file above says otherwise
+storageDefaults = {
+    "firmware": f"s3://{dephyFirmwareBucket}?profile={dephyAwsProfile}",
+    "configs": f"s3://{dephyConfigsBucket}?profile={dephyAwsProfile}",
+    "tools": f"s3://{dephyPublicFilesBucket}/{toolsDir}",
+}
+
+# Seconds to wait for an HTTP storage server, and the file it lists its
+# contents in
+httpStorageTimeout = 30
+httpStorageIndex = "index.json"
+
+# ============================================
+#                  LAN Mirror
+# ============================================
+
+# A mirror (see `bootloader mirror serve`) is used if its URL is given
+# with the `--mirror` option or in this environment variable
+mirrorEnvVar = "BOOTLOADER_MIRROR"
+
+# Seconds to wait for the mirror before falling back to S3
+mirrorTimeout = 5
+
+# Header the mirror sends each file's SHA-256 in
+mirrorShaHeader = "X-Content-SHA256"
+
+# How long, in seconds, the mirror serves a file before checking that
+# it's still the same on S3
+mirrorRevalidateAfter = 300
+
+# Where `mirror serve` listens and keeps its files, by default
+mirrorPort = 8765
+mirrorPath = dephyPath.joinpath("mirror")
+
+# The buckets the mirror serves, and the profile used for each. The
+# public files bucket is read anonymously
+mirrorBuckets = {
+    dephyFirmwareBucket: dephyAwsProfile,
+    dephyConfigsBucket: dephyAwsProfile,
+    dephyPublicFilesBucket: None,
+}
+
+
+# ============================================
+#              Firmware Catalog
+# ============================================
+
+# Where the index of the firmware bucket used by the `show` commands is kept
+catalogIndexFile = dephyPath.joinpath("firmware_catalog.json")
+
+# How old, in seconds, the index can get before it's refreshed
+catalogTtl = 3600
+
+# The targets whose files are in the firmware bucket. Each one's files are
+# named, and listed, by the prefix `<target>_`
+catalogTargets = ["mn", "re", "ex", "habs"]
+
+# Maximum number of prefixes listed at once
+s3ListWorkers = 8
+
+# Maximum number of files `download firmware` downloads at once
+prefetchWorkers = 8
+
+# The fields that can appear in firmware file names, e.g., `rigid` in
+# re_version-9.1.0_rigid-4.1b_led-generalcolor.cyacd
+catalogFields = ["version", "device", "rigid", "side", "motor", "led"]
+
+# Suffixes of the device field of some Manage files giving the device's spec
+catalogSpecs = ["LtdSpec", "FullSpec"]
+
 
 # ============================================
 #                Dependencies
@@ -106,7 +259,19 @@ bootloaderTools = {
 #                 Constants
 # ============================================
 firmwareExtensions = {"habs": "hex", "ex": "cyacd", "re": "cyacd", "mn": "dfu"}
+# Where each target's flash is, for the targets whose images are written
+# by address (see `firmware_image.check_image`). Habsolute is flashed as an
+# STM32F3 with 256 KB of flash
+firmwareImageRanges = {"habs": (0x08000000, 0x08040000)}
+# The start of the chip ID each target's images must have: the USB vendor
+# ID of a `.dfu` file (STMicroelectronics, or ST's "any" placeholder), or
+# the silicon ID of a `.cyacd` file
+firmwareImageIds = {"mn": ["0483:", "ffff:"]}
+# Parsed firmware images, by SHA-256, so each is only parsed once
+imageCacheFile = dephyPath.joinpath("firmware_images.json")
 targets = ["habs", "ex", "re", "bt121", "xbee", "mn"]
+# Targets whose running firmware version the device can report
+versionedTargets = ["habs", "ex", "re", "mn"]
 supportedOS = [
     "windows_64bit",
     "windows_32bit",
@@ -120,10 +285,77 @@ supportedWindowsVersions = [
 ]
 
 
+# ============================================
+#            Readiness Configuration
+# ============================================
+
+# Upper bounds, in seconds, on how long we wait for each condition
+# before and after running a target's flash tool. We poll the condition
+# and stop waiting as soon as it holds, so these are sized for the
+# slowest devices without costing the fast ones anything.
+#   * tunnel: the target's bootloader answering after tunnel mode is set
+#   * release: the serial port being released (or, for mn, disappearing
+#       as Manage reboots into DFU mode) once the device is closed
+#   * settle: fixed delay after release for conditions we can't observe,
+#       such as the DFU device enumerating
+#   * reboot: the serial port coming back after the flash tool finishes
+readinessProfiles = {
+    "mn": {"tunnel": 20, "release": 13, "settle": 2, "reboot": 0},
+    "ex": {"tunnel": 20, "release": 4, "settle": 0, "reboot": 20},
+    "re": {"tunnel": 20, "release": 3, "settle": 0, "reboot": 0},
+    "habs": {"tunnel": 20, "release": 6, "settle": 0, "reboot": 20},
+    "bt121": {"tunnel": 20, "release": 3, "settle": 0, "reboot": 20},
+    "xbee": {"tunnel": 20, "release": 3, "settle": 0, "reboot": 20},
+}
+
+# Time, in seconds, an operator has to power cycle a device (both for
+# the port to go away and for it to come back) before we give up
+powerCycleTimeout = 120
+
+# How the flash commands wait for the power cycle after flashing:
+#   * auto: watch for the device to go away and come back, falling
+#       back to asking the operator if that times out
+#   * manual: ask the operator to confirm that they've done it
+#   * none: don't wait (e.g., when something else is handling it)
+powerCycleModes = ["auto", "manual", "none"]
+
+# Time, in seconds, between checks of a readiness condition
+readinessPollInterval = 0.25
+
+# Time, in seconds, between requests to activate a target's bootloader
+# while waiting for it to answer
+bootloaderActivationInterval = 5
+
+
 # ============================================
 #    Info for working with Configurations
 # ============================================
 configInfoFile = "config_info.yaml"
+# Newest version of the configuration archives that `config download` can
+# read. Version 1 archives hold the firmware files. Version 2 archives only
+# hold the info file, which gives each firmware file's SHA-256; the files
+# themselves are stored once, as `<configBlobPrefix><sha256>` in the configs
+# storage, however many configurations use them
+configFormat = 2
+# Version of the archives that `config create` makes unless told otherwise.
+# Versions of bootloader from before version 2 can't read it, so this stays
+# at 1 until every station has been updated
+configCreateFormat = 1
+configBlobPrefix = "blobs/"
+# The object, next to the archives, holding every configuration's info
+# (see `ConfigRegistry`)
+configRegistryKey = "registry.json"
+# Written into each extracted configuration, recording the archive it came
+# from and the files in it, so that it's only extracted again if either
+# has changed
+configExtractedFile = ".extracted.json"
+# When only some of a configuration's files are downloaded (see `RemoteZip`),
+# how much of the end of its archive is read to find the list of files in it,
+# which, for a typical configuration, is a few hundred bytes
+configZipTail = 8192
+# and how many bytes are read past the end of each wanted file's data, in case
+# its header is bigger than the list of files says
+configZipSlack = 1024
 
 
 # ============================================
@@ -197,3 +429,75 @@ themes = {
         "success": {"foreground": "default", "options": []},
     },
 }
+
+
+# ============================================
+#           Flash Tool Configuration
+# ============================================
+
+# Time, in seconds, any one run of a tool is allowed before it's killed.
+# The flash tools get their own, per-target limits
+toolTimeout = 360
+flashToolTimeouts = {
+    "mn": 180,
+    "ex": 120,
+    "re": 120,
+    "habs": 180,
+    "bt121": 180,
+    "xbee": 300,
+}
+
+# How many times we run a tool before giving up on a transient failure,
+# and how long, in seconds, we wait before the first retry. The wait
+# doubles with each retry
+toolAttempts = 3
+toolRetryBackoff = 1
+
+# Number of lines of a tool's output kept for error messages
+toolOutputTail = 20
+
+# Patterns for reading progress out of each tool's output, keyed by the
+# name of the executable. Each pattern captures either `percent` or
+# `done` and `total`. The tools redraw their progress in place with
+# carriage returns, which we treat as line breaks
+toolProgressPatterns = {
+    "DfuSeCommand": [r"(?P<percent>\d+(?:\.\d+)?)\s*%"],
+    "stm32flash": [r"\((?P<percent>\d+(?:\.\d+)?)%\)"],
+    "STMFlashLoader": [r"(?P<percent>\d+(?:\.\d+)?)\s*%"],
+    "psocbootloaderhost": [
+        r"[Rr]ow\D*(?P<done>\d+)\s*(?:of|/)\s*(?P<total>\d+)",
+        r"(?P<percent>\d+(?:\.\d+)?)\s*%",
+    ],
+}
+
+# Output (matched case-insensitively) that means a tool failed for a
+# reason that may well go away if we try again, such as the device
+# still enumerating or the port not having been released yet. Any
+# other failure is reported straight away
+toolTransientErrors = [
+    r"timed? ?out",
+    r"no response",
+    r"not responding",
+    r"(could not|cannot|can't|unable to|failed to) (open|init|connect)",
+    r"access is denied",
+    r"resource busy",
+    r"device busy",
+    r"no dfu capable",
+    r"failed to read ack",
+    r"nack",
+]
+
+# The timed steps of a flash, in the order they're shown in the timing
+# summary at the end of each flash
+timingSummaryStages = [
+    "prepare",
+    "check",
+    "confirm",
+    "tunnel",
+    "release",
+    "settle",
+    "tool",
+    "reboot",
+    "powerCycle",
+    "total",
+]
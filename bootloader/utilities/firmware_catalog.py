@@ -0,0 +1,206 @@
+import json
+import os
+from pathlib import Path
+from time import time
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.storage import get_storage
+
+# botocore is slow to import and only needed when the catalog has to be
+# refreshed, so a fresh catalog answers the show commands without it
+# pylint: disable=import-outside-toplevel
+
+
+# ============================================
+#               FirmwareRecord
+# ============================================
+class FirmwareRecord(NamedTuple):
+    """
+    What a firmware file's name says about it. The file names look like
+    `re_version-9.1.0_rigid-4.1b_led-generalcolor.cyacd`: the target,
+    followed by `field-value` pairs. Fields a target's files don't have
+    are `None`.
+    """
+
+    name: str
+    target: str
+    version: str | None = None
+    device: str | None = None
+    rigid: str | None = None
+    side: str | None = None
+    motor: str | None = None
+    led: str | None = None
+    spec: str | None = None
+
+
+# ============================================
+#            parse_firmware_name
+# ============================================
+def parse_firmware_name(name: str) -> FirmwareRecord | None:
+    """
+    Returns the record for the firmware file `name`, or `None` if the
+    name isn't one of ours.
+    """
+    target, *pairs = Path(name).stem.split("_")
+    fields: Dict[str, str] = {}
+
+    for pair in pairs:
+        field, sep, value = pair.partition("-")
+        if not sep or field not in bc.catalogFields:
+            return None
+        fields[field] = value
+
+    # The Manage files for devices that come in more than one spec have
+    # it tacked onto the device name, e.g., device-actpackLtdSpec
+    for spec in bc.catalogSpecs:
+        if fields.get("device", "").endswith(spec):
+            fields["device"] = fields["device"][: -len(spec)]
+            fields["spec"] = spec
+    if fields.get("led", "").endswith("color"):
+        fields["led"] = fields["led"][: -len("color")]
+
+    return FirmwareRecord(name, target, **fields)
+
+
+# ============================================
+#              FirmwareCatalog
+# ============================================
+class FirmwareCatalog:
+    """
+    An index of the firmware bucket, kept on disk so that questions such
+    as "which versions are there for this device?" don't need S3.
+
+    Each target's files are refreshed, by listing just the keys that
+    start with `<target>_`, once they're older than `bc.catalogTtl`, so
+    a question about one target only lists that target's files. S3
+    can't tell us what's changed since a given time, so a refresh lists
+    everything under the prefix, but only names we haven't seen before,
+    or whose ETag has changed, are parsed again. If the bucket can't be
+    listed, a stale index is used rather than none.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, indexFile: Path = bc.catalogIndexFile) -> None:
+        self._indexFile = indexFile
+        self._index = self._read()
+
+    # -----
+    # age
+    # -----
+    def age(self, targets: Iterable[str]) -> float:
+        """
+        Seconds since the oldest of the given targets was refreshed.
+        """
+        refreshed = self._index.get("refreshed", {})
+
+        return time() - min((refreshed.get(t, 0.0) for t in targets), default=time())
+
+    # -----
+    # records
+    # -----
+    @property
+    def records(self) -> List[FirmwareRecord]:
+        return [
+            FirmwareRecord(**obj["record"])
+            for obj in self._index.get("objects", {}).values()
+            if obj["record"] is not None
+        ]
+
+    # -----
+    # ensure_fresh
+    # -----
+    def ensure_fresh(self, targets: Iterable[str], force: bool = False) -> None:
+        """
+        Refreshes whichever of the given targets are stale, or all of
+        them if `force` is set. Raises a `RuntimeError` if the bucket
+        storage can't be listed and there's no index to fall back on.
+        """
+        stale = [t for t in targets if force or self.age([t]) >= bc.catalogTtl]
+        if not stale:
+            return
+
+        from botocore.exceptions import BotoCoreError
+        from botocore.exceptions import ClientError
+
+        try:
+            self.refresh(stale)
+        except (BotoCoreError, ClientError, OSError) as err:
+            if not self._index.get("objects"):
+                msg = f"Error: could not list {get_storage('firmware')}. Check your "
+                msg += "connection and, for S3, the dephy profile in "
+                msg += "'~/.aws/credentials'."
+                raise RuntimeError(msg) from err
+
+    # -----
+    # refresh
+    # -----
+    def refresh(self, targets: Iterable[str]) -> None:
+        prefixes = [f"{t}_" for t in targets]
+        old = self._index.get("objects", {})
+        objects = {k: v for k, v in old.items() if not k.startswith(tuple(prefixes))}
+
+        for obj in get_storage("firmware").list(prefixes):
+            if obj.key in old and old[obj.key]["etag"] == obj.etag:
+                objects[obj.key] = old[obj.key]
+                continue
+            record = parse_firmware_name(obj.key)
+            objects[obj.key] = {
+                "etag": obj.etag,
+                "size": obj.size,
+                "record": record._asdict() if record is not None else None,
+            }
+
+        now = time()
+        refreshed = self._index.get("refreshed", {})
+        refreshed.update({t: now for t in targets})
+        self._index = {"refreshed": refreshed, "objects": objects}
+        self._save()
+
+    # -----
+    # query
+    # -----
+    def query(self, **filters: str | None) -> List[FirmwareRecord]:
+        """
+        Returns the records whose fields match all of the given values,
+        ignoring case. Filters set to `None` are ignored.
+        """
+        filters = {k: v.lower() for k, v in filters.items() if v is not None}
+
+        return [
+            r
+            for r in self.records
+            if all((getattr(r, k) or "").lower() == v for k, v in filters.items())
+        ]
+
+    # -----
+    # _read
+    # -----
+    def _read(self) -> dict:
+        try:
+            with open(self._indexFile, "r", encoding="utf8") as fd:
+                index = json.load(fd)
+        except (OSError, ValueError):
+            return {}
+
+        # Indexes written before targets were refreshed separately have
+        # a single time for the whole index
+        if not isinstance(index.get("refreshed"), dict):
+            index["refreshed"] = {}
+
+        return index
+
+    # -----
+    # _save
+    # -----
+    def _save(self) -> None:
+        self._indexFile.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._indexFile.with_name(f"{self._indexFile.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf8") as fd:
+            json.dump(self._index, fd)
+        os.replace(tmp, self._indexFile)
@@ -0,0 +1,331 @@
+from binascii import Error as HexError
+from binascii import unhexlify
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import threading
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import NamedTuple
+from typing import Tuple
+import zlib
+
+import bootloader.utilities.constants as bc
+
+_lock = threading.Lock()
+_cache: Dict[str, dict] | None = None
+
+
+# ============================================
+#                 ImageInfo
+# ============================================
+class ImageInfo(NamedTuple):
+    """
+    What we learn about a firmware image by parsing it. `start` and
+    `end` (exclusive) are the lowest and highest addresses written, or,
+    for `.cyacd` files, which are written by row, the lowest and
+    highest `(array << 16) | row`. `size` is the number of bytes of
+    data. `target` is the silicon ID of a `.cyacd` file and the
+    `<vendor>:<product>` USB IDs of a `.dfu` file.
+    """
+
+    format: str
+    start: int
+    end: int
+    size: int
+    target: str
+
+
+# ============================================
+#                  _lines
+# ============================================
+def _lines(data: mmap.mmap) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yields the line number and contents of each non-blank line of a
+    text file, without the line ending. Only one line is copied out of
+    `data` at a time. (Views into the map would save even that, but
+    any still held by a traceback would stop the map from closing.)
+    """
+    start = 0
+    number = 0
+
+    while start < len(data):
+        end = data.find(b"\n", start)
+        if end == -1:
+            end = len(data)
+        number += 1
+        line = data[start:end]
+        if line[-1:] == b"\r":
+            line = line[:-1]
+        if line:
+            yield number, line
+        start = end + 1
+
+
+# ============================================
+#                 _record
+# ============================================
+def _record(number: int, line: bytes) -> bytes:
+    """
+    Decodes a `:`-prefixed hex line and checks that its bytes,
+    including the trailing checksum, sum to zero, which holds for both
+    Intel HEX records and `.cyacd` rows.
+    """
+    if line[:1] != b":":
+        raise ValueError(f"line {number} doesn't start with ':'")
+    try:
+        record = unhexlify(line[1:])
+    except HexError as err:
+        raise ValueError(f"line {number} isn't valid hex") from err
+    if sum(record) & 0xFF:
+        raise ValueError(f"line {number} has a bad checksum")
+
+    return record
+
+
+# ============================================
+#                 parse_hex
+# ============================================
+def parse_hex(data: mmap.mmap) -> ImageInfo:
+    """
+    Parses an Intel HEX file.
+    """
+    base = 0
+    start = 1 << 32
+    end = 0
+    size = 0
+
+    for number, line in _lines(data):
+        record = _record(number, line)
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ValueError(f"line {number} has the wrong length")
+
+        kind = record[3]
+        if kind == 0x00:
+            address = base + (record[1] << 8 | record[2])
+            if address + record[0] > 1 << 32:
+                raise ValueError(f"line {number} runs past the end of memory")
+            start = min(start, address)
+            end = max(end, address + record[0])
+            size += record[0]
+        elif kind == 0x01:
+            if not size:
+                raise ValueError("there's no data")
+            return ImageInfo("hex", start, end, size, "")
+        elif kind in (0x02, 0x04):
+            if record[0] != 2:
+                raise ValueError(f"line {number} has the wrong length")
+            shift = 4 if kind == 0x02 else 16
+            base = (record[4] << 8 | record[5]) << shift
+        elif kind not in (0x03, 0x05):
+            raise ValueError(f"line {number} has an unknown record type {kind:02X}")
+
+    raise ValueError("there's no end-of-file record")
+
+
+# ============================================
+#                parse_cyacd
+# ============================================
+def parse_cyacd(data: mmap.mmap) -> ImageInfo:
+    """
+    Parses a Cypress bootloadable (`.cyacd`) file: a header with the
+    silicon ID, revision, and checksum type, and then one line per
+    flash row.
+    """
+    lines = _lines(data)
+
+    try:
+        _, header = next(lines)
+        header = unhexlify(header)
+    except (StopIteration, HexError) as err:
+        raise ValueError("the header isn't valid") from err
+    if len(header) != 6:
+        raise ValueError("the header isn't valid")
+
+    rows = set()
+    rowSize = None
+    size = 0
+
+    for number, line in lines:
+        record = _record(number, line)
+        if len(record) < 6 or len(record) != (record[3] << 8 | record[4]) + 6:
+            raise ValueError(f"line {number} has the wrong length")
+
+        row = record[0] << 16 | record[1] << 8 | record[2]
+        if row in rows:
+            raise ValueError(f"line {number} writes a row that's already written")
+        # Every row of a device's flash is the same size
+        if rowSize not in (None, len(record)):
+            raise ValueError(f"line {number} isn't the same size as the other rows")
+        rows.add(row)
+        rowSize = len(record)
+        size += len(record) - 6
+
+    if not rows:
+        raise ValueError("there's no data")
+
+    return ImageInfo("cyacd", min(rows), max(rows) + 1, size, header[:4].hex())
+
+
+# ============================================
+#                parse_dfuse
+# ============================================
+def parse_dfuse(data: mmap.mmap) -> ImageInfo:
+    """
+    Parses an ST DfuSe (`.dfu`) file: a prefix, one or more targets
+    (e.g., internal flash) each made of elements that are written to a
+    given address, and the standard DFU suffix, whose CRC covers the
+    rest of the file.
+    """
+    length = len(data)
+    if length < 11 + 16 or data[:5] != b"DfuSe":
+        raise ValueError("it isn't a DfuSe file")
+
+    _, product, vendor, _ = struct.unpack_from("<HHHH", data, length - 16)
+    if data[length - 8 : length - 5] != b"UFD" or data[length - 5] != 16:
+        raise ValueError("the DFU suffix is missing")
+
+    (crc,) = struct.unpack_from("<I", data, length - 4)
+    if ~zlib.crc32(memoryview(data)[:-4]) & 0xFFFFFFFF != crc:
+        raise ValueError("the CRC doesn't match")
+
+    (imageSize,) = struct.unpack_from("<I", data, 6)
+    if imageSize != length - 16:
+        raise ValueError("the size in the prefix doesn't match the file")
+
+    start = 1 << 32
+    end = 0
+    size = 0
+    pos = 11
+
+    for _ in range(data[10]):
+        if data[pos : pos + 6] != b"Target":
+            raise ValueError(f"there's no target at byte {pos}")
+        targetSize, elements = struct.unpack_from("<II", data, pos + 266)
+        pos += 274
+        targetEnd = pos + targetSize
+
+        for _ in range(elements):
+            address, elementSize = struct.unpack_from("<II", data, pos)
+            pos += 8 + elementSize
+            if pos > targetEnd or address + elementSize > 1 << 32:
+                raise ValueError(f"the element at {address:#010x} is too big")
+            start = min(start, address)
+            end = max(end, address + elementSize)
+            size += elementSize
+
+        if pos != targetEnd:
+            raise ValueError("a target's size doesn't match its elements")
+
+    if pos != length - 16:
+        raise ValueError("the targets don't fill the file")
+    if not size:
+        raise ValueError("there's no data")
+
+    return ImageInfo("dfu", start, end, size, f"{vendor:04x}:{product:04x}")
+
+
+_parsers: Dict[str, Callable[[mmap.mmap], ImageInfo]] = {
+    "hex": parse_hex,
+    "cyacd": parse_cyacd,
+    "dfu": parse_dfuse,
+}
+
+
+# ============================================
+#                check_image
+# ============================================
+def check_image(path: Path, target: str) -> ImageInfo:
+    """
+    Makes sure `path` is a well-formed firmware image for `target`:
+    every record or row checksum (or the file's CRC) is right, the file
+    isn't cut short, and, where we know them (see
+    `bc.firmwareImageRanges` and `bc.firmwareImageIds`), it's written
+    where the target's flash is and is meant for the target's chip.
+    Raises a `RuntimeError` if not.
+
+    The file is mapped rather than read, and parsed images are cached
+    by their SHA-256 (see `bc.imageCacheFile`), so checking a file
+    that's been checked before only costs hashing it.
+    """
+    fmt = bc.firmwareExtensions[target]
+
+    try:
+        with open(path, "rb") as fd:
+            if os.fstat(fd.fileno()).st_size == 0:
+                raise ValueError("it's empty")
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sha256 = hashlib.sha256(data).hexdigest()
+                cached = _read_cache().get(sha256)
+                if cached is not None and cached["format"] == fmt:
+                    info = ImageInfo(**cached)
+                else:
+                    info = _parsers[fmt](data)
+                    _save_cache(sha256, info)
+        _check_limits(info, target)
+    except (ValueError, struct.error) as err:
+        msg = f"Error: {path.name} is not a valid .{fmt} file for {target}: "
+        msg += f"{err}."
+        raise RuntimeError(msg) from err
+
+    return info
+
+
+# ============================================
+#               _check_limits
+# ============================================
+def _check_limits(info: ImageInfo, target: str) -> None:
+    if target in bc.firmwareImageRanges:
+        low, high = bc.firmwareImageRanges[target]
+        if info.start < low or info.end > high:
+            msg = f"it writes to {info.start:#010x}-{info.end:#010x}, outside of "
+            msg += f"{target}'s flash ({low:#010x}-{high:#010x})"
+            raise ValueError(msg)
+
+    ids = tuple(bc.firmwareImageIds.get(target, [""]))
+    if not info.target.startswith(ids):
+        raise ValueError(f"it's for {info.target}, not {target}")
+
+
+# ============================================
+#                _read_cache
+# ============================================
+def _read_cache() -> Dict[str, dict]:
+    global _cache  # pylint: disable=global-statement
+
+    with _lock:
+        if _cache is None:
+            try:
+                with open(bc.imageCacheFile, "r", encoding="utf8") as fd:
+                    _cache = json.load(fd)
+            except (OSError, ValueError):
+                _cache = {}
+        return _cache
+
+
+# ============================================
+#                _save_cache
+# ============================================
+def _save_cache(sha256: str, info: ImageInfo) -> None:
+    """
+    Adds `info` to the cache and rewrites it atomically. Another
+    process's additions since we read it can be lost, which only means
+    those images are parsed again.
+    """
+    cache = _read_cache()
+
+    with _lock:
+        cache[sha256] = info._asdict()
+        tmp = bc.imageCacheFile.with_name(f"{bc.imageCacheFile.name}.{os.getpid()}")
+        try:
+            bc.imageCacheFile.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf8") as fd:
+                json.dump(cache, fd)
+            os.replace(tmp, bc.imageCacheFile)
+        except OSError:
+            # The cache only saves time, so failing to write it is fine
+            tmp.unlink(missing_ok=True)
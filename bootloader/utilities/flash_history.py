@@ -0,0 +1,89 @@
+import hashlib
+from pathlib import Path
+
+import yaml
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#                 file_sha256
+# ============================================
+def file_sha256(path: Path | str) -> str:
+    sha = hashlib.sha256()
+
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+# ============================================
+#               _load_history
+# ============================================
+def _load_history(deviceId: int) -> dict:
+    historyFile = bc.flashHistoryPath.joinpath(f"{deviceId}.yaml")
+
+    if not historyFile.is_file():
+        return {}
+
+    with open(historyFile, "r", encoding="utf8") as fd:
+        return yaml.safe_load(fd) or {}
+
+
+# ============================================
+#               _save_history
+# ============================================
+def _save_history(deviceId: int, history: dict) -> None:
+    bc.flashHistoryPath.mkdir(parents=True, exist_ok=True)
+
+    with open(
+        bc.flashHistoryPath.joinpath(f"{deviceId}.yaml"), "w", encoding="utf8"
+    ) as fd:
+        yaml.safe_dump(history, fd)
+
+
+# ============================================
+#                record_flash
+# ============================================
+def record_flash(
+    deviceId: int, target: str, fwFile: Path | str, version: str | None
+) -> None:
+    """
+    Notes that `fwFile` was flashed onto `target` of the device with
+    the given ID. `version` is the firmware version of the file, if
+    known.
+    """
+    history = _load_history(deviceId)
+    history[target] = {"sha256": file_sha256(fwFile), "version": version}
+    _save_history(deviceId, history)
+
+
+# ============================================
+#             flashed_file_matches
+# ============================================
+def flashed_file_matches(
+    deviceId: int, target: str, fwFile: Path | str, running: str
+) -> bool:
+    """
+    Returns `True` if `fwFile` is the last file we flashed onto
+    `target` and the target is still running what we flashed.
+
+    When we flash a file whose version we don't know, we can't check
+    that last part until we next talk to the device, so the first
+    version we see afterwards is taken to be the file's. After that,
+    a different running version means something else has been flashed
+    since.
+    """
+    history = _load_history(deviceId)
+    record = history.get(target)
+
+    if record is None or record["sha256"] != file_sha256(fwFile):
+        return False
+
+    if record["version"] is None:
+        record["version"] = running
+        _save_history(deviceId, history)
+
+    return record["version"] == running
@@ -0,0 +1,134 @@
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+
+from flexsea.device import Device
+
+from bootloader.utilities.tracing import Tracer
+
+
+# ============================================
+#                FlashSession
+# ============================================
+class FlashSession:
+    """
+    State shared by the individual flash commands when several targets
+    are flashed one after another on the same device, as `flash all`
+    and `flash config` do.
+
+    Without a session, each target's command downloads the tools,
+    fetches its firmware, creates a new `Device` (loading the C
+    library), and opens the port all over again. With one, the tools
+    and firmware for every target are fetched once, in the background,
+    while the first target is being flashed, and the same `Device` is
+    reused; it is only re-opened if the previous flash closed it.
+
+    The session is used in two passes. In the first, `prepareOnly` is
+    set and each target's command only parses its arguments and queues
+    up its downloads. In the second, the commands are run again and
+    pick up the results.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, maxDownloads: int = 4) -> None:
+        self.device: Device | None = None
+        self.prepareOnly: bool = False
+        # Set if the device comes back on a different port after a power cycle
+        self.port: str | None = None
+        # The versions reported by the device when we first asked
+        self.runningFirmware: dict = {}
+        # Target -> why it wasn't flashed
+        self.skipped: Dict[str, str] = {}
+        self.tracer = Tracer()
+
+        self._firmware: Dict[str, Future] = {}
+        self._prepared: set = set()
+        self._shownTools: set = set()
+        self._tools: Dict[str, Future] = {}
+
+        # `download tools` is a single command instance, so its runs have
+        # to happen one at a time
+        self._toolsPool = ThreadPoolExecutor(max_workers=1)
+        self._firmwarePool = ThreadPoolExecutor(max_workers=maxDownloads)
+
+    # -----
+    # mark_prepared
+    # -----
+    def mark_prepared(self, target: str) -> None:
+        self._prepared.add(target)
+
+    # -----
+    # is_prepared
+    # -----
+    def is_prepared(self, target: str) -> bool:
+        return target in self._prepared
+
+    # -----
+    # prefetch_tools
+    # -----
+    def prefetch_tools(
+        self, toolsets: Iterable[str], download: Callable[[str], str]
+    ) -> None:
+        """
+        Queues up `download(toolset)` for each toolset we haven't
+        already asked for.
+        """
+        for toolset in toolsets:
+            if toolset not in self._tools:
+                self._tools[toolset] = self._toolsPool.submit(download, toolset)
+
+    # -----
+    # get_tools
+    # -----
+    def get_tools(self, toolsets: Iterable[str], download: Callable[[str], str]) -> str:
+        """
+        Waits for the given toolsets to be downloaded and returns the
+        output of those downloads that hasn't already been shown.
+        """
+        toolsets = list(toolsets)
+        self.prefetch_tools(toolsets, download)
+
+        output = ""
+        for toolset in toolsets:
+            text = self._tools[toolset].result()
+            if toolset not in self._shownTools:
+                self._shownTools.add(toolset)
+                output += text
+
+        return output
+
+    # -----
+    # prefetch_firmware
+    # -----
+    def prefetch_firmware(
+        self, target: str, fetch: Callable[[], Path | str | None]
+    ) -> None:
+        if target not in self._firmware:
+            self._firmware[target] = self._firmwarePool.submit(fetch)
+
+    # -----
+    # get_firmware
+    # -----
+    def get_firmware(
+        self, target: str, fetch: Callable[[], Path | str | None]
+    ) -> Path | str | None:
+        self.prefetch_firmware(target, fetch)
+        return self._firmware[target].result()
+
+    # -----
+    # close
+    # -----
+    def close(self) -> None:
+        """
+        Waits for any outstanding downloads and closes the device.
+        """
+        self._toolsPool.shutdown(cancel_futures=True)
+        self._firmwarePool.shutdown(cancel_futures=True)
+
+        if self.device is not None and self.device.connected:
+            self.device.close()
@@ -47,6 +47,34 @@ def all_help() -> str:
     return "Flashes new firmware onto xbee, bt121, habs, ex, re, and mn."
 
 
+# ============================================
+#                 fleet_help
+# ============================================
+def fleet_help() -> str:
+    msg = "Flashes many devices at once, each on its own port, as described by a\n"
+    msg += "YAML manifest. Each device in the manifest lists its port, the targets\n"
+    msg += "to flash (in order), and the arguments those targets' flash commands\n"
+    msg += "need, using the same names as the commands themselves. Values that are\n"
+    msg += "the same for every device can go in a `defaults` section:\n\n"
+    msg += "    defaults:\n"
+    msg += "      currentMnFw: 12.0.0\n"
+    msg += "      to: 12.0.0\n"
+    msg += "      rigidVersion: 4.1B\n"
+    msg += "    devices:\n"
+    msg += "      - port: COM3\n"
+    msg += "        targets: [ex, re, mn]\n"
+    msg += "        motorType: actpack\n"
+    msg += "        led: multi\n"
+    msg += "        deviceName: actpack\n"
+    msg += "        side: none\n\n"
+    msg += "Each target's output is written to a log file for its port. Between\n"
+    msg += "targets, the device must be power cycled; the next target starts as\n"
+    msg += "soon as the device's port goes away and comes back. A summary of which\n"
+    msg += "targets passed or failed is shown at the end."
+
+    return msg
+
+
 # ============================================
 #                  tools_help
 # ============================================
@@ -54,11 +82,47 @@ def tools_help() -> str:
     return "Downloads tools for bootloading."
 
 
+# ============================================
+#            download_firmware_help
+# ============================================
+def download_firmware_help() -> str:
+    msg = "Downloads every firmware file for the given version and/or matching the\n"
+    msg += "given filters, several at a time, so that a station has everything it\n"
+    msg += "needs cached before it's used. Files that are already cached are skipped.\n"
+    msg += "The filters are the same as those of `show versions`, e.g.:\n\n"
+    msg += "    bootloader download firmware 9.1.0 --device exo --rigid 4.1b"
+
+    return msg
+
+
+# ============================================
+#             mirror_serve_help
+# ============================================
+def mirror_serve_help() -> str:
+    msg = "Serves the firmware, configurations, and tools other stations would get\n"
+    msg += "from S3, so that a shop full of stations only downloads each file from\n"
+    msg += "S3 once. Files are fetched from S3 the first time they're asked for and\n"
+    msg += "checked against S3 every few minutes after that. If S3 can't be reached,\n"
+    msg += "the cached copies are served.\n\n"
+    msg += "Stations use the mirror when given its address, either with `--mirror`\n"
+    msg += "or the `BOOTLOADER_MIRROR` environment variable, e.g.:\n\n"
+    msg += "    bootloader flash fleet ... --mirror http://192.168.1.10:8765\n\n"
+    msg += "and go straight to S3 whenever the mirror can't be reached."
+
+    return msg
+
+
 # ============================================
 #             config_create_help
 # ============================================
 def config_create_help() -> str:
-    return "Creates a collection of files that can be flashed via `flash config`"
+    msg = "Creates a collection of files that can be flashed via `flash config` "
+    msg += "and uploads it as it's made. With `--format 2`, firmware files are "
+    msg += "stored once and shared between configurations, but only stations "
+    msg += "running a version of bootloader that supports it can download them. "
+    msg += "Update every station before using it."
+
+    return msg
 
 
 # ============================================
@@ -68,25 +132,44 @@ def config_rename_help() -> str:
     return "Renames an existing configuration."
 
 
+# ============================================
+#             config_delete_help
+# ============================================
+def config_delete_help() -> str:
+    return "Deletes an existing configuration."
+
+
 # ============================================
 #             show_configs_help
 # ============================================
 def show_configs_help() -> str:
-    return "Displays the available pre-made configurations for flashing."
+    msg = "Displays the available pre-made configurations for flashing, along with\n"
+    msg += "the firmware version and date of each, from the configurations' registry.\n"
+    msg += "Configurations uploaded before the registry existed are added to it with\n"
+    msg += "`--rebuild`, which reads each configuration's info file."
+
+    return msg
 
 
 # ============================================
 #             flash_config_help
 # ============================================
 def flash_config_help() -> str:
-    return "Flashes the files stored in the given config."
+    msg = "Flashes the files stored in the given config. With `--target`, only the "
+    msg += "given targets are flashed, and only their firmware is downloaded."
+
+    return msg
 
 
 # ============================================
 #            config_download_help
 # ============================================
 def config_download_help() -> str:
-    return "Downloads the given configuration from S3."
+    msg = "Downloads the given configuration from S3 and extracts it. A cached "
+    msg += "configuration is only downloaded again if it has changed. With "
+    msg += "`--target`, only the firmware for the given targets is downloaded."
+
+    return msg
 
 
 # ============================================
@@ -121,13 +204,23 @@ def show_versions_help() -> str:
 #                 clean_help
 # ============================================
 def clean_help() -> str:
-    msg = "Removes the `target` directory. `target` can be: `all`, `libs`, `tools`\n"
-    msg += "or `firmware`.\n\nIf `target` is `libs`, all of the cached pre-compiled\n"
-    msg += "C libraries will be removed.\n\nIf `target` is `tools`, then all of the\n"
-    msg += "cached tools necessary for bootloading will be removed. This will force\n"
-    msg += "them to be re-downloaded.\n\nIf `target` is firmware, the all of the\n"
-    msg += "cached firmware files will be removed.\n\nIf `target` is `all`, then all\n"
-    msg += "of the above operations will be performed."
+    msg = "Removes the `target` directory. `target` can be: `all`, `libs`, `tools`,\n"
+    msg += "`firmware`, or `configs`.\n\nIf `target` is `libs`, all of the cached\n"
+    msg += "pre-compiled C libraries will be removed.\n\nIf `target` is `tools`, then\n"
+    msg += "all of the cached tools necessary for bootloading will be removed. This\n"
+    msg += "will force them to be re-downloaded.\n\nIf `target` is firmware, the all\n"
+    msg += "of the cached firmware files will be removed.\n\nIf `target` is\n"
+    msg += "`configs`, all of the downloaded configurations will be removed.\n\n"
+    msg += (
+        "If `target` is `all`, then all of the above operations will be performed.\n\n"
+    )
+    msg += "Given `--maxSize` and/or `--maxAge`, only some of the cached firmware\n"
+    msg += "files, configurations, and libraries are removed instead. `--maxAge`\n"
+    msg += "removes anything that hasn't been used in that many days, and `--maxSize`\n"
+    msg += "(e.g., 500MB or 2GB) then removes the least recently used files until\n"
+    msg += "the cache is no bigger than that. Anything matching a name, glob, or\n"
+    msg += "version given with `--pin`, or listed one per line in\n"
+    msg += "`~/.dephy/cache_pins.txt`, is never removed this way."
 
     return msg
 
@@ -0,0 +1,72 @@
+import hashlib
+import os
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.error import URLError
+from urllib.parse import quote
+from urllib.request import Request
+from urllib.request import urlopen
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#                 mirror_url
+# ============================================
+def mirror_url() -> str | None:
+    """
+    Returns the URL of the mirror to try before S3 (see `bootloader
+    mirror serve`), if one has been set, either with the `--mirror`
+    option or the `bc.mirrorEnvVar` environment variable.
+    """
+    url = os.environ.get(bc.mirrorEnvVar, "").strip()
+
+    return url.rstrip("/") or None
+
+
+# ============================================
+#             fetch_from_mirror
+# ============================================
+def fetch_from_mirror(
+    url: str, bucket: str, key: str, dest: Path, etag: str | None = None
+) -> str | None:
+    """
+    Downloads `key` from `bucket` via the mirror at `url` to `dest` and
+    returns its ETag. `etag` is that of the copy already at `dest`, if
+    any; if the mirror says it's still current, `dest` is left alone.
+
+    Returns `None` if the mirror can't be reached or doesn't have the
+    file, so that the caller can fall back to S3. The file is checked
+    against the SHA-256 the mirror sends with it and is only moved to
+    `dest` if it matches.
+    """
+    request = Request(f"{url}/{quote(bucket)}/{quote(key)}")
+    if etag is not None and dest.is_file():
+        request.add_header("If-None-Match", f'"{etag}"')
+
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.mirror")
+
+    try:
+        with urlopen(request, timeout=bc.mirrorTimeout) as response:
+            # A proxy in front of the mirror may have dropped it
+            mirrored = response.headers.get("ETag")
+            if mirrored is None:
+                return None
+            sha = hashlib.sha256()
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as fd:
+                for chunk in iter(lambda: response.read(1 << 20), b""):
+                    sha.update(chunk)
+                    fd.write(chunk)
+            if sha.hexdigest() != response.headers.get(bc.mirrorShaHeader):
+                return None
+            os.replace(tmp, dest)
+            return mirrored.strip('"')
+    except HTTPError as err:
+        if err.code == 304:
+            return etag
+        return None
+    except (URLError, OSError):
+        return None
+    finally:
+        tmp.unlink(missing_ok=True)
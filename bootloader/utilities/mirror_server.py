@@ -0,0 +1,182 @@
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from pathlib import PurePosixPath
+import threading
+from time import monotonic
+from typing import Dict
+from typing import Tuple
+from urllib.parse import unquote
+from urllib.parse import urlparse
+
+from botocore.exceptions import BotoCoreError
+from botocore.exceptions import ClientError
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.cache_manifest import get_manifest
+from bootloader.utilities.ranged_download import file_lock
+from bootloader.utilities.s3_client import get_s3_client
+from bootloader.utilities.s3_client import s3_download
+
+
+# ============================================
+#                   Mirror
+# ============================================
+class Mirror:
+    """
+    A cache of S3 objects under `root`, one directory per bucket. An
+    object that isn't cached yet is downloaded from S3 the first time
+    it's asked for. One that is is served as is, unless it's been more
+    than `bc.mirrorRevalidateAfter` seconds since we last checked that
+    it's still the same as on S3, in which case we check (with a HEAD,
+    which is cheap) and download it again if it's changed. If S3 can't
+    be reached, whatever is cached is served.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._checked: Dict[Path, float] = {}
+
+    # -----
+    # fetch
+    # -----
+    def fetch(self, bucket: str, key: str) -> Tuple[Path, dict]:
+        """
+        Returns the path to the cached copy of `key` and its manifest
+        record, downloading it first if need be. Raises
+        `FileNotFoundError` if there's no such object.
+        """
+        profile = bc.mirrorBuckets[bucket]
+        cache = self.root.joinpath(bucket)
+        path = cache.joinpath(*PurePosixPath(key).parts)
+        manifest = get_manifest(cache)
+
+        with file_lock(cache.joinpath(".locks", f"{path.name}.lock")):
+            if manifest.is_valid(path) and not self._stale(path, bucket, key):
+                return path, manifest.get(path)
+
+            try:
+                etag = s3_download(key, bucket, str(path), profile)
+            except (BotoCoreError, ClientError, RuntimeError, FileNotFoundError):
+                if manifest.is_valid(path):
+                    return path, manifest.get(path)
+                raise
+
+            with self._lock:
+                self._checked[path] = monotonic()
+
+            return path, manifest.record(path, etag)
+
+    # -----
+    # _stale
+    # -----
+    def _stale(self, path: Path, bucket: str, key: str) -> bool:
+        """
+        Returns `True` if the cached copy at `path` is known to differ
+        from the object on S3, checking if we haven't in a while.
+        """
+        with self._lock:
+            checked = self._checked.get(path)
+        if checked is not None and monotonic() - checked < bc.mirrorRevalidateAfter:
+            return False
+
+        try:
+            client = get_s3_client(bc.mirrorBuckets[bucket])
+            head = client.head_object(Bucket=bucket, Key=key)
+        except ClientError:
+            # `key` is probably a base name that `s3_download` had to search
+            # the bucket for, so we can't tell without downloading it again
+            return True
+        except BotoCoreError:
+            # S3 can't be reached, so the cached copy is the best we have
+            return False
+
+        with self._lock:
+            self._checked[path] = monotonic()
+
+        # The records are kept by the bucket's cache directory, whatever
+        # folder the object is in
+        record = get_manifest(self.root.joinpath(bucket)).get(path)
+
+        return record is None or head["ETag"].strip('"') != record["etag"]
+
+
+# ============================================
+#               MirrorHandler
+# ============================================
+class MirrorHandler(BaseHTTPRequestHandler):
+    """
+    Serves `GET /<bucket>/<key>` (and `HEAD`) from the server's
+    `Mirror`. Each response carries the object's S3 ETag and the file's
+    SHA-256 so clients can check what they got, and a request whose
+    `If-None-Match` has the current ETag gets a `304 Not Modified`.
+    """
+
+    server: "MirrorServer"
+
+    # pylint: disable-next=invalid-name
+    def do_GET(self) -> None:
+        self._respond(True)
+
+    # pylint: disable-next=invalid-name
+    def do_HEAD(self) -> None:
+        self._respond(False)
+
+    def _respond(self, sendBody: bool) -> None:
+        parts = PurePosixPath(unquote(urlparse(self.path).path)).parts[1:]
+
+        if len(parts) < 2 or parts[0] not in bc.mirrorBuckets or ".." in parts:
+            self.send_error(404)
+            return
+
+        try:
+            path, record = self.server.mirror.fetch(parts[0], "/".join(parts[1:]))
+        except (FileNotFoundError, ClientError):
+            self.send_error(404)
+            return
+        except (BotoCoreError, RuntimeError) as err:
+            self.send_error(502, explain=str(err))
+            return
+
+        etag = f'"{record["etag"]}"'
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(record["size"]))
+        self.send_header("ETag", etag)
+        self.send_header(bc.mirrorShaHeader, record["sha256"])
+        self.end_headers()
+
+        if sendBody:
+            with open(path, "rb") as fd:
+                for chunk in iter(lambda: fd.read(1 << 20), b""):
+                    self.wfile.write(chunk)
+
+    # pylint: disable-next=redefined-builtin
+    def log_message(self, format: str, *args) -> None:
+        self.server.log(format % args)
+
+
+# ============================================
+#               MirrorServer
+# ============================================
+class MirrorServer(ThreadingHTTPServer):
+    """
+    `log` is called with a line for each request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], root: Path, log=print) -> None:
+        super().__init__(address, MirrorHandler)
+        self.mirror = Mirror(root)
+        self.log = log
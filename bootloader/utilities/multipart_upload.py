@@ -0,0 +1,242 @@
+import base64
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+import hashlib
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#              MultipartUpload
+# ============================================
+class MultipartUpload:
+    """
+    A write-only file that uploads what's written to it to an S3 object
+    in parts of `bc.uploadPartSize` bytes, `bc.uploadWorkers` of them at
+    once, so that it can be written as a stream (e.g., by a `ZipFile`)
+    without ever being saved. At most a few parts are held in memory:
+    writing waits for earlier parts to finish if too many are pending.
+
+    Each part is sent with its SHA-256, which S3 checks before taking
+    it, and the checksum S3 gives back for the whole object is checked
+    against the parts' once the upload is complete. Anything small
+    enough to fit in one part is sent with a single `put_object` instead.
+
+    The object is only created when the upload is closed. If the upload
+    fails, or the `with` block it's used in raises, it's aborted, and
+    the parts already sent are thrown away.
+
+    `progress`, if given, is called with the total number of bytes sent
+    every time a part finishes, from the thread that's writing.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        key: str,
+        progress: Callable[[int], None] | None = None,
+    ) -> None:
+        self._client = client
+        self._args = {"Bucket": bucket, "Key": key}
+        self._progress = progress
+        self._buffer = bytearray()
+        self._uploadId: str | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: Dict[Future, int] = {}
+        self._parts: List[dict] = []
+        self._sent = 0
+
+    # -----
+    # __enter__
+    # -----
+    def __enter__(self) -> "MultipartUpload":
+        return self
+
+    # -----
+    # __exit__
+    # -----
+    def __exit__(self, excType, *args) -> None:
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+    # -----
+    # writable
+    # -----
+    def writable(self) -> bool:
+        return True
+
+    # -----
+    # flush
+    # -----
+    def flush(self) -> None:
+        pass
+
+    # -----
+    # write
+    # -----
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+
+        while len(self._buffer) >= bc.uploadPartSize:
+            part = bytes(self._buffer[: bc.uploadPartSize])
+            del self._buffer[: bc.uploadPartSize]
+            self._submit(part)
+
+        return len(data)
+
+    # -----
+    # close
+    # -----
+    def close(self) -> None:
+        """
+        Sends whatever's left and puts the parts together into the
+        object.
+        """
+        try:
+            if self._uploadId is None:
+                self._put(bytes(self._buffer))
+                return
+
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+            self._collect(0)
+            self._complete()
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+
+    # -----
+    # abort
+    # -----
+    def abort(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self._uploadId is not None:
+            uploadId, self._uploadId = self._uploadId, None
+            self._client.abort_multipart_upload(UploadId=uploadId, **self._args)
+
+    # -----
+    # _submit
+    # -----
+    def _submit(self, part: bytes) -> None:
+        """
+        Starts sending `part`, first waiting for room if as many parts
+        as can be held are already on their way.
+        """
+        if self._uploadId is None:
+            response = self._client.create_multipart_upload(
+                ChecksumAlgorithm="SHA256", **self._args
+            )
+            self._uploadId = response["UploadId"]
+            self._pool = ThreadPoolExecutor(
+                bc.uploadWorkers, thread_name_prefix="upload"
+            )
+
+        self._collect(2 * bc.uploadWorkers - 1)
+        number = len(self._parts) + len(self._pending) + 1
+        self._pending[self._pool.submit(self._send, number, part)] = len(part)
+
+    # -----
+    # _collect
+    # -----
+    def _collect(self, most: int) -> None:
+        """
+        Waits until no more than `most` parts are on their way, raising
+        the error of any part that failed.
+        """
+        while len(self._pending) > most:
+            done, _ = wait(self._pending, return_when="FIRST_COMPLETED")
+            for future in done:
+                size = self._pending.pop(future)
+                self._parts.append(future.result())
+                self._sent += size
+                if self._progress is not None:
+                    self._progress(self._sent)
+
+    # -----
+    # _send
+    # -----
+    def _send(self, number: int, part: bytes) -> dict:
+        checksum = _sha256(part)
+        response = self._client.upload_part(
+            Body=part,
+            PartNumber=number,
+            UploadId=self._uploadId,
+            ChecksumSHA256=checksum,
+            **self._args,
+        )
+
+        if response.get("ChecksumSHA256", checksum) != checksum:
+            msg = f"Error: part {number} of {self._args['Key']} was corrupted "
+            msg += "in transit."
+            raise RuntimeError(msg)
+
+        return {
+            "PartNumber": number,
+            "ETag": response["ETag"],
+            "ChecksumSHA256": checksum,
+        }
+
+    # -----
+    # _put
+    # -----
+    def _put(self, data: bytes) -> None:
+        checksum = _sha256(data)
+        response = self._client.put_object(
+            Body=data, ChecksumSHA256=checksum, **self._args
+        )
+
+        if response.get("ChecksumSHA256", checksum) != checksum:
+            raise RuntimeError(f"Error: {self._args['Key']} was corrupted in transit.")
+
+        self._sent = len(data)
+        if self._progress is not None:
+            self._progress(self._sent)
+
+    # -----
+    # _complete
+    # -----
+    def _complete(self) -> None:
+        """
+        Puts the parts together. S3's checksum of a multipart object is
+        the SHA-256 of its parts' SHA-256s, followed by the number of
+        parts.
+        """
+        self._pool.shutdown()
+        self._pool = None
+        parts = sorted(self._parts, key=lambda p: p["PartNumber"])
+
+        response = self._client.complete_multipart_upload(
+            UploadId=self._uploadId, MultipartUpload={"Parts": parts}, **self._args
+        )
+        self._uploadId = None
+
+        digests = b"".join(base64.b64decode(p["ChecksumSHA256"]) for p in parts)
+        expected = f"{_sha256(digests)}-{len(parts)}"
+        if response.get("ChecksumSHA256", expected) != expected:
+            self._client.delete_object(**self._args)
+            raise RuntimeError(f"Error: {self._args['Key']} was corrupted in transit.")
+
+
+# ============================================
+#                  _sha256
+# ============================================
+def _sha256(data: bytes) -> str:
+    """
+    Returns the base64-encoded SHA-256 of `data`, as S3 wants it.
+    """
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
@@ -0,0 +1,278 @@
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+from time import sleep
+from typing import Any
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#                 file_lock
+# ============================================
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Holds an exclusive lock on `path`, creating it if need be, for the
+    body of the `with` block, waiting for any other process (or thread)
+    that holds it. The operating system releases the lock if the holder
+    dies, so a crashed download never leaves the file locked.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # pylint: disable=import-outside-toplevel,import-error
+    with open(path, "a+b") as fd:
+        if os.name == "nt":
+            import msvcrt
+
+            fd.seek(0)
+            while True:
+                try:
+                    # LK_LOCK only retries for ~10 seconds before giving up
+                    msvcrt.locking(fd.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    sleep(bc.fileLockRetryDelay)
+            try:
+                yield
+            finally:
+                fd.seek(0)
+                msvcrt.locking(fd.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+# ============================================
+#                 file_etag
+# ============================================
+def file_etag(path: Path, partSize: int | None = None) -> str:
+    """
+    Returns the ETag S3 would give the file at `path`: its MD5 if it
+    was uploaded in one go, or, if it was uploaded in parts of
+    `partSize` bytes, the MD5 of the parts' MD5s followed by `-` and
+    the number of parts.
+    """
+    whole = hashlib.md5()
+    parts: List[bytes] = []
+    part = hashlib.md5()
+    partLength = 0
+
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            whole.update(chunk)
+            while partSize and chunk:
+                take = chunk[: partSize - partLength]
+                part.update(take)
+                partLength += len(take)
+                chunk = chunk[len(take) :]
+                if partLength == partSize:
+                    parts.append(part.digest())
+                    part = hashlib.md5()
+                    partLength = 0
+
+    if not partSize:
+        return whole.hexdigest()
+    if partLength:
+        parts.append(part.digest())
+
+    return f"{hashlib.md5(b''.join(parts)).hexdigest()}-{len(parts)}"
+
+
+# ============================================
+#              RangedDownload
+# ============================================
+class RangedDownload:
+    """
+    Downloads an S3 object as a number of byte ranges fetched in
+    parallel, each written straight to its place in `.<dest>.part`.
+
+    Which ranges are done is saved in `.<dest>.part.json` as they finish,
+    so if the download is interrupted, the next attempt only fetches
+    the ranges that are missing, provided the object hasn't changed
+    since (i.e., it still has the same ETag). Once every range is in,
+    the file is checked against the ETag and only then renamed to
+    `dest`. A file that doesn't match is thrown away.
+
+    Callers that might download the same file at the same time must
+    serialize with `file_lock`.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, client: Any, bucket: str, key: str, dest: Path) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._dest = dest
+        self._part = dest.with_name(f".{dest.name}.part")
+        self._stateFile = dest.with_name(f".{dest.name}.part.json")
+        self._lock = threading.Lock()
+        self._state: dict = {}
+
+    # -----
+    # run
+    # -----
+    def run(self) -> str:
+        """
+        Downloads the object and returns its ETag.
+        """
+        head = self._client.head_object(Bucket=self._bucket, Key=self._key)
+        size = head["ContentLength"]
+        etag = head["ETag"].strip('"')
+
+        self._resume_or_start(size, etag)
+        ranges = self._ranges(size)
+        todo = [i for i in range(len(ranges)) if i not in self._state["done"]]
+
+        if todo:
+            workers = min(bc.downloadWorkers, len(todo))
+            with ThreadPoolExecutor(workers, thread_name_prefix="range") as pool:
+                futures = {pool.submit(self._fetch, ranges[i], etag): i for i in todo}
+                errors = []
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as err:  # pylint: disable=broad-exception-caught
+                        errors.append(err)
+                    else:
+                        self._mark_done(futures[future])
+            if errors:
+                raise errors[0]
+
+        if not self._matches(etag):
+            self._discard()
+            msg = f"Error: {self._key} does not match its ETag after downloading."
+            raise RuntimeError(msg)
+
+        os.replace(self._part, self._dest)
+        self._stateFile.unlink(missing_ok=True)
+
+        return etag
+
+    # -----
+    # _ranges
+    # -----
+    def _ranges(self, size: int) -> List[Tuple[int, int]]:
+        partSize = self._state["partSize"]
+
+        return [
+            (start, min(start + partSize, size) - 1)
+            for start in range(0, size, partSize)
+        ]
+
+    # -----
+    # _resume_or_start
+    # -----
+    def _resume_or_start(self, size: int, etag: str) -> None:
+        """
+        Picks up the saved state of an earlier attempt at the same
+        version of the object, or starts over.
+        """
+        try:
+            with open(self._stateFile, "r", encoding="utf8") as fd:
+                state = json.load(fd)
+        except (OSError, ValueError):
+            state = {}
+
+        resumable = (
+            state.get("etag") == etag
+            and state.get("size") == size
+            and self._part.is_file()
+            and self._part.stat().st_size == size
+        )
+
+        if resumable:
+            state["done"] = set(state["done"])
+            self._state = state
+            return
+
+        self._state = {
+            "etag": etag,
+            "size": size,
+            "partSize": bc.downloadPartSize,
+            "done": set(),
+        }
+        self._dest.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._part, "wb") as fd:
+            fd.truncate(size)
+        self._save_state()
+
+    # -----
+    # _fetch
+    # -----
+    def _fetch(self, byteRange: Tuple[int, int], etag: str) -> None:
+        start, end = byteRange
+        response = self._client.get_object(
+            Bucket=self._bucket,
+            Key=self._key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=etag,
+        )
+
+        written = 0
+        with open(self._part, "r+b") as fd:
+            fd.seek(start)
+            for chunk in response["Body"].iter_chunks(1 << 20):
+                fd.write(chunk)
+                written += len(chunk)
+
+        if written != end - start + 1:
+            msg = f"Error: got {written} bytes of {self._key} instead of "
+            msg += f"{end - start + 1}."
+            raise RuntimeError(msg)
+
+    # -----
+    # _mark_done
+    # -----
+    def _mark_done(self, index: int) -> None:
+        with self._lock:
+            self._state["done"].add(index)
+            self._save_state()
+
+    # -----
+    # _save_state
+    # -----
+    def _save_state(self) -> None:
+        state = dict(self._state, done=sorted(self._state["done"]))
+        tmp = self._stateFile.with_name(f"{self._stateFile.name}.tmp")
+        with open(tmp, "w", encoding="utf8") as fd:
+            json.dump(state, fd)
+        os.replace(tmp, self._stateFile)
+
+    # -----
+    # _matches
+    # -----
+    def _matches(self, etag: str) -> bool:
+        if "-" not in etag:
+            return file_etag(self._part) == etag
+
+        # The object was uploaded in parts, so to work out its ETag we
+        # need to know how big they were. All but the last are the same
+        # size
+        head = self._client.head_object(
+            Bucket=self._bucket, Key=self._key, PartNumber=1
+        )
+
+        return file_etag(self._part, head["ContentLength"]) == etag
+
+    # -----
+    # _discard
+    # -----
+    def _discard(self) -> None:
+        self._part.unlink(missing_ok=True)
+        self._stateFile.unlink(missing_ok=True)
@@ -0,0 +1,219 @@
+from time import monotonic
+from time import sleep
+from typing import Callable
+from typing import NamedTuple
+
+from flexsea.device import Device
+import serial
+from serial.tools import list_ports
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#                 WaitResult
+# ============================================
+class WaitResult(NamedTuple):
+    """
+    Outcome of waiting on a readiness condition: whether or not the
+    condition held before the timeout and how long, in seconds, we
+    actually waited.
+    """
+
+    ready: bool
+    waited: float
+
+
+# ============================================
+#                 PowerCycle
+# ============================================
+class PowerCycle(NamedTuple):
+    """
+    Outcome of waiting for a power cycle. Same as `WaitResult`, plus
+    the port the device came back on, which isn't always the one it
+    left from.
+    """
+
+    ready: bool
+    waited: float
+    port: str
+
+
+# ============================================
+#                 wait_until
+# ============================================
+def wait_until(
+    condition: Callable[[], bool],
+    timeout: float,
+    interval: float = bc.readinessPollInterval,
+) -> WaitResult:
+    """
+    Polls `condition` every `interval` seconds until it returns `True`
+    or `timeout` seconds have passed. The condition is always checked
+    at least once, even if `timeout` is zero.
+    """
+    start = monotonic()
+
+    while True:
+        if condition():
+            return WaitResult(True, monotonic() - start)
+        if monotonic() - start >= timeout:
+            return WaitResult(False, monotonic() - start)
+        sleep(interval)
+
+
+# ============================================
+#                port_present
+# ============================================
+def port_present(port: str) -> bool:
+    """
+    Returns `True` if the operating system currently lists `port`.
+    """
+    return any(p.device == port for p in list_ports.comports())
+
+
+# ============================================
+#             port_serial_number
+# ============================================
+def port_serial_number(port: str) -> str | None:
+    """
+    Returns the USB serial number of the adapter behind `port`, or
+    `None` if the port isn't listed or the adapter doesn't have one.
+    """
+    for p in list_ports.comports():
+        if p.device == port:
+            return p.serial_number
+    return None
+
+
+# ============================================
+#                 find_port
+# ============================================
+def find_port(serialNumber: str) -> str | None:
+    """
+    Returns the port currently used by the USB adapter with the given
+    serial number, if it's plugged in.
+    """
+    for p in list_ports.comports():
+        if p.serial_number == serialNumber:
+            return p.device
+    return None
+
+
+# ============================================
+#                port_released
+# ============================================
+def port_released(port: str) -> bool:
+    """
+    Returns `True` if `port` exists and nothing else is holding it
+    open. We check by briefly opening the port ourselves; on POSIX
+    we have to ask for exclusive access explicitly for this to fail
+    when the port is in use.
+    """
+    try:
+        with serial.Serial(port, exclusive=True):
+            pass
+    except (serial.SerialException, OSError, ValueError):
+        return False
+    return True
+
+
+# ============================================
+#            wait_for_port_release
+# ============================================
+def wait_for_port_release(port: str, timeout: float) -> WaitResult:
+    return wait_until(lambda: port_released(port), timeout)
+
+
+# ============================================
+#             wait_for_port_gone
+# ============================================
+def wait_for_port_gone(port: str, timeout: float) -> WaitResult:
+    """
+    Waits for `port` to disappear, which is what happens when Manage
+    resets into DFU mode.
+    """
+    return wait_until(lambda: not port_present(port), timeout)
+
+
+# ============================================
+#            wait_for_port_return
+# ============================================
+def wait_for_port_return(port: str, timeout: float) -> WaitResult:
+    """
+    Waits for `port` to be re-enumerated after a reset and to be free
+    for use.
+    """
+    return wait_until(lambda: port_present(port) and port_released(port), timeout)
+
+
+# ============================================
+#             wait_for_bootloader
+# ============================================
+def wait_for_bootloader(device: Device, target: str, timeout: float) -> WaitResult:
+    """
+    Asks Manage to activate `target`'s bootloader and polls until the
+    bootloader answers. This is what `Device.set_tunnel_mode` does,
+    but that polls once a second, whereas we poll at the readiness
+    interval and re-send the activation request periodically in case
+    Manage missed it while resetting.
+    """
+    lastRequest = None
+
+    def _active() -> bool:
+        nonlocal lastRequest
+        now = monotonic()
+        if lastRequest is None or now - lastRequest >= bc.bootloaderActivationInterval:
+            lastRequest = now
+            try:
+                device.activate_bootloader(target)
+            except IOError:
+                pass
+        return device.bootloaderActive
+
+    return wait_until(_active, timeout)
+
+
+# ============================================
+#            wait_for_power_cycle
+# ============================================
+def wait_for_power_cycle(
+    port: str, timeout: float, serialNumber: str | None = None
+) -> PowerCycle:
+    """
+    Waits for the device on `port` to be power cycled, i.e., for it to
+    disappear and then be re-enumerated and free for use. If the device
+    is already gone (e.g., Manage is still in DFU mode), the first half
+    of the wait is over straight away.
+
+    When the USB adapter has a serial number we follow that rather
+    than the port name, since the operating system doesn't always give
+    the device back the same port. The serial number can be passed in
+    if it was looked up before the device went away. `timeout` covers
+    the whole power cycle.
+    """
+    if serialNumber is None:
+        serialNumber = port_serial_number(port)
+
+    def _locate() -> str | None:
+        if serialNumber:
+            return find_port(serialNumber)
+        return port if port_present(port) else None
+
+    gone = wait_until(lambda: _locate() is None, timeout)
+    if not gone.ready:
+        return PowerCycle(False, gone.waited, port)
+
+    newPort = port
+
+    def _back() -> bool:
+        nonlocal newPort
+        found = _locate()
+        if found is None:
+            return False
+        newPort = found
+        return port_released(found)
+
+    back = wait_until(_back, max(timeout - gone.waited, 0))
+
+    return PowerCycle(back.ready, gone.waited + back.waited, newPort)
@@ -0,0 +1,198 @@
+import io
+from pathlib import Path
+from typing import List
+from typing import Tuple
+from zipfile import sizeFileHeader
+from zipfile import ZipFile
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.storage import Storage
+from bootloader.utilities.storage import StoredObject
+
+
+# ============================================
+#               _RangedReader
+# ============================================
+class _RangedReader(io.RawIOBase):
+    """
+    A read-only file over a stored object that reads only the byte
+    ranges asked for, keeping what it's read so that nothing is read
+    twice. `ZipFile` makes many small reads, so the ranges it's about to
+    need are fetched ahead of time in one request with `prefetch`.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, storage: Storage, obj: StoredObject) -> None:
+        super().__init__()
+
+        self._storage = storage
+        self._obj = obj
+        self._pos = 0
+        self._spans: List[Tuple[int, bytes]] = []
+
+    # -----
+    # readable
+    # -----
+    def readable(self) -> bool:
+        return True
+
+    # -----
+    # seekable
+    # -----
+    def seekable(self) -> bool:
+        return True
+
+    # -----
+    # tell
+    # -----
+    def tell(self) -> int:
+        return self._pos
+
+    # -----
+    # seek
+    # -----
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._obj.size
+        self._pos = max(offset, 0)
+
+        return self._pos
+
+    # -----
+    # read
+    # -----
+    def read(self, size: int = -1) -> bytes:
+        end = self._obj.size if size < 0 else min(self._pos + size, self._obj.size)
+        if end <= self._pos:
+            return b""
+
+        data = self._cached(self._pos, end)
+        if data is None:
+            self.prefetch(self._pos, end)
+            data = self._spans[-1][1]
+        self._pos = end
+
+        return data
+
+    # -----
+    # readinto
+    # -----
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+
+        return len(data)
+
+    # -----
+    # prefetch
+    # -----
+    def prefetch(self, start: int, end: int) -> None:
+        """
+        Reads bytes `start` to `end` (exclusive) in one request, unless
+        they've been read already.
+        """
+        start = max(start, 0)
+        end = min(end, self._obj.size)
+        if start < end and self._cached(start, end) is None:
+            data = self._storage.read_range(self._obj.key, start, end, self._obj.etag)
+            self._spans.append((start, data))
+
+    # -----
+    # _cached
+    # -----
+    def _cached(self, start: int, end: int) -> bytes | None:
+        for spanStart, data in self._spans:
+            if spanStart <= start and end <= spanStart + len(data):
+                return data[start - spanStart : end - spanStart]
+
+        return None
+
+
+# ============================================
+#                 RemoteZip
+# ============================================
+class RemoteZip:
+    """
+    A zip archive in storage from which single files can be read or
+    extracted without downloading the rest of it. The list of files at
+    the end of the archive is read once (in one request, usually; see
+    `bc.configZipTail`), and then each file costs one more request for
+    just its bytes. Files are checked against their CRCs as usual, and
+    every request is made against the archive's ETag, so an archive
+    that's replaced halfway through raises a `RuntimeError` rather than
+    mixing files from two versions.
+
+    Raises `zipfile.BadZipFile` if the object isn't a zip archive.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, storage: Storage, obj: StoredObject) -> None:
+        self._reader = _RangedReader(storage, obj)
+        self._reader.prefetch(obj.size - bc.configZipTail, obj.size)
+        # Closed by `close`
+        self._zip = ZipFile(self._reader, "r")  # pylint: disable=consider-using-with
+
+    # -----
+    # __enter__
+    # -----
+    def __enter__(self) -> "RemoteZip":
+        return self
+
+    # -----
+    # __exit__
+    # -----
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    # -----
+    # namelist
+    # -----
+    def namelist(self) -> List[str]:
+        return self._zip.namelist()
+
+    # -----
+    # read
+    # -----
+    def read(self, name: str) -> bytes:
+        """
+        Returns the contents of the file `name` in the archive, raising a
+        `KeyError` if there isn't one, like `ZipFile.read`.
+        """
+        self._prefetch(name)
+
+        return self._zip.read(name)
+
+    # -----
+    # extract
+    # -----
+    def extract(self, name: str, path: Path) -> Path:
+        """
+        Extracts the file `name` into the directory `path`, like
+        `ZipFile.extract`, and returns where it was written.
+        """
+        self._prefetch(name)
+
+        return Path(self._zip.extract(name, path))
+
+    # -----
+    # close
+    # -----
+    def close(self) -> None:
+        self._zip.close()
+
+    # -----
+    # _prefetch
+    # -----
+    def _prefetch(self, name: str) -> None:
+        info = self._zip.getinfo(name)
+        start = info.header_offset
+        end = start + sizeFileHeader + len(info.orig_filename.encode())
+        end += len(info.extra) + info.compress_size + bc.configZipSlack
+        # Nothing past the start of the list of files is needed
+        self._reader.prefetch(start, min(end, self._zip.start_dir))
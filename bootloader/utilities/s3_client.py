@@ -0,0 +1,122 @@
+from pathlib import Path
+import threading
+from typing import Any
+from typing import Dict
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.mirror import fetch_from_mirror
+from bootloader.utilities.mirror import mirror_url
+from bootloader.utilities.ranged_download import RangedDownload
+
+# boto3 is slow to import, so it's only pulled in the first time one of
+# these functions is called. This keeps start-up fast for the commands
+# that import this module but never talk to S3
+# pylint: disable=import-outside-toplevel
+
+_lock = threading.Lock()
+_sessions: Dict[str | None, Any] = {}
+_clients: Dict[str | None, Any] = {}
+
+
+# ============================================
+#                get_session
+# ============================================
+def get_session(profile: str | None = bc.dephyAwsProfile) -> Any:
+    """
+    Returns the boto3 session for the given credentials profile, or an
+    anonymous one if `profile` is `None`. There's only ever one session
+    per profile in a process, so the credentials are only looked up
+    once, however many commands (including those run via `self.call`)
+    use them. Raises `botocore.exceptions.ProfileNotFound` if there's
+    no such profile.
+    """
+    import boto3
+
+    with _lock:
+        if profile not in _sessions:
+            _sessions[profile] = boto3.Session(profile_name=profile)
+        return _sessions[profile]
+
+
+# ============================================
+#               get_s3_client
+# ============================================
+def get_s3_client(profile: str | None = bc.dephyAwsProfile) -> Any:
+    """
+    Returns the process-wide S3 client for the given credentials
+    profile. If `profile` is `None`, the client makes unsigned requests,
+    which is what's needed for public buckets.
+
+    boto3 clients are thread-safe, so one client, and its pool of
+    connections, is shared by everything. That way the TLS handshake
+    with S3 is only done as many times as there are connections in use
+    at once, rather than once per request.
+    """
+    from botocore import UNSIGNED
+    from botocore.config import Config
+
+    session = get_session(profile)
+
+    with _lock:
+        if profile not in _clients:
+            config = Config(
+                max_pool_connections=bc.s3MaxPoolConnections,
+                connect_timeout=bc.s3ConnectTimeout,
+                retries={"max_attempts": bc.s3MaxAttempts, "mode": "standard"},
+                tcp_keepalive=True,
+            )
+            region = None
+            if profile is None:
+                config = config.merge(Config(signature_version=UNSIGNED))
+                region = bc.s3PublicRegion
+            _clients[profile] = session.client("s3", config=config, region_name=region)
+        return _clients[profile]
+
+
+# ============================================
+#                 s3_download
+# ============================================
+def s3_download(
+    obj: str,
+    bucket: str,
+    dest: str,
+    profile: str | None = None,
+    etag: str | None = None,
+) -> str:
+    """
+    Downloads `obj` from `bucket` to `dest` with the shared client (see
+    `RangedDownload`) and returns the object's ETag, which the file has
+    been checked against. Like flexsea's function of the same name,
+    which opens a new session for every file, `obj` can also be just
+    the object's base name, in which case the bucket is searched for
+    it.
+
+    If a mirror has been set (see `mirror_url`), it's tried first, and
+    S3 is only used if it can't provide the file. `etag` is that of the
+    copy already at `dest`, if any, which the mirror can then just
+    confirm is current rather than sending it again.
+    """
+    from botocore.exceptions import ClientError
+    from botocore.exceptions import ConnectTimeoutError
+    from flexsea.utilities.aws import s3_find_object
+
+    url = mirror_url()
+    if url is not None:
+        mirrored = fetch_from_mirror(url, bucket, obj, Path(dest), etag)
+        if mirrored is not None:
+            return mirrored
+
+    client = get_s3_client(profile)
+
+    try:
+        try:
+            return RangedDownload(client, bucket, obj, Path(dest)).run()
+        except ClientError as err:
+            # Only a missing object is worth searching the bucket for;
+            # anything else (e.g., bad credentials) would just fail again
+            if err.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            obj = s3_find_object(obj, bucket, client)
+            return RangedDownload(client, bucket, obj, Path(dest)).run()
+    except ConnectTimeoutError as err:
+        raise RuntimeError("Could not connect to S3. Timeout.") from err
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+from typing import Any
+from typing import Iterator
+from typing import List
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#               _list_prefix
+# ============================================
+def _list_prefix(
+    client: Any,
+    bucket: str,
+    prefix: str,
+    pages: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """
+    Puts each page of the objects under `prefix` on `pages` as it
+    arrives, followed by `None` once they've all been listed, or the
+    error if listing fails.
+    """
+    paginator = client.get_paginator("list_objects_v2")
+
+    try:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            if stop.is_set():
+                break
+            pages.put(page.get("Contents", []))
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        pages.put(err)
+        return
+
+    pages.put(None)
+
+
+# ============================================
+#                list_objects
+# ============================================
+def list_objects(
+    client: Any, bucket: str, prefixes: List[str], workers: int | None = None
+) -> Iterator[dict]:
+    """
+    Yields the objects in `bucket` whose keys start with any of
+    `prefixes`, in the form returned by ListObjectsV2 (`Key`, `ETag`,
+    `Size`, ...). Each prefix is listed on its own thread, up to
+    `workers` (by default `bc.s3ListWorkers`) at a time, and objects
+    are yielded as soon as their page arrives, so the order is only
+    sorted within a prefix. An error listing any prefix is raised once
+    the pages that arrived before it have been yielded.
+
+    `client` is a boto3 S3 client, which is safe to share across
+    threads.
+    """
+    # Listing "a" and "ab" would list the "ab" objects twice
+    scoped: List[str] = []
+    for prefix in sorted(set(prefixes)):
+        if not any(prefix.startswith(p) for p in scoped):
+            scoped.append(prefix)
+    workers = min(workers or bc.s3ListWorkers, len(scoped)) or 1
+
+    pages: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    remaining = len(scoped)
+
+    with ThreadPoolExecutor(workers, thread_name_prefix="s3-list") as pool:
+        for prefix in scoped:
+            pool.submit(_list_prefix, client, bucket, prefix, pages, stop)
+
+        try:
+            while remaining:
+                page = pages.get()
+                if page is None:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            # Lets the other threads finish early if the caller stops
+            # iterating or a prefix fails
+            stop.set()
@@ -0,0 +1,657 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+from typing import BinaryIO
+from typing import Callable
+from typing import ContextManager
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from urllib.error import HTTPError
+from urllib.parse import parse_qs
+from urllib.parse import quote
+from urllib.parse import unquote
+from urllib.parse import urlparse
+from urllib.request import Request
+from urllib.request import urlopen
+
+import bootloader.utilities.constants as bc
+from bootloader.utilities.multipart_upload import MultipartUpload
+from bootloader.utilities.s3_client import get_s3_client
+from bootloader.utilities.s3_client import s3_download
+from bootloader.utilities.s3_listing import list_objects
+
+# botocore is only imported by the S3 backend's methods, so that using
+# a local or HTTP backend doesn't pay for it
+# pylint: disable=import-outside-toplevel
+
+_lock = threading.Lock()
+_storages: Dict[str, "Storage"] = {}
+
+
+# ============================================
+#                StoredObject
+# ============================================
+class StoredObject(NamedTuple):
+    key: str
+    etag: str
+    size: int
+
+
+# ============================================
+#                   Storage
+# ============================================
+class Storage:
+    """
+    Where one type of artifact (firmware, configs, or tools) is kept.
+    Objects are named by keys relative to the storage's root, e.g., a
+    firmware file's name or `<os>/<tool>` for a tool.
+
+    Each object has an ETag that changes whenever the object does, so
+    that callers can tell whether their copy is current. Missing
+    objects raise `FileNotFoundError`, and storages that can't be
+    written to raise `RuntimeError` from `open_write`, `write`,
+    `rename`, and `delete`.
+    """
+
+    # -----
+    # download
+    # -----
+    def download(self, key: str, dest: Path, etag: str | None = None) -> str:
+        """
+        Copies `key` to `dest` and returns its ETag. `etag` is that of
+        the copy already at `dest`, if any, which is left alone if it's
+        still current.
+        """
+        raise NotImplementedError
+
+    # -----
+    # list
+    # -----
+    def list(self, prefixes: Iterable[str] = ("",)) -> Iterator[StoredObject]:
+        """
+        Yields the objects whose keys start with any of `prefixes`.
+        """
+        raise NotImplementedError
+
+    # -----
+    # head
+    # -----
+    def head(self, key: str) -> StoredObject:
+        """
+        Returns `key`'s ETag and size without downloading it.
+        """
+        raise NotImplementedError
+
+    # -----
+    # exists
+    # -----
+    def exists(self, key: str) -> bool:
+        try:
+            self.head(key)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    # -----
+    # read
+    # -----
+    def read(self, key: str) -> bytes:
+        """
+        Returns the contents of `key`, which should be small, in one
+        request.
+        """
+        raise NotImplementedError
+
+    # -----
+    # read_range
+    # -----
+    def read_range(
+        self, key: str, start: int, end: int, etag: str | None = None
+    ) -> bytes:
+        """
+        Returns bytes `start` to `end` (exclusive) of `key`. If `etag` is
+        given and `key` no longer has it, a `RuntimeError` is raised, so
+        that ranges read one after the other are from the same object.
+        """
+        raise NotImplementedError
+
+    # -----
+    # open_write
+    # -----
+    def open_write(
+        self, key: str, progress: Callable[[int], None] | None = None
+    ) -> ContextManager[BinaryIO]:
+        """
+        Gives a write-only file whose contents are stored as `key` when
+        the `with` block ends, and not at all if it raises, so that an
+        object can be written as it's made rather than saved first.
+        `progress`, if given, is called with the number of bytes stored
+        so far as they are.
+        """
+        raise RuntimeError(f"Error: {self} is read-only.")
+
+    # -----
+    # write
+    # -----
+    def write(self, key: str, data: bytes) -> None:
+        raise RuntimeError(f"Error: {self} is read-only.")
+
+    # -----
+    # rename
+    # -----
+    def rename(self, key: str, newKey: str) -> None:
+        raise RuntimeError(f"Error: {self} is read-only.")
+
+    # -----
+    # delete
+    # -----
+    def delete(self, key: str) -> None:
+        raise RuntimeError(f"Error: {self} is read-only.")
+
+
+# ============================================
+#                  S3Storage
+# ============================================
+class S3Storage(Storage):
+    """
+    Objects under `prefix` in an S3 bucket, read with the given
+    credentials profile, or anonymously if `profile` is `None`.
+    Downloads go through the LAN mirror, if one is set.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, bucket: str, prefix: str = "", profile: str | None = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.profile = profile
+
+    # -----
+    # __str__
+    # -----
+    def __str__(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    # -----
+    # download
+    # -----
+    def download(self, key: str, dest: Path, etag: str | None = None) -> str:
+        return s3_download(
+            self.prefix + key, self.bucket, str(dest), self.profile, etag
+        )
+
+    # -----
+    # list
+    # -----
+    def list(self, prefixes: Iterable[str] = ("",)) -> Iterator[StoredObject]:
+        client = get_s3_client(self.profile)
+        prefixes = [self.prefix + p for p in prefixes]
+
+        for obj in list_objects(client, self.bucket, prefixes):
+            yield StoredObject(
+                obj["Key"][len(self.prefix) :], obj["ETag"].strip('"'), obj["Size"]
+            )
+
+    # -----
+    # head
+    # -----
+    def head(self, key: str) -> StoredObject:
+        from botocore.exceptions import ClientError
+
+        client = get_s3_client(self.profile)
+
+        try:
+            head = client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Could not find: {key} in {self}") from err
+            raise
+
+        return StoredObject(key, head["ETag"].strip('"'), head["ContentLength"])
+
+    # -----
+    # read
+    # -----
+    def read(self, key: str) -> bytes:
+        from botocore.exceptions import ClientError
+
+        client = get_s3_client(self.profile)
+
+        try:
+            response = client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Could not find: {key} in {self}") from err
+            raise
+
+        return response["Body"].read()
+
+    # -----
+    # read_range
+    # -----
+    def read_range(
+        self, key: str, start: int, end: int, etag: str | None = None
+    ) -> bytes:
+        from botocore.exceptions import ClientError
+
+        client = get_s3_client(self.profile)
+        args = {"Bucket": self.bucket, "Key": self.prefix + key}
+        if etag is not None:
+            args["IfMatch"] = etag
+
+        try:
+            response = client.get_object(Range=f"bytes={start}-{end - 1}", **args)
+        except ClientError as err:
+            code = err.response["Error"]["Code"]
+            if code in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Could not find: {key} in {self}") from err
+            if code in ("412", "PreconditionFailed"):
+                raise RuntimeError(f"Error: {key} changed while being read.") from err
+            raise
+
+        return response["Body"].read()
+
+    # -----
+    # open_write
+    # -----
+    @contextmanager
+    def open_write(
+        self, key: str, progress: Callable[[int], None] | None = None
+    ) -> Iterator[BinaryIO]:
+        import botocore.exceptions as bce
+
+        try:
+            client = get_s3_client(self.profile)
+            with MultipartUpload(
+                client, self.bucket, self.prefix + key, progress
+            ) as up:
+                yield up
+        except bce.ProfileNotFound as err:
+            msg = f"Error: could not find valid '{self.profile}' profile in "
+            msg += "'~/.aws/credentials'."
+            raise RuntimeError(msg) from err
+        except (bce.PartialCredentialsError, bce.NoCredentialsError) as err:
+            msg = "Error: invalid credentials. Please check your access keys stored "
+            msg += "in '~/.aws/credentials'."
+            raise RuntimeError(msg) from err
+        except bce.ClientError as err:
+            msg = "Error: could not connect to S3. Upload failed."
+            raise RuntimeError(msg) from err
+
+    # -----
+    # rename
+    # -----
+    def rename(self, key: str, newKey: str) -> None:
+        # S3 can't rename, so this is a copy followed by a delete, which
+        # is also what cloudpathlib does
+        client = get_s3_client(self.profile)
+        client.copy_object(
+            Bucket=self.bucket,
+            Key=self.prefix + newKey,
+            CopySource={"Bucket": self.bucket, "Key": self.prefix + key},
+        )
+        client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    # -----
+    # write
+    # -----
+    def write(self, key: str, data: bytes) -> None:
+        client = get_s3_client(self.profile)
+        client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    # -----
+    # delete
+    # -----
+    def delete(self, key: str) -> None:
+        client = get_s3_client(self.profile)
+        client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+# ============================================
+#                 LocalStorage
+# ============================================
+class LocalStorage(Storage):
+    """
+    Files in a directory, e.g., on a NAS. A file's ETag is made from
+    its size and modification time, so listing a directory doesn't
+    mean reading every file in it.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    # -----
+    # __str__
+    # -----
+    def __str__(self) -> str:
+        return str(self.root)
+
+    # -----
+    # download
+    # -----
+    def download(self, key: str, dest: Path, etag: str | None = None) -> str:
+        src = self._path(key)
+        if not src.is_file():
+            raise FileNotFoundError(f"Could not find: {key} in {self.root}")
+
+        current = _file_etag(src)
+        if current == etag and dest.is_file():
+            return current
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.copy")
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        return current
+
+    # -----
+    # list
+    # -----
+    def list(self, prefixes: Iterable[str] = ("",)) -> Iterator[StoredObject]:
+        prefixes = tuple(prefixes)
+
+        for path in sorted(self.root.rglob("*")):
+            key = path.relative_to(self.root).as_posix()
+            if any(p.startswith(".") for p in path.relative_to(self.root).parts):
+                continue
+            if path.is_file() and key.startswith(prefixes):
+                yield StoredObject(key, _file_etag(path), path.stat().st_size)
+
+    # -----
+    # head
+    # -----
+    def head(self, key: str) -> StoredObject:
+        path = self._path(key)
+        if not path.is_file():
+            raise FileNotFoundError(f"Could not find: {key} in {self.root}")
+
+        return StoredObject(key, _file_etag(path), path.stat().st_size)
+
+    # -----
+    # read
+    # -----
+    def read(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    # -----
+    # read_range
+    # -----
+    def read_range(
+        self, key: str, start: int, end: int, etag: str | None = None
+    ) -> bytes:
+        path = self._path(key)
+        if not path.is_file():
+            raise FileNotFoundError(f"Could not find: {key} in {self.root}")
+
+        with open(path, "rb") as fd:
+            if etag is not None and _file_etag(path) != etag:
+                raise RuntimeError(f"Error: {key} changed while being read.")
+            fd.seek(start)
+            return fd.read(end - start)
+
+    # -----
+    # open_write
+    # -----
+    @contextmanager
+    def open_write(
+        self, key: str, progress: Callable[[int], None] | None = None
+    ) -> Iterator[BinaryIO]:
+        dest = self._path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+
+        try:
+            with open(tmp, "wb") as fd:
+                yield fd
+            os.replace(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        if progress is not None:
+            progress(dest.stat().st_size)
+
+    # -----
+    # write
+    # -----
+    def write(self, key: str, data: bytes) -> None:
+        dest = self._path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+
+    # -----
+    # rename
+    # -----
+    def rename(self, key: str, newKey: str) -> None:
+        dest = self._path(newKey)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._path(key), dest)
+
+    # -----
+    # delete
+    # -----
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    # -----
+    # _path
+    # -----
+    def _path(self, key: str) -> Path:
+        if ".." in Path(key).parts:
+            raise FileNotFoundError(f"Could not find: {key} in {self.root}")
+        return self.root.joinpath(*Path(key).parts)
+
+
+# ============================================
+#                 HttpStorage
+# ============================================
+class HttpStorage(Storage):
+    """
+    Files served over HTTP(S), e.g., by an internal web server, with
+    each key at `<url>/<key>`. Since HTTP has no way to list a
+    directory, the server must also serve `<url>/index.json`, a list of
+    `{"key": ..., "etag": ..., "size": ...}` objects.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    # -----
+    # __str__
+    # -----
+    def __str__(self) -> str:
+        return self.url
+
+    # -----
+    # download
+    # -----
+    def download(self, key: str, dest: Path, etag: str | None = None) -> str:
+        request = Request(f"{self.url}/{quote(key)}")
+        if etag is not None and dest.is_file():
+            request.add_header("If-None-Match", f'"{etag}"')
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.http")
+
+        try:
+            with urlopen(request, timeout=bc.httpStorageTimeout) as response:
+                md5 = hashlib.md5()
+                with open(tmp, "wb") as fd:
+                    for chunk in iter(lambda: response.read(1 << 20), b""):
+                        md5.update(chunk)
+                        fd.write(chunk)
+                os.replace(tmp, dest)
+                # Servers that don't send ETags get the file's MD5, which
+                # is at least stable
+                return response.headers.get("ETag", md5.hexdigest()).strip('"')
+        except HTTPError as err:
+            if err.code == 304 and etag is not None:
+                return etag
+            if err.code == 404:
+                raise FileNotFoundError(f"Could not find: {key} at {self.url}") from err
+            raise
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    # -----
+    # list
+    # -----
+    def list(self, prefixes: Iterable[str] = ("",)) -> Iterator[StoredObject]:
+        prefixes = tuple(prefixes)
+        url = f"{self.url}/{bc.httpStorageIndex}"
+
+        with urlopen(url, timeout=bc.httpStorageTimeout) as response:
+            index = json.load(response)
+
+        for obj in index:
+            if obj["key"].startswith(prefixes):
+                yield StoredObject(obj["key"], obj["etag"], obj["size"])
+
+    # -----
+    # read
+    # -----
+    def read(self, key: str) -> bytes:
+        try:
+            with urlopen(
+                f"{self.url}/{quote(key)}", timeout=bc.httpStorageTimeout
+            ) as response:
+                return response.read()
+        except HTTPError as err:
+            if err.code == 404:
+                raise FileNotFoundError(f"Could not find: {key} at {self.url}") from err
+            raise
+
+    # -----
+    # read_range
+    # -----
+    def read_range(
+        self, key: str, start: int, end: int, etag: str | None = None
+    ) -> bytes:
+        """
+        Servers that don't support ranges send the whole file, which is
+        then cut down to the range.
+        """
+        request = Request(f"{self.url}/{quote(key)}")
+        request.add_header("Range", f"bytes={start}-{end - 1}")
+        if etag:
+            request.add_header("If-Match", f'"{etag}"')
+
+        try:
+            with urlopen(request, timeout=bc.httpStorageTimeout) as response:
+                data = response.read()
+                return data if response.status == 206 else data[start:end]
+        except HTTPError as err:
+            if err.code == 404:
+                raise FileNotFoundError(f"Could not find: {key} at {self.url}") from err
+            if err.code == 412:
+                raise RuntimeError(f"Error: {key} changed while being read.") from err
+            raise
+
+    # -----
+    # head
+    # -----
+    def head(self, key: str) -> StoredObject:
+        """
+        Servers that don't send ETags give an empty one, which never
+        matches, so files from them are always downloaded again.
+        """
+        request = Request(f"{self.url}/{quote(key)}", method="HEAD")
+
+        try:
+            with urlopen(request, timeout=bc.httpStorageTimeout) as response:
+                etag = response.headers.get("ETag", "").strip('"')
+                size = int(response.headers.get("Content-Length", 0))
+                return StoredObject(key, etag, size)
+        except HTTPError as err:
+            if err.code == 404:
+                raise FileNotFoundError(f"Could not find: {key} at {self.url}") from err
+            raise
+
+
+# ============================================
+#                _file_etag
+# ============================================
+def _file_etag(path: Path) -> str:
+    stat = path.stat()
+
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+# ============================================
+#                parse_storage
+# ============================================
+def parse_storage(url: str) -> Storage:
+    """
+    Returns the storage at `url`, which is one of:
+
+    * `s3://<bucket>[/<prefix>][?profile=<profile>]`. Without a profile,
+      the bucket is read anonymously
+    * `http://...` or `https://...`
+    * `file:///<directory>`, or just the path to a directory
+    """
+    parsed = urlparse(url)
+
+    if parsed.scheme == "s3":
+        prefix = parsed.path.lstrip("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        profile = parse_qs(parsed.query).get("profile", [None])[0]
+        return S3Storage(parsed.netloc, prefix, profile)
+
+    if parsed.scheme in ("http", "https"):
+        return HttpStorage(url)
+
+    if parsed.scheme == "file":
+        return LocalStorage(Path(unquote(parsed.path)))
+
+    # Anything else is a path. This includes Windows paths, e.g.,
+    # `Z:\firmware`, whose drive letter looks like a scheme
+    return LocalStorage(Path(url).expanduser())
+
+
+# ============================================
+#                 get_storage
+# ============================================
+def get_storage(artifact: str) -> Storage:
+    """
+    Returns the storage for the given type of artifact (one of the keys
+    of `bc.storageDefaults`). It's taken from `bc.storageConfigFile`, a
+    JSON object mapping artifact types to storage URLs (see
+    `parse_storage`), e.g.:
+
+        {"firmware": "Z:/dephy/firmware", "tools": "https://files.lan/tools"}
+
+    Artifacts that aren't in the file use the default, which is S3.
+    """
+    with _lock:
+        if artifact not in _storages:
+            try:
+                with open(bc.storageConfigFile, "r", encoding="utf8") as fd:
+                    config = json.load(fd)
+            except FileNotFoundError:
+                config = {}
+            except ValueError as err:
+                msg = f"Error: could not read {bc.storageConfigFile}: {err}"
+                raise RuntimeError(msg) from err
+            url = config.get(artifact, bc.storageDefaults[artifact])
+            _storages[artifact] = parse_storage(url)
+        return _storages[artifact]
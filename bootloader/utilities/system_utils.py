@@ -1,13 +1,15 @@
-import os
 from pathlib import Path
-import subprocess as sub
 from time import sleep
 from typing import List
 
-from flexsea.utilities.aws import s3_download
-import flexsea.utilities.constants as fxc
-
 import bootloader.utilities.constants as bc
+from bootloader.utilities.cache_manifest import get_manifest
+from bootloader.utilities.ranged_download import file_lock
+from bootloader.utilities.storage import get_storage
+from bootloader.utilities.storage import Storage
+from bootloader.utilities.tool_runner import run_tool
+from bootloader.utilities.tool_runner import ToolError
+from bootloader.utilities.tool_runner import ToolReporter
 
 
 # ============================================
@@ -22,45 +24,80 @@ def setup_cache() -> None:
 # ============================================
 #             run_command
 # ============================================
-def run_command(cmd: List[str]) -> None:
+def run_command(
+    cmd: List[str],
+    timeout: float = bc.toolTimeout,
+    reporter: ToolReporter | None = None,
+    totalBytes: int | None = None,
+) -> None:
     """
-    Attempts to call the command `cmd`. If the call fails, we
-    try again until the max attempts have been reached.
+    Runs the command `cmd`, streaming its output and progress to
+    `reporter`. If the command fails in a way that looks transient
+    (see `is_transient_failure`), we try again, backing off a little
+    more each time, until the max attempts have been reached. Other
+    failures are raised straight away as a `ToolError`.
     """
-    # This is done to prevent unboundlocalerror, which happens if
-    # a calledprocesserror is raised if the process never successfully
-    # completes
-    proc = None
+    reporter = reporter if reporter is not None else ToolReporter()
 
-    for _ in range(5):
+    for attempt in range(bc.toolAttempts):
         try:
-            proc = sub.run(
-                cmd,
-                capture_output=False,
-                check=True,
-                timeout=360,
-                shell=True,
-                env=os.environ,
-            )
-        except sub.CalledProcessError:
-            sleep(1)
-            continue
-        except sub.TimeoutExpired as err:
-            raise sub.TimeoutExpired(cmd, 360) from err
-        if proc.returncode == 0:
-            break
-    if proc is None or proc.returncode != 0:
-        raise RuntimeError(f"Error: command: `{cmd}` failed.")
+            run_tool(cmd, timeout, reporter, totalBytes)
+        except ToolError as err:
+            if not err.transient or attempt == bc.toolAttempts - 1:
+                raise
+            delay = bc.toolRetryBackoff * 2**attempt
+            reporter.retry(err, delay)
+            sleep(delay)
+        else:
+            return
+
+
+# ============================================
+#               download_file
+# ============================================
+def download_file(storage: Storage, key: str, dest: Path, cache: Path) -> Path:
+    """
+    Downloads `key` from `storage` to `dest` and records it, along with
+    its ETag, in the manifest of the cache directory `cache`, which
+    `dest` is in. The file is only renamed to `dest` once it's complete
+    and verified, and an interrupted download from S3 picks up where it
+    left off the next time (see `RangedDownload`).
+
+    Several processes (e.g., those run by `flash fleet`) can ask for
+    the same file at once, so they take turns, and those that had to
+    wait use the file the one before them downloaded. Otherwise the
+    file is always downloaded, even if there's a good copy already.
+    """
+    manifest = get_manifest(cache)
+    before = dest.stat().st_mtime_ns if dest.exists() else None
+
+    with file_lock(dest.parent.joinpath(".locks", f"{dest.name}.lock")):
+        after = dest.stat().st_mtime_ns if dest.exists() else None
+        if after != before and manifest.is_valid(dest):
+            return dest
+        record = manifest.get(dest) if manifest.is_valid(dest) else None
+        etag = storage.download(key, dest, record["etag"] if record else None)
+        manifest.record(dest, etag)
+
+    return dest
 
 
 # ============================================
 #               get_fw_file
 # ============================================
 def get_fw_file(fName: str) -> Path:
-    fwFile = fxc.dephyPath.joinpath(bc.firmwareDir, fName)
+    """
+    Returns the path to the cached firmware file `fName`, downloading
+    it first if it isn't cached or doesn't match its manifest record.
+    """
+    fwFile = bc.firmwarePath.joinpath(fName)
+
+    manifest = get_manifest(bc.firmwarePath)
 
-    if not fwFile.is_file():
-        s3_download(str(fName), bc.dephyFirmwareBucket, str(fwFile), bc.dephyAwsProfile)
+    if manifest.is_valid(fwFile):
+        manifest.touch(fwFile)
+    else:
+        download_file(get_storage("firmware"), fName, fwFile, bc.firmwarePath)
 
     return fwFile
 
@@ -0,0 +1,204 @@
+from collections import deque
+import os
+from pathlib import Path
+import re
+import subprocess as sub
+import threading
+from time import monotonic
+from typing import Callable
+from typing import IO
+from typing import List
+from typing import NamedTuple
+
+import bootloader.utilities.constants as bc
+
+
+# ============================================
+#                ToolProgress
+# ============================================
+class ToolProgress(NamedTuple):
+    """
+    How far along a tool is. `fraction` is between 0 and 1. `rate`, in
+    bytes per second, is only known if we know how big the file being
+    flashed is. `eta` is in seconds.
+    """
+
+    fraction: float
+    elapsed: float
+    rate: float | None
+    eta: float | None
+
+
+# ============================================
+#                 ToolError
+# ============================================
+class ToolError(RuntimeError):
+    """
+    Raised when a tool exits with a non-zero status or can't be run at
+    all. `transient` says whether or not the failure looks like one
+    that trying again might fix, and `output` holds the last lines the
+    tool printed.
+    """
+
+    def __init__(
+        self, cmd: List[str], reason: str, output: List[str], transient: bool
+    ) -> None:
+        self.output = output
+        self.transient = transient
+
+        msg = f"Error: command: `{cmd}` failed ({reason})."
+        if output:
+            msg += "\nLast output:\n" + "\n".join(output)
+
+        super().__init__(msg)
+
+
+# ============================================
+#                ToolReporter
+# ============================================
+class ToolReporter:
+    """
+    Told about what happens while a tool runs. This one ignores
+    everything; callers that want to show progress override the
+    methods they care about. `output` and `progress` are called from
+    the thread that reads the tool's output.
+    """
+
+    def output(self, line: str) -> None:
+        pass
+
+    def progress(self, progress: ToolProgress) -> None:
+        pass
+
+    def retry(self, error: ToolError, delay: float) -> None:
+        pass
+
+
+# ============================================
+#               parse_progress
+# ============================================
+def parse_progress(
+    line: str, patterns: List[re.Pattern], elapsed: float, totalBytes: int | None
+) -> ToolProgress | None:
+    """
+    Returns the progress reported by `line`, if any, with the rate and
+    time remaining estimated from how long the tool has been running.
+    """
+    for pattern in patterns:
+        match = pattern.search(line)
+        if match is None:
+            continue
+
+        groups = match.groupdict()
+        if groups.get("percent") is not None:
+            fraction = float(groups["percent"]) / 100
+        elif int(groups["total"]):
+            fraction = int(groups["done"]) / int(groups["total"])
+        else:
+            continue
+        fraction = min(max(fraction, 0.0), 1.0)
+
+        rate = None
+        if totalBytes and elapsed > 0:
+            rate = fraction * totalBytes / elapsed
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+
+        return ToolProgress(fraction, elapsed, rate, eta)
+
+    return None
+
+
+# ============================================
+#              is_transient_failure
+# ============================================
+def is_transient_failure(returncode: int, output: List[str]) -> bool:
+    """
+    A tool killed by a signal (negative exit code on POSIX) or whose
+    output contains one of `bc.toolTransientErrors` is worth trying
+    again. Anything else, such as a bad firmware file, will fail the
+    same way every time.
+    """
+    if returncode < 0:
+        return True
+
+    text = "\n".join(output)
+
+    return any(re.search(p, text, re.IGNORECASE) for p in bc.toolTransientErrors)
+
+
+# ============================================
+#                _read_output
+# ============================================
+def _read_output(stream: IO[bytes], handle: Callable[[str], None]) -> None:
+    """
+    Reads `stream` as data arrives and passes each non-empty line to
+    `handle`. Carriage returns count as line breaks, since that's how
+    the tools redraw their progress.
+    """
+    pending = ""
+
+    while True:
+        chunk = stream.read1(4096)
+        if not chunk:
+            break
+        pending += chunk.decode("utf8", errors="replace")
+        *lines, pending = re.split(r"[\r\n]", pending)
+        for line in lines:
+            if line.strip():
+                handle(line.rstrip())
+
+    if pending.strip():
+        handle(pending.rstrip())
+
+
+# ============================================
+#                  run_tool
+# ============================================
+def run_tool(
+    cmd: List[str],
+    timeout: float,
+    reporter: ToolReporter,
+    totalBytes: int | None = None,
+) -> None:
+    """
+    Runs `cmd` once, streaming its output to `reporter` along with any
+    progress we can read out of it. Raises `ToolError` if the tool
+    fails and `subprocess.TimeoutExpired` if it runs for longer than
+    `timeout` seconds, in which case it's killed.
+    """
+    patterns = [
+        re.compile(p) for p in bc.toolProgressPatterns.get(Path(cmd[0]).stem, [])
+    ]
+    tail: deque = deque(maxlen=bc.toolOutputTail)
+    start = monotonic()
+
+    def _handle(line: str) -> None:
+        tail.append(line)
+        reporter.output(line)
+        progress = parse_progress(line, patterns, monotonic() - start, totalBytes)
+        if progress is not None:
+            reporter.progress(progress)
+
+    try:
+        # pylint: disable-next=consider-using-with
+        proc = sub.Popen(cmd, stdout=sub.PIPE, stderr=sub.STDOUT, env=os.environ)
+    except OSError as err:
+        raise ToolError(cmd, str(err), [], False) from err
+
+    reader = threading.Thread(target=_read_output, args=(proc.stdout, _handle))
+    reader.start()
+
+    try:
+        proc.wait(timeout=timeout)
+    except sub.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        reader.join()
+        proc.stdout.close()
+
+    if proc.returncode != 0:
+        output = list(tail)
+        transient = is_transient_failure(proc.returncode, output)
+        raise ToolError(cmd, f"exit code {proc.returncode}", output, transient)
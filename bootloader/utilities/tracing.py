@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import threading
+from time import perf_counter
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+
+# ============================================
+#                    Span
+# ============================================
+class Span:
+    """
+    A named, timed piece of work. `category` groups related spans (the
+    flash commands use the target's name) and `args` holds anything
+    worth knowing about the span when looking at the trace.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self, name: str, category: str, args: dict) -> None:
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = perf_counter()
+        self.end: float | None = None
+        self.thread = threading.current_thread()
+
+    # -----
+    # duration
+    # -----
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else perf_counter()
+        return end - self.start
+
+
+# ============================================
+#                   Tracer
+# ============================================
+class Tracer:
+    """
+    Records spans from any number of threads and writes them out in
+    the Chrome trace event format, which can be opened in Perfetto
+    (https://ui.perfetto.dev) or chrome://tracing. Spans that run
+    inside one another on the same thread show up nested.
+    """
+
+    # -----
+    # constructor
+    # -----
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._origin = perf_counter()
+        self._spans: List[Span] = []
+
+    # -----
+    # span
+    # -----
+    @contextmanager
+    def span(self, name: str, category: str = "", **args) -> Iterator[Span]:
+        """
+        Times the body of the `with` block. The span is recorded even
+        if the block raises, in which case the error is added to its
+        `args`.
+        """
+        span = Span(name, category, args)
+        try:
+            yield span
+        except BaseException as err:
+            span.args["error"] = repr(err)
+            raise
+        finally:
+            span.end = perf_counter()
+            with self._lock:
+                self._spans.append(span)
+
+    # -----
+    # totals
+    # -----
+    def totals(self, category: str) -> Dict[str, float]:
+        """
+        Returns the total time, in seconds, spent in each span of the
+        given category, keyed by span name, in the order in which the
+        spans were first started.
+        """
+        with self._lock:
+            spans = sorted(
+                (s for s in self._spans if s.category == category),
+                key=lambda s: s.start,
+            )
+
+        totals: Dict[str, float] = {}
+        for span in spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+
+        return totals
+
+    # -----
+    # to_chrome_trace
+    # -----
+    def to_chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = []
+        threads = {}
+
+        with self._lock:
+            spans = list(self._spans)
+
+        for span in sorted(spans, key=lambda s: s.start):
+            threads[span.thread.ident] = span.thread.name
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (span.start - self._origin) * 1e6,
+                    "dur": span.duration * 1e6,
+                    "pid": pid,
+                    "tid": span.thread.ident,
+                    "args": span.args,
+                }
+            )
+
+        for tid, name in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    # -----
+    # write
+    # -----
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf8") as fd:
+            json.dump(self.to_chrome_trace(), fd, indent=2, default=str)
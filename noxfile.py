@@ -12,3 +12,49 @@ def lint(session: nox.Session) -> None:
     session.install("poetry")
     session.run("poetry", "install", "--all-extras")
     session.run("poetry", "run", "pre-commit", "run", "--all-files")
+
+
+# ============================================
+#                  benchmark
+# ============================================
+@nox.session
+def benchmark(session: nox.Session) -> None:
+    """
+    Runs the start-up benchmark, which fails if a command imports
+    dependencies it doesn't need.
+    """
+    session.install("poetry")
+    session.run("poetry", "install", "--all-extras")
+    session.run("poetry", "run", "python", "benchmarks/startup.py", *session.posargs)
+
+
+# ============================================
+#               flash_benchmark
+# ============================================
+@nox.session
+def flash_benchmark(session: nox.Session) -> None:
+    """
+    Runs the flash commands end to end against a fake device and stub
+    tools and reports how long each step takes. Linux only. Pass, e.g.,
+    `-- --compare baseline.json` to check for regressions.
+    """
+    session.install("poetry")
+    session.run("poetry", "install", "--all-extras")
+    session.run(
+        "poetry", "run", "python", "benchmarks/flash_pipeline.py", *session.posargs
+    )
+
+
+# ============================================
+#              listing_benchmark
+# ============================================
+@nox.session
+def listing_benchmark(session: nox.Session) -> None:
+    """
+    Compares listing the whole firmware bucket with the prefix-scoped,
+    concurrent listing used by the firmware catalog, against a local
+    stand-in for S3.
+    """
+    session.install("poetry")
+    session.run("poetry", "install", "--all-extras")
+    session.run("poetry", "run", "python", "benchmarks/s3_listing.py", *session.posargs)